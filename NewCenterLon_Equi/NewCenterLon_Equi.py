@@ -42,6 +42,7 @@ except ImportError:
     import gdal
     from gdalconst import *
 
+import os
 import sys
 import string
 
@@ -53,6 +54,12 @@ def Usage():
     print("Set new center longitude (central meridian) without resampling")
     print("")
     print("Usage: NewCenterLon_Equi.py [-of format] [-clon newClon] infile outfile")
+    print("       NewCenterLon_Equi.py -inplace [-clon newClon] infile")
+    print("")
+    print("  -of VRT (or an outfile ending in .vrt) writes a VRT pointing at infile,")
+    print("  no pixels are copied.")
+    print("  -inplace updates the georeferencing of infile itself (GeoTIFF tags, or")
+    print("  an .aux.xml for formats that can't be updated), no outfile is written.")
     print("")
     sys.exit(1)
 
@@ -93,6 +100,7 @@ newClon = None
 infile = None
 outfile = None
 format = None
+inplace = False
 
 # =============================================================================
 # Parse command line arguments.
@@ -107,6 +115,8 @@ while i < len(sys.argv):
     elif arg == "-clon":
         i = i + 1
         newClon = float(sys.argv[i])
+    elif arg == "-inplace":
+        inplace = True
     elif infile is None:
         infile = arg
     elif outfile is None:
@@ -118,21 +128,41 @@ while i < len(sys.argv):
 if newClon is None:
     newClon = 0
 if format is None:
-    format = "GTiff"
+    if outfile is not None and outfile.lower().endswith(".vrt"):
+        format = "VRT"
+    else:
+        format = "GTiff"
 if infile is None:
     Usage()
-if outfile is None:
+if outfile is None and not inplace:
+    Usage()
+if outfile is not None and inplace:
     Usage()
 
-# Ensure we recognise the driver.
-out_driver = gdal.GetDriverByName(format)
-if out_driver is None:
-    print('"%s" driver not registered.' % format)
+if inplace:
+    # Open input dataset for update, only the header is rewritten. Formats
+    # that can't be updated keep the new registration in infile.aux.xml
+    gdal.PushErrorHandler("CPLQuietErrorHandler")
+    indataset = gdal.Open(infile, GA_Update)
+    gdal.PopErrorHandler()
+    if indataset is None:
+        indataset = gdal.Open(infile, GA_ReadOnly)
+else:
+    # Ensure we recognise the driver.
+    out_driver = gdal.GetDriverByName(format)
+    if out_driver is None:
+        print('"%s" driver not registered.' % format)
+        sys.exit(1)
+
+    # Open input dataset, a VRT has to find it from wherever it is written
+    if format == "VRT":
+        infile = os.path.abspath(infile)
+    indataset = gdal.Open(infile, GA_ReadOnly)
+
+if indataset is None:
+    print("Unable to open %s" % infile)
     sys.exit(1)
 
-# Open input dataset
-indataset = gdal.Open(infile, GA_ReadOnly)
-
 # Read geotransform matrix and calculate ground coordinates
 geomatrix = indataset.GetGeoTransform()
 X = geomatrix[0]
@@ -170,16 +200,26 @@ newGeomatrix = (
 print("To Center Lon: %f" % (newClon))
 print("Original X: %f\tShifted X: %f" % (X, X2))
 
+if inplace:
+    # only the registration changes, so rewrite it where it is stored
+    indataset.SetProjection(newSRS.ExportToWkt())
+    indataset.SetGeoTransform(newGeomatrix)
+    indataset = None
+    print("Updated %s in place" % infile)
+    sys.exit(0)
+
 # Get the raster type - Byte, Uint16, Float32, ...
 aBand = indataset.GetRasterBand(1)
 type = gdal.GetDataTypeName(aBand.DataType)
 newType = ParseType(type)
 
 # create copy of image and set new projection and registration
+# (for VRT this is only a header referencing infile)
 # outdataset = out_driver.Create(outfile, indataset.RasterXSize, indataset.RasterYSize, indataset.RasterCount, newType)
 outdataset = out_driver.CreateCopy(outfile, indataset)
 outdataset.SetProjection(newSRS.ExportToWkt())
 outdataset.SetGeoTransform(newGeomatrix)
+outdataset = None
 
 # simple loop for copying image in to image out - there is probably better method
 # The better way was to us "CreateCopy" above
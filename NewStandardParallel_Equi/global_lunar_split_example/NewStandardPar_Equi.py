@@ -44,6 +44,7 @@ except ImportError:
     from gdalconst import *
 
 import sys
+import os
 import string
 
 
@@ -54,6 +55,13 @@ def Usage():
     print("Set new standard_parallel_1 (latitude of true scale) without resampling")
     print("")
     print("Usage: NewStandardPar_Equi.py [-of format] [-clat newClat] infile outfile")
+    print("       NewStandardPar_Equi.py [-of format] [-clat newClat] -outdir dir infile [infile ...]")
+    print("       NewStandardPar_Equi.py [-clat newClat] -inplace infile [infile ...]")
+    print("")
+    print("  an outfile ending in .vrt (or -of VRT) is a VRT pointing at infile, any")
+    print("  other name is a GeoTIFF copy unless -of is given. -outdir writes")
+    print("  dir/<infile name>.vrt for each file (or the extension of the -of")
+    print("  format), -inplace updates the georeferencing of each infile itself.")
     print("")
     sys.exit(1)
 
@@ -88,114 +96,205 @@ def ParseType(type):
 
 
 # =============================================================================
+# Compute the new projection and geotransform for standard_parallel_1 newClat,
+# quiet skips the report
+def NewRegistration(indataset, newClat, quiet=False):
+
+    # Read geotransform matrix and calculate ground coordinates
+    geomatrix = indataset.GetGeoTransform()
+    maxy = geomatrix[3]
+    cellsizey = geomatrix[5]
+    minx = geomatrix[0]
+    cellsizex = geomatrix[1]
+    maxx = minx + (cellsizex * indataset.RasterXSize)
+    extentx = maxx - minx
+
+    # Build Spatial Reference object based on coordinate system, fetched from the
+    # opened dataset
+    srs = osr.SpatialReference()
+    srs.ImportFromWkt(indataset.GetProjection())
+
+    srsLatLong = srs.CloneGeogCS()
+    ct = osr.CoordinateTransformation(srs, srsLatLong)
+    # Return Upper left X,Y in long,lat
+    (long1, lat1, height1) = ct.TransformPoint(minx, maxy)
+    # Return Upper right X,Y in long,lat
+    (long2, lat2, height2) = ct.TransformPoint(maxx, maxy)
+
+    # Set new std_par_1
+    newSRS = srs
+    newSRS.SetProjParm("standard_parallel_1", newClat)
+
+    # Return Upper left X,Y using new projection
+    ct = osr.CoordinateTransformation(srsLatLong, newSRS)
+    (newminx, newmaxy, height) = ct.TransformPoint(long1, lat1)
+    # Return Upper right X,Y using new projection
+    (newmaxx, newmaxy, height) = ct.TransformPoint(long2, lat2)
+
+    ## HACK - for global datasets, had to set abs to fix GDAL wrap in meters
+    newmaxx = abs(newmaxx)
+
+    newextentx = newmaxx - newminx
+    newcellsizex = newextentx / indataset.RasterXSize
+
+
+    # create new affine tuple
+    newGeomatrix = (
+        newminx,
+        newcellsizex,
+        geomatrix[2],
+        geomatrix[3],
+        geomatrix[4],
+        geomatrix[5],
+    )
+
+    # Report results
+    if quiet:
+        return (newSRS.ExportToWkt(), newGeomatrix)
+    print("To standard_parallel_1: %f" % (newClat))
+    print("Original min X: %f\tShifted min X: %f" % (minx, newminx))
+    print("Original max X: %f\tShifted max X: %f" % (maxx, newmaxx))
+    print("Original Y cellsize (will be unchanged): %f" % (-cellsizey))
+    print("Original X cellsize: %f\tNew X cellsize: %f" % (cellsizex, newcellsizex))
+
+    return (newSRS.ExportToWkt(), newGeomatrix)
 
-# set None for commandline options
-newClat = None
-infile = None
-outfile = None
-format = None
 
 # =============================================================================
-# Parse command line arguments.
+# Set standard_parallel_1 of infile to newClat. Only the registration
+# changes, so an outfile ending in .vrt is by default a VRT referencing
+# infile (any other name a GTiff copy); with outfile None infile itself
+# is updated (GeoTIFF tags, or infile.aux.xml for formats that can't be
+# updated). quiet leaves out the registration
+# report, e.g. for parallel workers. Returns 0 on success.
+def NewStandardPar(infile, outfile, newClat, format=None, quiet=False):
+
+    if outfile is None:
+        gdal.PushErrorHandler("CPLQuietErrorHandler")
+        indataset = gdal.Open(infile, GA_Update)
+        gdal.PopErrorHandler()
+        if indataset is None:
+            indataset = gdal.Open(infile, GA_ReadOnly)
+    else:
+        if format is None:
+            if outfile.lower().endswith(".vrt"):
+                format = "VRT"
+            else:
+                format = "GTiff"
+        # Ensure we recognize the driver.
+        out_driver = gdal.GetDriverByName(format)
+        if out_driver is None:
+            print('"%s" driver not registered.' % format)
+            return 1
+
+        # Open input dataset, a VRT has to find it from wherever it is written
+        if format == "VRT":
+            infile = os.path.abspath(infile)
+        indataset = gdal.Open(infile, GA_ReadOnly)
+
+    if indataset is None:
+        print("Unable to open %s" % infile)
+        return 1
+
+    (wkt, newGeomatrix) = NewRegistration(indataset, newClat, quiet)
+
+    if outfile is None:
+        indataset.SetProjection(wkt)
+        indataset.SetGeoTransform(newGeomatrix)
+        indataset = None
+        return 0
+
+    # Get the raster type - Byte, Uint16, Float32, ...
+    aBand = indataset.GetRasterBand(1)
+    type = gdal.GetDataTypeName(aBand.DataType)
+    newType = ParseType(type)
+
+    # create copy of image and set new projection and registration
+    # (for VRT this is only a header referencing infile)
+    # outdataset = out_driver.Create(outfile, indataset.RasterXSize, indataset.RasterYSize, indataset.RasterCount, newType)
+    outdataset = out_driver.CreateCopy(outfile, indataset)
+    outdataset.SetProjection(wkt)
+    outdataset.SetGeoTransform(newGeomatrix)
+    outdataset = None
+    return 0
+
+
 # =============================================================================
-i = 1
-while i < len(sys.argv):
-    arg = sys.argv[i]
+def main(argv):
 
-    if arg == "-of":
-        i = i + 1
-        format = sys.argv[i]
-    elif arg == "-clat":
+    # set None for commandline options
+    newClat = None
+    files = []
+    outdir = None
+    inplace = False
+    format = None
+
+    # =========================================================================
+    # Parse command line arguments.
+    # =========================================================================
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+
+        if arg == "-of":
+            i = i + 1
+            format = argv[i]
+        elif arg == "-clat":
+            i = i + 1
+            newClat = float(argv[i])
+        elif arg == "-outdir":
+            i = i + 1
+            outdir = argv[i]
+        elif arg == "-inplace":
+            inplace = True
+        elif arg[0] == "-":
+            Usage()
+        else:
+            files.append(arg)
         i = i + 1
-        newClat = float(sys.argv[i])
-    elif infile is None:
-        infile = arg
-    elif outfile is None:
-        outfile = arg
+
+    if newClat is None:
+        newClat = 0
+    if len(files) == 0:
+        Usage()
+    if outdir is not None and inplace:
+        Usage()
+
+    if inplace:
+        jobs = [(infile, None) for infile in files]
+    elif outdir is not None:
+        if not os.path.isdir(outdir):
+            os.makedirs(outdir)
+        if format is None:
+            format = "VRT"
+        # extension of the output format, else the one of each input
+        ext = None
+        out_driver = gdal.GetDriverByName(format)
+        if out_driver is not None and out_driver.GetMetadataItem(gdal.DMD_EXTENSION):
+            ext = "." + out_driver.GetMetadataItem(gdal.DMD_EXTENSION)
+        jobs = [(infile, os.path.join(outdir,
+                 os.path.splitext(os.path.basename(infile))[0] +
+                 (ext or os.path.splitext(infile)[1])))
+                for infile in files]
+    elif len(files) == 2:
+        jobs = [(files[0], files[1])]
     else:
         Usage()
-    i = i + 1
-
-if newClat is None:
-    newClat = 0
-if format is None:
-    format = "GTiff"
-if infile is None:
-    Usage()
-if outfile is None:
-    Usage()
-
-# Ensure we recognize the driver.
-out_driver = gdal.GetDriverByName(format)
-if out_driver is None:
-    print('"%s" driver not registered.' % format)
-    sys.exit(1)
 
-# Open input dataset
-indataset = gdal.Open(infile, GA_ReadOnly)
-
-# Read geotransform matrix and calculate ground coordinates
-geomatrix = indataset.GetGeoTransform()
-maxy = geomatrix[3]
-cellsizey = geomatrix[5]
-minx = geomatrix[0]
-cellsizex = geomatrix[1]
-maxx = minx + (cellsizex * indataset.RasterXSize)
-extentx = maxx - minx
-
-# Build Spatial Reference object based on coordinate system, fetched from the
-# opened dataset
-srs = osr.SpatialReference()
-srs.ImportFromWkt(indataset.GetProjection())
-
-srsLatLong = srs.CloneGeogCS()
-ct = osr.CoordinateTransformation(srs, srsLatLong)
-# Return Upper left X,Y in long,lat
-(long1, lat1, height1) = ct.TransformPoint(minx, maxy)
-# Return Upper right X,Y in long,lat
-(long2, lat2, height2) = ct.TransformPoint(maxx, maxy)
-
-# Set new std_par_1
-newSRS = srs
-newSRS.SetProjParm("standard_parallel_1", newClat)
-
-# Return Upper left X,Y using new projection
-ct = osr.CoordinateTransformation(srsLatLong, newSRS)
-(newminx, newmaxy, height) = ct.TransformPoint(long1, lat1)
-# Return Upper right X,Y using new projection
-(newmaxx, newmaxy, height) = ct.TransformPoint(long2, lat2)
-
-## HACK - for global datasets, had to set abs to fix GDAL wrap in meters
-newmaxx = abs(newmaxx)
-
-newextentx = newmaxx - newminx
-newcellsizex = newextentx / indataset.RasterXSize
-
-
-# create new affine tuple
-newGeomatrix = (
-    newminx,
-    newcellsizex,
-    geomatrix[2],
-    geomatrix[3],
-    geomatrix[4],
-    geomatrix[5],
-)
-
-# Report results
-print("To standard_parallel_1: %f" % (newClat))
-print("Original min X: %f\tShifted min X: %f" % (minx, newminx))
-print("Original max X: %f\tShifted max X: %f" % (maxx, newmaxx))
-print("Original Y cellsize (will be unchanged): %f" % (-cellsizey))
-print("Original X cellsize: %f\tNew X cellsize: %f" % (cellsizex, newcellsizex))
-
-# Get the raster type - Byte, Uint16, Float32, ...
-aBand = indataset.GetRasterBand(1)
-type = gdal.GetDataTypeName(aBand.DataType)
-newType = ParseType(type)
-
-# create copy of image and set new projection and registration
-# outdataset = out_driver.Create(outfile, indataset.RasterXSize, indataset.RasterYSize, indataset.RasterCount, newType)
-outdataset = out_driver.CreateCopy(outfile, indataset)
-outdataset.SetProjection(newSRS.ExportToWkt())
-outdataset.SetGeoTransform(newGeomatrix)
+    nFailed = 0
+    for (infile, outfile) in jobs:
+        if outfile is None:
+            print("updating: " + infile)
+        else:
+            print("writing: " + outfile)
+        if NewStandardPar(infile, outfile, newClat, format) != 0:
+            nFailed = nFailed + 1
+
+    if nFailed > 0:
+        print("%d of %d files failed" % (nFailed, len(jobs)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
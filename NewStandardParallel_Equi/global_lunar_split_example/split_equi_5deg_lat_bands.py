@@ -1,42 +1,240 @@
 from osgeo import gdal
+from osgeo import osr
 import sys, os, time
-import subprocess
-
-# Define source raster and output parameters
-input_raster = sys.argv[1] 
-output_raster = sys.argv[2]
-min_lat = -90  # Adjust as needed
-max_lat = 90
-latband_size = 5  # Degrees
-
-# Extract latitude bands in 5 degrees, with local standard parallel, following HIRISE scheme
-for lat in range(min_lat, max_lat, latband_size):
-    min_band_lat = lat
-    max_band_lat = lat + latband_size
-    if (max_band_lat > 0):
-       stand_par = min_band_lat
-    else:
-       stand_par = max_band_lat
-
-    output_tile = output_raster + "_n" + str(int(max_band_lat)) + "s" + str(int(min_band_lat)) + "_standpar" + str(int(stand_par)) + ".tif"
-    print("writing: " + output_tile)
-
-    # Use gdal.Warp to crop, apply projection, and set output resolution
-    gdal.Warp(
-        output_tile,
-        input_raster,
-        dstSRS=f"+proj=eqc +lat_ts={stand_par} +R=1737400",  # Equirectangular projection with dynamic standard parallel
-        outputBounds=[-180, min_band_lat, 180, max_band_lat],  # Geographic bounds (longitude, latitude)
-        outputBoundsSRS="IAU_2015:30100",  # Geographic coordinate system
-        xRes=100,  # Set horizontal resolution
-        yRes=100   # Set vertical resolution
-    )
-
-
-    # Execute the Python command
-    # NewStandardPar_Equi.py [-of format] [-clat newClat] infile outfile
-    output_vrt = output_raster + "_n" + str(int(max_band_lat)) + "s" + str(int(min_band_lat)) + "_standpar" + str(int(stand_par)) + "_global0.vrt"
-    vrt0 = f"python NewStandardPar_Equi.py -of VRT -clat 0 {output_tile} {output_vrt}"
-    subprocess.call(vrt0, shell=True)
-
-print("Extraction complete!")
+import multiprocessing
+
+#standard parallel logic is run in-process, from the copy next to this script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from NewStandardPar_Equi import NewStandardPar
+
+gdal.UseExceptions()
+
+
+# =============================================================================
+# If missing args, print usage and exit
+def Usage():
+    print("")
+    print("Split a global equirectangular raster into latitude bands, each with a")
+    print("local standard parallel (HiRISE scheme) plus a _global0.vrt with it at 0")
+    print("")
+    print("Usage: split_equi_5deg_lat_bands.py [-band_size 5] [-res 100] [-radius 1737400]")
+    print("          [-minlat -90] [-maxlat 90] [-geogcs IAU_2015:30100]")
+    print("          [-threads N] [-cachemax MB] [-warp_threads N] input_raster output_prefix")
+    print("")
+    print("  -band_size  band height in degrees")
+    print("  -res        output resolution in meters")
+    print("  -radius     body radius in meters (default Moon)")
+    print("  -geogcs     geographic SRS of the band bounds")
+    print("  -threads    bands warped at the same time (default all cores)")
+    print("  -cachemax   GDAL_CACHEMAX of each worker in MB (default 512)")
+    print("  -warp_threads  warp threads of each worker (default 1)")
+    print("")
+    sys.exit(1)
+
+
+# =============================================================================
+# Latitude as written in band names, fractions kept: 5 -> "5", -2.5 -> "-2p5"
+def LatName(lat):
+    return ("%.6g" % lat).replace(".", "p")
+
+
+# =============================================================================
+# Latitude bands as (min_band_lat, max_band_lat, stand_par, output_tile, output_vrt)
+def LatBands(output_raster, min_lat, max_lat, latband_size):
+    bands = []
+    k = 0
+    # band edges are computed from min_lat, not summed, so they don't drift
+    while min_lat + k * latband_size < max_lat:
+        min_band_lat = min_lat + k * latband_size
+        max_band_lat = min(min_band_lat + latband_size, max_lat)
+        if (max_band_lat > 0):
+           stand_par = min_band_lat
+        else:
+           stand_par = max_band_lat
+
+        name = output_raster + "_n" + LatName(max_band_lat) + "s" + LatName(min_band_lat) + "_standpar" + LatName(stand_par)
+        bands.append((min_band_lat, max_band_lat, stand_par, name + ".tif", name + "_global0.vrt"))
+        k = k + 1
+    return bands
+
+
+# =============================================================================
+# Source pixel window (xoff, yoff, xsize, ysize) covering each band, or None
+# for the whole source when the bounds can't be transformed. The bands are
+# global, so the window keeps every column (the source may run 0 to 360)
+# and only the rows are cut. The band edges are sampled since they need
+# not be straight lines in the source SRS.
+def SourceWindows(hDataset, bands, geogcs, margin=2):
+    gt = hDataset.GetGeoTransform()
+    inv = gdal.InvGeoTransform(gt)
+    if inv is None or gt[2] != 0.0 or gt[4] != 0.0:
+        return [None for band in bands]
+    srcSRS = osr.SpatialReference()
+    srcSRS.ImportFromWkt(hDataset.GetProjection())
+    geoSRS = osr.SpatialReference()
+    geoSRS.SetFromUserInput(geogcs)
+    for srs in (srcSRS, geoSRS):
+        if hasattr(srs, "SetAxisMappingStrategy"):
+            srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    ct = osr.CoordinateTransformation(geoSRS, srcSRS)
+
+    windows = []
+    steps = 36
+    for (min_band_lat, max_band_lat, stand_par, output_tile, output_vrt) in bands:
+        points = []
+        for k in range(steps + 1):
+            lon = -180.0 + 360.0 * k / steps
+            lat = min_band_lat + (max_band_lat - min_band_lat) * k / steps
+            points.extend([(lon, min_band_lat), (lon, max_band_lat),
+                           (-180.0, lat), (180.0, lat)])
+        try:
+            xy = ct.TransformPoints(points)
+        except Exception:
+            windows.append(None)
+            continue
+        rows = [inv[3] + inv[4] * x + inv[5] * y for (x, y, z) in xy]
+        yoff = max(0, int(min(rows)) - margin)
+        yend = min(hDataset.RasterYSize, int(max(rows)) + 1 + margin)
+        if yend <= yoff:
+            windows.append(None)
+        else:
+            windows.append((0, yoff, hDataset.RasterXSize, yend - yoff))
+    return windows
+
+
+# =============================================================================
+# Per worker GDAL settings and the source, opened once as each pool process
+# starts so its SRS, overviews and block cache are shared by all its bands
+_source = None
+
+def InitWorker(input_raster, cachemax):
+    global _source
+    gdal.SetCacheMax(cachemax * 1024 * 1024)
+    _source = gdal.Open(input_raster)
+
+
+# =============================================================================
+# Warp one latitude band, then write its standard parallel 0 VRT.
+# Returns (output_tile, seconds, error); error is None on success.
+def WarpBand(job):
+    (band, window, options) = job
+    (min_band_lat, max_band_lat, stand_par, output_tile, output_vrt) = band
+    t0 = time.time()
+    try:
+        # only the rows of the source under this band are read; a VRT
+        # window keeps the source overviews, so coarser outputs read those
+        if window is None:
+            source = _source
+        else:
+            source = gdal.Translate("", _source, format="VRT", srcWin=list(window))
+
+        # Use gdal.Warp to crop, apply projection, and set output resolution
+        # (the overview closest to -res is picked by default, GDAL >= 2.0)
+        gdal.Warp(
+            output_tile,
+            source,
+            dstSRS=f"+proj=eqc +lat_ts={stand_par} +R={options['radius']}",  # Equirectangular projection with dynamic standard parallel
+            outputBounds=[-180, min_band_lat, 180, max_band_lat],  # Geographic bounds (longitude, latitude)
+            outputBoundsSRS=options['geogcs'],  # Geographic coordinate system
+            xRes=options['res'],  # Set horizontal resolution
+            yRes=options['res'],  # Set vertical resolution
+            multithread=options['warp_threads'] > 1,
+            warpOptions=["NUM_THREADS=%d" % options['warp_threads']],
+            warpMemoryLimit=options['cachemax'] * 1024 * 1024 // 2
+        )
+
+        # same as: NewStandardPar_Equi.py -of VRT -clat 0 {output_tile} {output_vrt}
+        if NewStandardPar(output_tile, output_vrt, 0.0, "VRT", quiet=True) != 0:
+            return (output_tile, time.time() - t0, "failed to write " + output_vrt)
+    except Exception as e:
+        return (output_tile, time.time() - t0, str(e))
+    return (output_tile, time.time() - t0, None)
+
+
+# =============================================================================
+def main(argv):
+
+    # Define source raster and output parameters
+    input_raster = None
+    output_raster = None
+    min_lat = -90  # Adjust as needed
+    max_lat = 90
+    latband_size = 5  # Degrees
+    options = {'res' : 100, 'radius' : 1737400, 'geogcs' : "IAU_2015:30100",
+               'cachemax' : 512, 'warp_threads' : 1}
+    threads = multiprocessing.cpu_count()
+
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+        if arg == "-band_size":
+            i = i + 1
+            latband_size = float(argv[i])
+        elif arg == "-res":
+            i = i + 1
+            options['res'] = float(argv[i])
+        elif arg == "-radius":
+            i = i + 1
+            options['radius'] = float(argv[i])
+        elif arg == "-minlat":
+            i = i + 1
+            min_lat = float(argv[i])
+        elif arg == "-maxlat":
+            i = i + 1
+            max_lat = float(argv[i])
+        elif arg == "-geogcs":
+            i = i + 1
+            options['geogcs'] = argv[i]
+        elif arg == "-threads":
+            i = i + 1
+            threads = int(argv[i])
+        elif arg == "-cachemax":
+            i = i + 1
+            options['cachemax'] = int(argv[i])
+        elif arg == "-warp_threads":
+            i = i + 1
+            options['warp_threads'] = int(argv[i])
+        elif arg[0] == "-":
+            Usage()
+        elif input_raster is None:
+            input_raster = arg
+        elif output_raster is None:
+            output_raster = arg
+        else:
+            Usage()
+        i = i + 1
+
+    if input_raster is None or output_raster is None:
+        Usage()
+    if latband_size <= 0 or min_lat >= max_lat:
+        Usage()
+
+    # Extract latitude bands, with local standard parallel, following HIRISE scheme
+    bands = LatBands(output_raster, min_lat, max_lat, latband_size)
+    hDataset = gdal.Open(input_raster)
+    windows = SourceWindows(hDataset, bands, options['geogcs'])
+    hDataset = None
+    jobs = [(bands[k], windows[k], options) for k in range(len(bands))]
+
+    t0 = time.time()
+    threads = max(1, min(threads, len(jobs)))
+    pool = multiprocessing.Pool(threads, InitWorker, (input_raster, options['cachemax']))
+    nFailed = 0
+    for (output_tile, seconds, error) in pool.imap_unordered(WarpBand, jobs):
+        if error is None:
+            print("wrote: %s (%.1f s)" % (output_tile, seconds))
+        else:
+            nFailed = nFailed + 1
+            print("FAILED: %s (%s)" % (output_tile, error))
+    pool.close()
+    pool.join()
+
+    print("Extraction complete! %d bands, %d failed, %.1f s on %d workers" %
+          (len(jobs), nFailed, time.time() - t0, threads))
+    if nFailed > 0:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,437 @@
+#!/usr/bin/env python
+###############################################################################
+# $Id$
+#
+# Project:  GDAL Python samples
+# Purpose:  Importable pixel <-> projected (meters or feet) <-> long,lat
+#           conversions shared by pixel2longlat.py, pixel2meters.py,
+#           longlat2meters.py and meters2longlat.py. Geotransforms, inverse
+#           geotransforms and coordinate transformations are cached per
+#           dataset so many rasters can be used without reopening them.
+# Based on tolatlong by Andrey Kiselev, dron@remotesensing.org
+#
+###############################################################################
+# Copyright (c) 2003, Andrey Kiselev <dron@remotesensing.org>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+###############################################################################
+#
+# Usage from python:
+#
+#   import gdal2coordinates
+#   lon, lat = gdal2coordinates.pixel2longlat('in.tif', samples, lines)
+#
+# Coordinates may be scalars, sequences or numpy arrays and are returned in
+# the same form (numpy arrays for any non-scalar input when numpy is present).
+# Pixel coordinates refer to the center of the pixel as in the scripts.
+#
+# Start up cost: gdal, osr and numpy are only imported when needed. The
+# geotransform, WKT and (for geographic and Equirectangular rasters, the
+# usual planetary case) the projection parameters of each raster are kept
+# in a small cache file keyed by path, size and modification time (of the
+# raster, its usual georeferencing sidecars and the other files GDAL read
+# it from), so a repeated single point conversion neither imports GDAL nor
+# opens the raster. The cache lives in ~/.cache/gdal2coordinates unless the
+# GDAL2COORDINATES_CACHE environment variable names another directory (set
+# it to an empty string to disable the cache).
+
+import hashlib
+import json
+import math
+import os
+
+gdal = None
+osr = None
+np = None
+
+def _LoadGDAL():
+    """Import gdal and osr the first time they are needed."""
+    global gdal, osr
+    if gdal is None:
+        try:
+            from osgeo import gdal as _gdal
+            from osgeo import osr as _osr
+        except ImportError:
+            import gdal as _gdal
+            import osr as _osr
+        gdal, osr = _gdal, _osr
+
+def _LoadNumPy():
+    """Import numpy the first time arrays are converted, None if missing."""
+    global np
+    if np is None:
+        try:
+            import numpy as _np
+        except ImportError:
+            return None
+        np = _np
+    return np
+
+# =============================================================================
+def ReadPoints( fp, chunk = 65536 ):
+    """Yield lists of up to chunk coordinate pairs read from fp.
+
+    Each line holds two numbers separated by spaces, tabs or a comma. Blank
+    lines and lines starting with # are skipped.
+    """
+    points = []
+    for text in fp:
+        text = text.strip()
+        if not text or text.startswith('#'):
+            continue
+        values = text.replace(',', ' ').split()
+        points.append((float(values[0]), float(values[1])))
+        if len(points) == chunk:
+            yield points
+            points = []
+    if points:
+        yield points
+
+# =============================================================================
+def DecToDMS( angle, axis, precision = 2 ):
+    """Pure python version of gdal.DecToDMS(), same output format."""
+    epsilon = (0.5 / 3600.0) * math.pow(0.1, precision)
+    absAngle = abs(angle) + epsilon
+    if absAngle > 361.0:
+        return 'Invalid angle'
+    degrees = int(absAngle)
+    minutes = int((absAngle - degrees) * 60)
+    seconds = absAngle * 3600 - degrees * 3600 - minutes * 60
+    if seconds > epsilon * 3600.0:
+        seconds = seconds - epsilon * 3600.0
+    if axis.lower() == 'long':
+        hemisphere = 'W' if angle < 0.0 else 'E'
+    else:
+        hemisphere = 'S' if angle < 0.0 else 'N'
+    return '%3dd%2d\'%*.*f"%s' % (degrees, minutes, precision + 3, precision,
+                                  seconds, hemisphere)
+
+# =============================================================================
+def _ToArrays( a, b ):
+    """Return a, b as flat float arrays and a flag telling whether the input
+    was a single point. Single points and inputs without numpy use lists."""
+    scalar = not hasattr(a, '__len__') and not hasattr(a, 'shape')
+    if scalar:
+        return [float(a)], [float(b)], scalar
+    if _LoadNumPy() is not None:
+        return np.atleast_1d(np.asarray(a, dtype=np.float64)), \
+               np.atleast_1d(np.asarray(b, dtype=np.float64)), scalar
+    return [float(v) for v in a], [float(v) for v in b], scalar
+
+def _FromArrays( a, b, scalar ):
+    if scalar:
+        return float(a[0]), float(b[0])
+    return a, b
+
+def _Apply( func, a, b ):
+    """Apply func(a, b) -> (c, d) elementwise to lists, or at once to arrays."""
+    if isinstance(a, list):
+        out = [func(u, v) for (u, v) in zip(a, b)]
+        return [o[0] for o in out], [o[1] for o in out]
+    return func(a, b)
+
+def _Affine( gt, a, b, shift = 0.0 ):
+    """Apply a 6 term geotransform to (a + shift, b + shift)."""
+    return _Apply(lambda p, l: (gt[0] + gt[1] * (p + shift) + gt[2] * (l + shift),
+                                gt[3] + gt[4] * (p + shift) + gt[5] * (l + shift)), a, b)
+
+def _AdjLon( lon ):
+    """Wrap longitudes outside -180..180 as PROJ does."""
+    if hasattr(lon, 'shape'):
+        return np.where(np.abs(lon) <= 180.0, lon, ((lon + 180.0) % 360.0) - 180.0)
+    if abs(lon) <= 180.0:
+        return lon
+    return ((lon + 180.0) % 360.0) - 180.0
+
+def _Transform( ct, a, b ):
+    """Run coordinate arrays through an osr.CoordinateTransformation."""
+    out = ct.TransformPoints(list(zip([float(v) for v in a], [float(v) for v in b])))
+    x = [o[0] for o in out]
+    y = [o[1] for o in out]
+    if not isinstance(a, list):
+        return np.asarray(x), np.asarray(y)
+    return x, y
+
+# =============================================================================
+# Projections computed without osr. These reproduce the PROJ formulas, which
+# for Equirectangular are spherical and use the semi-major axis only.
+
+EQUIRECTANGULAR = ('Equirectangular', 'Equidistant_Cylindrical', 'Plate_Carree')
+
+def _Projection( wkt ):
+    """Parameters of a projection we can compute in python, else None."""
+    srs = osr.SpatialReference()
+    if not wkt or srs.ImportFromWkt(wkt) != 0:
+        return None
+    if abs(srs.GetAngularUnits() - math.pi / 180.0) > 1e-12:
+        return None
+    if srs.IsGeographic():
+        return { 'type': 'longlat' }
+    if srs.IsProjected() and srs.GetAttrValue('PROJECTION') in EQUIRECTANGULAR:
+        return { 'type': 'eqc',
+                 'a': srs.GetSemiMajor(),
+                 'to_meter': srs.GetLinearUnits(),
+                 'lon_0': srs.GetProjParm('central_meridian', 0.0),
+                 'lat_0': srs.GetProjParm('latitude_of_origin', 0.0),
+                 'lat_ts': srs.GetProjParm('standard_parallel_1', 0.0),
+                 'x_0': srs.GetProjParm('false_easting', 0.0),
+                 'y_0': srs.GetProjParm('false_northing', 0.0) }
+    return None
+
+def _ProjectionFunctions( prj ):
+    """(to long,lat, from long,lat) functions for a _Projection() result."""
+    if prj['type'] == 'longlat':
+        return (lambda x, y: (x, y)), (lambda lon, lat: (lon, lat))
+    rad = prj['a'] / prj['to_meter'] * math.pi / 180.0
+    xscale = rad * math.cos(math.radians(prj['lat_ts']))
+    def toLongLat( x, y ):
+        return _AdjLon((x - prj['x_0']) / xscale + prj['lon_0']), \
+               (y - prj['y_0']) / rad + prj['lat_0']
+    def fromLongLat( lon, lat ):
+        return _AdjLon(lon - prj['lon_0']) * xscale + prj['x_0'], \
+               (lat - prj['lat_0']) * rad + prj['y_0']
+    return toLongLat, fromLongLat
+
+# =============================================================================
+# On disk cache of georeferencing, one small json file per raster
+
+def _CacheDir():
+    return os.environ.get('GDAL2COORDINATES_CACHE',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'gdal2coordinates'))
+
+def _CacheFile( path ):
+    cacheDir = _CacheDir()
+    if not cacheDir:
+        return None
+    return os.path.join(cacheDir, hashlib.md5(path.encode('utf-8')).hexdigest() + '.json')
+
+def _FileStats( names ):
+    """[name, mtime, size] of each file, mtime and size None if missing."""
+    stats = []
+    for name in names:
+        try:
+            st = os.stat(name)
+            stats.append([name, st.st_mtime, st.st_size])
+        except OSError:
+            stats.append([name, None, None])
+    return stats
+
+def _Sidecars( infile ):
+    """Files that may hold georeferencing for infile (PAM .aux.xml, world
+    files, .prj, ISIS/PDS .lbl), whether or not they exist yet."""
+    base, ext = os.path.splitext(infile)
+    names = [infile + '.aux.xml', base + '.aux.xml', base + '.wld',
+             infile + 'w', base + '.prj', base + '.lbl']
+    if len(ext) > 2:
+        names.append(base + ext[:2] + ext[-1] + 'w')
+    return names
+
+def _Stat( infile ):
+    """(mtime, size) of a local file and the stat of its sidecars, None for
+    other GDAL names (/vsicurl/...). A sidecar appearing, changing or
+    going away (e.g. an .aux.xml written by NewCenterLon_Equi.py -inplace)
+    changes the result."""
+    try:
+        st = os.stat(infile)
+    except OSError:
+        return None
+    return [st.st_mtime, st.st_size, _FileStats(_Sidecars(infile))]
+
+def _ReadCache( path, stat ):
+    cacheFile = _CacheFile(path)
+    if stat is None or cacheFile is None:
+        return None
+    try:
+        with open(cacheFile) as fp:
+            record = json.load(fp)
+    except (IOError, OSError, ValueError):
+        return None
+    if record.get('path') != path or record.get('stat') != stat:
+        return None
+    if _FileStats([f[0] for f in record.get('files', [])]) != record.get('files', []):
+        return None
+    return record
+
+def _WriteCache( path, stat, record ):
+    cacheFile = _CacheFile(path)
+    if stat is None or cacheFile is None:
+        return
+    record = dict(record, path=path, stat=stat)
+    try:
+        if not os.path.isdir(os.path.dirname(cacheFile)):
+            os.makedirs(os.path.dirname(cacheFile))
+        tmpFile = '%s.%d.tmp' % (cacheFile, os.getpid())
+        with open(tmpFile, 'w') as fp:
+            json.dump(record, fp)
+        os.rename(tmpFile, cacheFile)
+    except (IOError, OSError):
+        # a cache we cannot write only costs speed
+        pass
+
+# =============================================================================
+class DatasetCoordinates(object):
+    """Georeferencing of one raster, read once and kept for conversions.
+
+    The georeferencing comes from the on disk cache when it is up to date,
+    otherwise the raster is opened with GDAL and the cache refreshed. osr
+    transformations are only built the first time they are needed and only
+    for projections that cannot be computed in python.
+    """
+
+    def __init__( self, infile, stat = None ):
+        path = os.path.abspath(infile)
+        if stat is None:
+            stat = _Stat(infile)
+        record = _ReadCache(path, stat)
+        if record is None:
+            record = self._ReadDataset(infile)
+            _WriteCache(path, stat, record)
+
+        self.infile = infile
+        self.geomatrix = tuple(record['geomatrix'])
+        self.invgeomatrix = tuple(record['invgeomatrix'])
+        self.wkt = record['wkt']
+        self.projection = record['projection']
+        self.files = record.get('files', [])
+
+        self._toLongLat = None
+        self._fromLongLat = None
+
+    @staticmethod
+    def _ReadDataset( infile ):
+        _LoadGDAL()
+        indataset = gdal.Open( infile, gdal.GA_ReadOnly )
+        if indataset is None:
+            raise IOError('Unable to open %s' % infile)
+        geomatrix = indataset.GetGeoTransform()
+        wkt = indataset.GetProjection()
+        # other files the georeferencing may have come from (.hdr, .lbl, ...)
+        sidecars = set(_Sidecars(infile))
+        files = [f for f in (indataset.GetFileList() or [])
+                 if os.path.abspath(f) != os.path.abspath(infile) and f not in sidecars]
+        indataset = None
+
+        inverse = gdal.InvGeoTransform(geomatrix)
+        # GDAL 1.x returns (success, geotransform)
+        if inverse is not None and len(inverse) == 2:
+            inverse = inverse[1] if inverse[0] else None
+        if inverse is None:
+            raise ValueError('Geotransform of %s is not invertible' % infile)
+
+        return { 'geomatrix': list(geomatrix),
+                 'invgeomatrix': list(inverse),
+                 'wkt': wkt,
+                 'projection': _Projection(wkt),
+                 'files': _FileStats(files) }
+
+    def _Transformations( self ):
+        if self.projection is not None:
+            toLongLat, fromLongLat = _ProjectionFunctions(self.projection)
+            self._toLongLat = lambda a, b: _Apply(toLongLat, a, b)
+            self._fromLongLat = lambda a, b: _Apply(fromLongLat, a, b)
+            return
+
+        _LoadGDAL()
+        srs = osr.SpatialReference()
+        srs.ImportFromWkt(self.wkt)
+        srsLatLong = srs.CloneGeogCS()
+        if hasattr(osr, 'OAMS_TRADITIONAL_GIS_ORDER'):
+            # keep long,lat (X,Y) axis order with GDAL 3 and later
+            srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            srsLatLong.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        toLongLat = osr.CoordinateTransformation(srs, srsLatLong)
+        fromLongLat = osr.CoordinateTransformation(srsLatLong, srs)
+        self._toLongLat = lambda a, b: _Transform(toLongLat, a, b)
+        self._fromLongLat = lambda a, b: _Transform(fromLongLat, a, b)
+
+    def pixel2meters( self, pixel, line ):
+        """Sample, line (pixel center) to projected X, Y."""
+        pixel, line, scalar = _ToArrays(pixel, line)
+        return _FromArrays(*_Affine(self.geomatrix, pixel, line, 0.5), scalar=scalar)
+
+    def meters2pixel( self, X, Y ):
+        """Projected X, Y to (fractional) sample, line of the pixel center."""
+        X, Y, scalar = _ToArrays(X, Y)
+        pixel, line = _Affine(self.invgeomatrix, X, Y)
+        return _FromArrays(*_Apply(lambda p, l: (p - 0.5, l - 0.5), pixel, line),
+                           scalar=scalar)
+
+    def meters2longlat( self, X, Y ):
+        """Projected X, Y to long, lat."""
+        if self._toLongLat is None:
+            self._Transformations()
+        X, Y, scalar = _ToArrays(X, Y)
+        return _FromArrays(*self._toLongLat(X, Y), scalar=scalar)
+
+    def longlat2meters( self, long, lat ):
+        """Long, lat to projected X, Y."""
+        if self._fromLongLat is None:
+            self._Transformations()
+        long, lat, scalar = _ToArrays(long, lat)
+        return _FromArrays(*self._fromLongLat(long, lat), scalar=scalar)
+
+    def pixel2longlat( self, pixel, line ):
+        """Sample, line (pixel center) to long, lat."""
+        return self.meters2longlat(*self.pixel2meters(pixel, line))
+
+    def longlat2pixel( self, long, lat ):
+        """Long, lat to (fractional) sample, line of the pixel center."""
+        return self.meters2pixel(*self.longlat2meters(long, lat))
+
+# =============================================================================
+# Per dataset cache, a dataset is re-read when its modification time, or
+# that of one of its sidecars, changes
+
+_cache = {}
+
+def Open( infile ):
+    """Return the cached DatasetCoordinates for infile."""
+    key = os.path.abspath(infile)
+    stat = _Stat(infile)
+    entry = _cache.get(key)
+    if entry is None or entry[0] != stat or \
+       _FileStats([f[0] for f in entry[1].files]) != entry[1].files:
+        entry = (stat, DatasetCoordinates(infile, stat))
+        _cache[key] = entry
+    return entry[1]
+
+def ClearCache():
+    """Forget all datasets cached in memory (the cache files are kept)."""
+    _cache.clear()
+
+# =============================================================================
+# Module level shortcuts through the per dataset cache
+
+def pixel2meters( infile, pixel, line ):
+    return Open(infile).pixel2meters(pixel, line)
+
+def meters2pixel( infile, X, Y ):
+    return Open(infile).meters2pixel(X, Y)
+
+def meters2longlat( infile, X, Y ):
+    return Open(infile).meters2longlat(X, Y)
+
+def longlat2meters( infile, long, lat ):
+    return Open(infile).longlat2meters(long, lat)
+
+def pixel2longlat( infile, pixel, line ):
+    return Open(infile).pixel2longlat(pixel, line)
+
+def longlat2pixel( infile, long, lat ):
+    return Open(infile).longlat2pixel(long, lat)
@@ -30,16 +30,10 @@
 # DEALINGS IN THE SOFTWARE.
 ###############################################################################
 
-try:
-    from osgeo import gdal
-    from osgeo import osr
-    from osgeo.gdalconst import *
-except ImportError:
-    import gdal
-    from gdalconst import *
-
 import sys
 
+from gdal2coordinates import Open, ReadPoints
+
 # =============================================================================
 def Usage():
     print('')
@@ -47,12 +41,17 @@ def Usage():
     print('the projection from the input image.')
     print('')
     print('Usage: longlat2meters.py long lat infile')
+    print('       longlat2meters.py -batch coordfile|- infile')
+    print('')
+    print('With -batch, read one pair per line from coordfile (or stdin for -) and')
+    print('write tab separated input and converted values to stdout.')
     print('')
     sys.exit( 1 )
 
 # =============================================================================
 
 infile = None
+batch = None
 long = None
 lat = None
 
@@ -63,10 +62,14 @@ i = 1
 while i < len(sys.argv):
     arg = sys.argv[i]
 
-    if long is None:
+    if arg == '-batch':
+        i = i + 1
+        batch = sys.argv[i]
+
+    elif batch is None and long is None:
         long = float(arg)
 
-    elif lat is None:
+    elif batch is None and lat is None:
         lat = float(arg)
 
     elif infile is None:
@@ -79,33 +82,24 @@ while i < len(sys.argv):
 
 if infile is None:
     Usage()
-if lat is None:
+if batch is None and (lat is None or long is None):
     Usage()
-if long is None:
-    Usage()
-
-# Open input dataset
-indataset = gdal.Open( infile, GA_ReadOnly )
 
-# Read geotransform matrix and calculate ground coordinates
-#geomatrix = indataset.GetGeoTransform()
-#X = geomatrix[0] + geomatrix[1] * pixel + geomatrix[2] * line
-#Y = geomatrix[3] + geomatrix[4] * pixel + geomatrix[5] * line
+# Open input dataset and read its georeferencing
+coords = Open( infile )
 
-# Shift to the center of the pixel
-#X += geomatrix[1] / 2.0
-#Y += geomatrix[5] / 2.0
+if batch is not None:
+    # Convert all points with the one transformation, a chunk at a time
+    fp = sys.stdin if batch == '-' else open(batch)
+    for points in ReadPoints(fp):
+        longs, lats = zip(*points)
+        Xs, Ys = coords.longlat2meters(longs, lats)
+        sys.stdout.write(''.join(['%f\t%f\t%f\t%f\n' % row
+                                  for row in zip(longs, lats, Xs, Ys)]))
+    sys.exit( 0 )
 
-# Build Spatial Reference object based on coordinate system, fetched from the
-# opened dataset
-srs = osr.SpatialReference()
-srs.ImportFromWkt(indataset.GetProjection())
-
-srsLatLong = srs.CloneGeogCS()
-ct = osr.CoordinateTransformation(srsLatLong, srs)
-(X, Y, height) = ct.TransformPoint(long, lat)
+(X, Y) = coords.longlat2meters(long, lat)
 
 # Report results
 print('longitude: %f\t\tlatitude: %f' % (long, lat))
 print('X: %f\t\tY: %f' % (X, Y))
-
@@ -30,16 +30,10 @@
 # DEALINGS IN THE SOFTWARE.
 ###############################################################################
 
-try:
-    from osgeo import gdal
-    from osgeo import osr
-    from osgeo.gdalconst import *
-except ImportError:
-    import gdal
-    from gdalconst import *
-
 import sys
 
+from gdal2coordinates import Open, ReadPoints, DecToDMS
+
 # =============================================================================
 def Usage():
     print('')
@@ -47,12 +41,17 @@ def Usage():
     print('projection from given image.')
     print('')
     print('Usage: meters2longlat.py X Y infile')
+    print('       meters2longlat.py -batch coordfile|- infile')
+    print('')
+    print('With -batch, read one pair per line from coordfile (or stdin for -) and')
+    print('write tab separated input and converted values to stdout.')
     print('')
     sys.exit( 1 )
 
 # =============================================================================
 
 infile = None
+batch = None
 X = None
 Y = None
 
@@ -63,10 +62,14 @@ i = 1
 while i < len(sys.argv):
     arg = sys.argv[i]
 
-    if X is None:
+    if arg == '-batch':
+        i = i + 1
+        batch = sys.argv[i]
+
+    elif batch is None and X is None:
         X = float(arg)
 
-    elif Y is None:
+    elif batch is None and Y is None:
         Y = float(arg)
 
     elif infile is None:
@@ -79,34 +82,25 @@ while i < len(sys.argv):
 
 if infile is None:
     Usage()
-if X is None:
+if batch is None and (X is None or Y is None):
     Usage()
-if Y is None:
-    Usage()
-
-# Open input dataset
-indataset = gdal.Open( infile, GA_ReadOnly )
 
-# Read geotransform matrix and calculate ground coordinates
-geomatrix = indataset.GetGeoTransform()
-#X = geomatrix[0] + geomatrix[1] * pixel + geomatrix[2] * line
-#Y = geomatrix[3] + geomatrix[4] * pixel + geomatrix[5] * line
+# Open input dataset and read its georeferencing
+coords = Open( infile )
 
-# Shift to the center of the pixel
-#X += geomatrix[1] / 2.0
-#Y += geomatrix[5] / 2.0
+if batch is not None:
+    # Convert all points with the one transformation, a chunk at a time
+    fp = sys.stdin if batch == '-' else open(batch)
+    for points in ReadPoints(fp):
+        Xs, Ys = zip(*points)
+        longs, lats = coords.meters2longlat(Xs, Ys)
+        sys.stdout.write(''.join(['%f\t%f\t%.6f\t%.6f\n' % row
+                                  for row in zip(Xs, Ys, longs, lats)]))
+    sys.exit( 0 )
 
-# Build Spatial Reference object based on coordinate system, fetched from the
-# opened dataset
-srs = osr.SpatialReference()
-srs.ImportFromWkt(indataset.GetProjection())
-
-srsLatLong = srs.CloneGeogCS()
-ct = osr.CoordinateTransformation(srs, srsLatLong)
-(long, lat, height) = ct.TransformPoint(X, Y)
+(long, lat) = coords.meters2longlat(X, Y)
 
 # Report results
 print('X: %f\t\t\tY: %f' % (X, Y))
 print('longitude: %.6f\t\t\tlatitude: %.6f' % (long, lat))
-print('longitude: %s\t\tlatitude: %s' % (gdal.DecToDMS(long, 'Long', 2), gdal.DecToDMS(lat, 'Lat', 2)))
-
+print('longitude: %s\t\tlatitude: %s' % (DecToDMS(long, 'Long', 2), DecToDMS(lat, 'Lat', 2)))
@@ -30,16 +30,10 @@
 # DEALINGS IN THE SOFTWARE.
 ###############################################################################
 
-try:
-    from osgeo import gdal
-    from osgeo import osr
-    from osgeo.gdalconst import *
-except ImportError:
-    import gdal
-    from gdalconst import *
-
 import sys
 
+from gdal2coordinates import Open, ReadPoints, DecToDMS
+
 # =============================================================================
 def Usage():
     print('')
@@ -47,13 +41,18 @@ def Usage():
     print('file and report latitude/longitude coordinates for the center')
     print('of the specified pixel.')
     print('')
-    print('Usage: tolatlong.py sample line infile')
+    print('Usage: pixel2longlat.py sample line infile')
+    print('       pixel2longlat.py -batch coordfile|- infile')
+    print('')
+    print('With -batch, read one pair per line from coordfile (or stdin for -) and')
+    print('write tab separated input and converted values to stdout.')
     print('')
     sys.exit( 1 )
 
 # =============================================================================
 
 infile = None
+batch = None
 pixel = None
 line = None
 
@@ -64,10 +63,14 @@ i = 1
 while i < len(sys.argv):
     arg = sys.argv[i]
 
-    if pixel is None:
+    if arg == '-batch':
+        i = i + 1
+        batch = sys.argv[i]
+
+    elif batch is None and pixel is None:
         pixel = float(arg)
 
-    elif line is None:
+    elif batch is None and line is None:
         line = float(arg)
 
     elif infile is None:
@@ -80,34 +83,25 @@ while i < len(sys.argv):
 
 if infile is None:
     Usage()
-if pixel is None:
+if batch is None and (pixel is None or line is None):
     Usage()
-if line is None:
-    Usage()
-
-# Open input dataset
-indataset = gdal.Open( infile, GA_ReadOnly )
 
-# Read geotransform matrix and calculate ground coordinates
-geomatrix = indataset.GetGeoTransform()
-X = geomatrix[0] + geomatrix[1] * pixel + geomatrix[2] * line
-Y = geomatrix[3] + geomatrix[4] * pixel + geomatrix[5] * line
+# Open input dataset and read its georeferencing
+coords = Open( infile )
 
-# Shift to the center of the pixel
-X += geomatrix[1] / 2.0
-Y += geomatrix[5] / 2.0
+if batch is not None:
+    # Convert all points with the one transformation, a chunk at a time
+    fp = sys.stdin if batch == '-' else open(batch)
+    for points in ReadPoints(fp):
+        pixels, lines = zip(*points)
+        longs, lats = coords.pixel2longlat(pixels, lines)
+        sys.stdout.write(''.join(['%g\t%g\t%f\t%f\n' % row
+                                  for row in zip(pixels, lines, longs, lats)]))
+    sys.exit( 0 )
 
-# Build Spatial Reference object based on coordinate system, fetched from the
-# opened dataset
-srs = osr.SpatialReference()
-srs.ImportFromWkt(indataset.GetProjection())
-
-srsLatLong = srs.CloneGeogCS()
-ct = osr.CoordinateTransformation(srs, srsLatLong)
-(long, lat, height) = ct.TransformPoint(X, Y)
+(long, lat) = coords.pixel2longlat(pixel, line)
 
 # Report results
 print('pixel: %g\t\t\tline: %g' % (pixel, line))
 print('longitude: %f\t\tlatitude: %f' % (long, lat))
-print('longitude: %s\tlatitude: %s' % (gdal.DecToDMS(long, 'Long', 2), gdal.DecToDMS(lat, 'Lat', 2)))
-
+print('longitude: %s\tlatitude: %s' % (DecToDMS(long, 'Long', 2), DecToDMS(lat, 'Lat', 2)))
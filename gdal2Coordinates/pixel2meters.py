@@ -29,16 +29,10 @@
 # DEALINGS IN THE SOFTWARE.
 ###############################################################################
 
-try:
-    from osgeo import gdal
-    from osgeo import osr
-    from osgeo.gdalconst import *
-except ImportError:
-    import gdal
-    from gdalconst import *
-
 import sys
 
+from gdal2coordinates import Open, ReadPoints
+
 # =============================================================================
 def Usage():
     print('')
@@ -46,12 +40,17 @@ def Usage():
     print('of the specified pixel.')
     print('')
     print('Usage: pixel2meters.py sample line infile')
+    print('       pixel2meters.py -batch coordfile|- infile')
+    print('')
+    print('With -batch, read one pair per line from coordfile (or stdin for -) and')
+    print('write tab separated input and converted values to stdout.')
     print('')
     sys.exit( 1 )
 
 # =============================================================================
 
 infile = None
+batch = None
 pixel = None
 line = None
 
@@ -62,10 +61,14 @@ i = 1
 while i < len(sys.argv):
     arg = sys.argv[i]
 
-    if pixel is None:
+    if arg == '-batch':
+        i = i + 1
+        batch = sys.argv[i]
+
+    elif batch is None and pixel is None:
         pixel = float(arg)
 
-    elif line is None:
+    elif batch is None and line is None:
         line = float(arg)
 
     elif infile is None:
@@ -78,24 +81,24 @@ while i < len(sys.argv):
 
 if infile is None:
     Usage()
-if pixel is None:
-    Usage()
-if line is None:
+if batch is None and (pixel is None or line is None):
     Usage()
 
-# Open input dataset
-indataset = gdal.Open( infile, GA_ReadOnly )
+# Open input dataset and read its geotransform
+coords = Open( infile )
 
-# Read geotransform matrix and calculate ground coordinates
-geomatrix = indataset.GetGeoTransform()
-X = geomatrix[0] + geomatrix[1] * pixel + geomatrix[2] * line
-Y = geomatrix[3] + geomatrix[4] * pixel + geomatrix[5] * line
+if batch is not None:
+    # Apply the geotransform to all points, a chunk at a time
+    fp = sys.stdin if batch == '-' else open(batch)
+    for points in ReadPoints(fp):
+        pixels, lines = zip(*points)
+        Xs, Ys = coords.pixel2meters(pixels, lines)
+        sys.stdout.write(''.join(['%g\t%g\t%f\t%f\n' % row
+                                  for row in zip(pixels, lines, Xs, Ys)]))
+    sys.exit( 0 )
 
-# Shift to the center of the pixel
-X += geomatrix[1] / 2.0
-Y += geomatrix[5] / 2.0
+(X, Y) = coords.pixel2meters(pixel, line)
 
 # Report results
 print('pixel: %g\t\t\tline: %g' % (pixel, line))
 print('X: %f\t\tY: %f' % (X, Y))
-
@@ -33,6 +33,7 @@
 
 import math
 import sys
+import multiprocessing
 try:
    from osgeo import gdal
    from osgeo.gdalconst import *
@@ -51,105 +52,217 @@ except ImportError:
 
 def Usage():
     print("""
-Usage: gdal2gores.py -ng number_of_gores infile outfile 
+Usage: gdal2gores.py [-ng number_of_gores] [-r near|bilinear|average]
+                     [-threads n] [-bs block_lines] [-q] infile outfile
+
+   -ng      : number of gores (default 8)
+   -r       : resampling used to pull each gore pixel from the source line
+              (default average, which anti-aliases towards the poles)
+   -threads : number of worker processes (default number of CPUs)
+   -bs      : number of lines handed to a worker at a time (default 64)
 """)
     sys.exit(1)
-    
+
+# =============================================================================
+def GoreBlock(block, y0, ysize, gores, resample, nodata=None):
+    """Remap a block of lines (lines y0 .. y0 + len(block) - 1) to gores.
+
+    Rather than pushing source pixels to the nearest output column, every
+    output pixel is inverse-mapped to the source line, so there are no holes.
+    Output pixel centre u (relative to the gore centre) on a line at latitude
+    lat samples the source at u / cos(lat). Lines are evaluated at their
+    centre so the polar lines never collapse to a single pixel.
+    Source pixels equal to nodata (or NaN) are left out of bilinear and
+    average samples; output pixels with no valid source, and the space
+    between the gores, are set to nodata (0 without one).
+    """
+    nlines, xsize = block.shape
+    goreWidth = xsize // gores
+    goreCount = gores * goreWidth
+    values = block.astype(np.float64)
+    valid = ~np.isnan(values)
+    if nodata is not None:
+        valid &= values != nodata
+    weights = valid.astype(np.float64)
+    values = np.where(valid, values, 0.0)
+
+    #output pixel centres and the start of the gore each one belongs to
+    goreStart = (np.arange(goreCount) // goreWidth) * goreWidth
+    u = np.arange(goreCount) + 0.5 - goreStart - goreWidth / 2.0
+    lines = np.arange(y0, y0 + nlines) + 0.5
+    scale = np.cos((-math.pi/2.0) + (math.pi * lines / float(ysize)))[:, np.newaxis]
+
+    inside = np.abs(u) <= scale * (goreWidth / 2.0)
+    lo = goreStart
+    hi = goreStart + goreWidth - 1
+    centre = goreStart + goreWidth / 2.0
+
+    if resample == 'near':
+        k = np.clip(np.floor(centre + u / scale), lo, hi).astype(np.intp)
+        out = np.take_along_axis(values, k, axis=1)
+        count = np.take_along_axis(weights, k, axis=1)
+    elif resample == 'bilinear':
+        #gores only stretch along the line, so bilinear reduces to linear in x
+        t = centre + u / scale - 0.5
+        k0 = np.floor(t)
+        frac = t - k0
+        k1 = np.clip(k0 + 1, lo, hi).astype(np.intp)
+        k0 = np.clip(k0, lo, hi).astype(np.intp)
+        w0 = np.take_along_axis(weights, k0, axis=1) * (1.0 - frac)
+        w1 = np.take_along_axis(weights, k1, axis=1) * frac
+        count = w0 + w1
+        out = (np.take_along_axis(values, k0, axis=1) * w0 + \
+               np.take_along_axis(values, k1, axis=1) * w1) / np.maximum(count, 1e-12)
+    else:
+        #area weighted mean of the source span covered by each output pixel
+        a = np.clip(centre + (u - 0.5) / scale, lo, hi + 1)
+        b = np.clip(centre + (u + 0.5) / scale, lo, hi + 1)
+        def integral(v, t):
+            csum = np.zeros((nlines, xsize + 1))
+            np.cumsum(v, axis=1, out=csum[:, 1:])
+            k = np.minimum(np.floor(t), xsize - 1).astype(np.intp)
+            return np.take_along_axis(csum, k, axis=1) + \
+                   (t - k) * np.take_along_axis(v, k, axis=1)
+
+        #mean over the valid part of the span only
+        count = integral(weights, b) - integral(weights, a)
+        out = (integral(values, b) - integral(values, a)) / np.maximum(count, 1e-12)
+
+    fill = 0
+    if nodata is not None:
+        fill = nodata
+    dst = np.full((nlines, xsize), fill, dtype=np.float64)
+    dst[:, :goreCount] = np.where(inside & (count > 1e-9), out, fill)
+    if np.issubdtype(block.dtype, np.integer):
+        dst = np.round(dst)
+    return dst.astype(block.dtype)
+
 # =============================================================================
-# 	Mainline
+# Worker processes each keep the input open for all of their blocks
+
+_in_dataset = None
+
+def _InitWorker(infile):
+    global _in_dataset
+    _in_dataset = gdal.Open( infile, GA_ReadOnly )
+
+def _GoreWorker(args):
+    y0, nlines, gores, resample = args
+    ysize = _in_dataset.RasterYSize
+    xsize = _in_dataset.RasterXSize
+    blocks = []
+    for band in range(1, _in_dataset.RasterCount + 1):
+        hBand = _in_dataset.GetRasterBand(band)
+        block = hBand.ReadAsArray(0, y0, xsize, nlines)
+        blocks.append(GoreBlock(block, y0, ysize, gores, resample,
+                                hBand.GetNoDataValue()))
+    return y0, blocks
+
 # =============================================================================
-argv = gdal.GeneralCmdLineProcessor( sys.argv )
-
-infile = None
-outfile = None
-gores = None
-quiet = False
-#current hardwired to Tiff output
-format = 'GTiff'
-
-# Parse command line arguments.
-i = 1
-while i < len(sys.argv):
-    arg = argv[i]
-    if arg == '-ng':
+def main( argv = None ):
+
+    argv = gdal.GeneralCmdLineProcessor( argv )
+    if argv is None:
+        return 0
+
+    infile = None
+    outfile = None
+    gores = None
+    resample = 'average'
+    threads = multiprocessing.cpu_count()
+    blockLines = 64
+    quiet = False
+    #current hardwired to Tiff output
+    format = 'GTiff'
+
+    # Parse command line arguments.
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '-ng':
+            i = i + 1
+            gores = int(argv[i])
+        elif arg == '-r':
+            i = i + 1
+            resample = argv[i].lower()
+            if resample not in ('near', 'bilinear', 'average'):
+                Usage()
+        elif arg == '-threads':
+            i = i + 1
+            threads = max(1, int(argv[i]))
+        elif arg == '-bs':
+            i = i + 1
+            blockLines = max(1, int(argv[i]))
+        elif arg == '-q' or arg == '-quiet':
+            quiet = True
+        elif infile is None:
+            infile = arg
+        elif outfile is None:
+            outfile = arg
+        else:
+            Usage()
         i = i + 1
-        gores = int(argv[i])
-    elif arg == '-q' or arg == '-quiet':
-        quiet = True
-    elif infile is None:
-        infile = arg
-    elif outfile is None:
-        outfile = arg
-    else:
+
+    if infile is None:
         Usage()
-    i = i + 1
-
-if infile is None:
-    Usage()
-if  outfile is None:
-    Usage()
-if gores is None:
-    gores = 8
-    print "Warning: Number of gores defaulting to 8, send -nd VALUE to set a different value."
-    
-#Try to open input image
-in_dataset = gdal.Open( infile, GA_ReadOnly )
-
-#need to read band 1 to get data type (Byte, Int16, etc.)
-type = in_dataset.GetRasterBand(1).DataType
-
-#define output format, name, size, type mostly based on input image
-#we are not setting any projection since this a gore image
-out_driver = gdal.GetDriverByName(format)
-outdataset = out_driver.Create(outfile, in_dataset.RasterXSize, \
-             in_dataset.RasterYSize, in_dataset.RasterCount, type)
-
-#gore parameters
-goreWidth = in_dataset.RasterXSize/(gores);
-
-#loop over bands -- probably can handle all bands at once...
-for band in range (1, in_dataset.RasterCount + 1):
-   iBand = in_dataset.GetRasterBand(band)
-   outband = outdataset.GetRasterBand(band)
- 
-   if not quiet:
-      print ("band: " + str(band) + ", "),
-
-   #loop over lines so we can handle huge images
-   for y in range(iBand.YSize - 1, -1, -1):
-      #load whole line as array
-      inline = iBand.ReadAsArray(0, y, iBand.XSize, 1, iBand.XSize, 1)
-
-      #inititialize output array to zeros
-      dstline = np.asarray([0] * iBand.XSize)
-
-      goreStart = 0;
-      goreCenter = goreWidth/2;
-
-      # iterate over each gore as specified by the user
-      # based on C# implementation by winski software
-      for i in range(gores):
-
-         # iterate over each pixel in output gore
-         for x in range(goreWidth):
-            dn = inline[0, goreStart + x]
-            # set new position for pixel value in output array
-            # updated with round to increase overlap at gore edge
-            newX = int(round(goreCenter + math.cos((-math.pi/2.0) + (math.pi * float(y) / float(iBand.YSize))) \
-                       * (x - (goreWidth / 2.0))))
-            dstline[newX] = dn
- 
-         # move start and center to the correct places
-         goreStart = goreStart + goreWidth
-         goreCenter =  goreCenter + goreWidth
-
-      #write out scanline for the current band
-      out_array = np.asarray([dstline])
-      outband.WriteArray(out_array, 0, y)
-
-      #update progress line
-      if not quiet:
-         gdal.TermProgress( 1.0 - (float(y) / iBand.YSize ))
-
-#set output to None to close file
-outdataset = None
+    if  outfile is None:
+        Usage()
+    if gores is None:
+        gores = 8
+        print("Warning: Number of gores defaulting to 8, send -ng VALUE to set a different value.")
+
+    #Try to open input image
+    in_dataset = gdal.Open( infile, GA_ReadOnly )
+    if in_dataset is None:
+        print("Unable to open " + infile)
+        return 1
+
+    #need to read band 1 to get data type (Byte, Int16, etc.)
+    type = in_dataset.GetRasterBand(1).DataType
+    XSize = in_dataset.RasterXSize
+    YSize = in_dataset.RasterYSize
+    bandCount = in_dataset.RasterCount
+    nodata = [in_dataset.GetRasterBand(band).GetNoDataValue() \
+              for band in range(1, bandCount + 1)]
+    in_dataset = None
+
+    #define output format, name, size, type mostly based on input image
+    #we are not setting any projection since this a gore image
+    out_driver = gdal.GetDriverByName(format)
+    outdataset = out_driver.Create(outfile, XSize, YSize, bandCount, type)
+    outBands = [outdataset.GetRasterBand(band) for band in range(1, bandCount + 1)]
+    for outband, value in zip(outBands, nodata):
+        if value is not None:
+            outband.SetNoDataValue(value)
+
+    #hand out blocks of lines, these are written back in order as they finish
+    tasks = [(y0, min(blockLines, YSize - y0), gores, resample) \
+             for y0 in range(0, YSize, blockLines)]
+
+    if threads > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(threads, len(tasks)), _InitWorker, (infile,))
+        results = pool.imap(_GoreWorker, tasks)
+    else:
+        pool = None
+        _InitWorker(infile)
+        results = (_GoreWorker(task) for task in tasks)
+
+    done = 0
+    for y0, blocks in results:
+        for outband, block in zip(outBands, blocks):
+            outband.WriteArray(block, 0, y0)
+        done = done + blocks[0].shape[0]
+        #update progress line
+        if not quiet:
+            gdal.TermProgress( float(done) / YSize )
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    #set output to None to close file
+    outdataset = None
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
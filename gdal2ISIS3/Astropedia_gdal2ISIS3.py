@@ -34,16 +34,33 @@
 
 import sys
 import math
-import datetime
 import time
 import os
-import subprocess
+import hashlib
+import glob
+import multiprocessing
 try:
     from osgeo import gdal
     from osgeo import osr
 except:
     import gdal
     import osr
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+import numpy as np
+from gdal2label import Inspect, PixelType, ISIS3Label, ISIS_LABEL_BYTES
+from gdal2label import GDALInfoReportCorner, LatLongTransform, WriteCoreBSQ
+from gdal2label import StatsNew, StatsAccumulate
+from gdal2label import MD5Writer, WriteManifest
+
+#valid pixel range of each cube pixel type, the values outside it are the
+#ISIS special pixels (Null, Lrs, Lis, His, Hrs). For Real the specials are
+#the floats below VALID_MIN4 (0xFF7FFFFA).
+ISIS_VALID_RANGE = { 'u1' : (1, 254), '<i2' : (-32752, 32767),
+                     '<u2' : (3, 65522),
+                     '<f4' : (-3.4028224522648084e+38, 3.4028234663852886e+38) }
 
 #/************************************************************************/
 #/*                               Usage()                                */
@@ -53,11 +70,16 @@ def Usage(theApp):
     print( '\nUsage: Astropedia_gdal2ISIS3.py in.tif output.cub') # % theApp)
     print( '   optional: to print out image information also send -debug')
     print( '   optional: to just get a label *.lbl, send -noimage')
-    print( '   optional: to attach the *.lbl to the ISIS image -attach - requires ISIS3')
+    print( '   optional: to write a single cube with the label attached, send -attach')
+    print( '   optional: to write a tiled cube (Format = Tile), send -tiled')
+    print( '   optional: to write an MD5 checksum manifest (output.md5), send -md5')
+    print( '             and to set the tile size (default 128 128), send -tileSize 256 256')
     print( '   optional: to get lonsys=360, send -force360')
     print( '   optional: to override the center Longitude, send -centerLon 180')
     print( '   optional: to set scaler and offset send -base 17374000 and/or -multiplier 0.5')
     print( 'Usage: Astropedia_gdal2ISIS3.py -debug in.cub output.cub\n') # % theApp)
+    print( 'Batch: Astropedia_gdal2ISIS3.py [options] -outdir dir in1.tif in2.tif "*.tif" ...')
+    print( '   optional: to convert several files at once, send -threads 4\n')
     print( 'Note: Currently this routine will only work for a limited set of images\n')
     sys.exit(1)
 
@@ -79,28 +101,21 @@ def main( argv = None ):
     bShowRAT=False
     debug = False
     attach = False
+    bTiled = False
+    bMD5 = False
+    tileSamples = 128
+    tileLines = 128
     bStats = False
     bApproxStats = True
     bShowColorTable = True
     bComputeChecksum = False
     bReportHistograms = False
-    pszFilename = None
     papszExtraMDDomains = [ ]
-    pszProjection = None
-    hTransform = None
     bShowFileList = True
-    dst_cub = None
-    dst_lbl = None
-    dst_hst = None
-    bands = 1
-    centLat = 0
-    centLon = 0
+    files = [ ]
+    outdir = None
+    threads = 1
     centerLon = False
-    TMscale = 1.0
-    UpperLeftCornerX = 0
-    UpperLeftCornerY = 0
-    falseEast = 0
-    falseNorth = 0
     bMakeImage = True
     force360 = False
     base = None
@@ -148,8 +163,8 @@ def main( argv = None ):
         elif EQUAL(argv[i], "-force360"):
             force360 = True
         elif EQUAL(argv[i], "-centerLon"):
-		i = i + 1
-		centerLon = float(argv[i])
+            i = i + 1
+            centerLon = float(argv[i])
         elif EQUAL(argv[i], "-mm"):
             bComputeMinMax = True
         elif EQUAL(argv[i], "-hist"):
@@ -179,27 +194,186 @@ def main( argv = None ):
             bShowFileList = False
         elif EQUAL(argv[i], "-noimage"):
             bMakeImage = False
+        elif EQUAL(argv[i], "-tiled"):
+            bTiled = True
+        elif EQUAL(argv[i], "-md5"):
+            bMD5 = True
+        elif EQUAL(argv[i], "-tileSize") and i < nArgc-2:
+            bTiled = True
+            tileSamples = int(argv[i+1])
+            tileLines = int(argv[i+2])
+            i = i + 2
+            if tileSamples < 1 or tileLines < 1:
+                return Usage(argv[0])
         elif EQUAL(argv[i], "-base"):
             i = i + 1
             base = float(argv[i])
         elif EQUAL(argv[i], "-multiplier"):
             i = i + 1
             multiplier = float(argv[i])
+        elif EQUAL(argv[i], "-outdir") and i < nArgc-1:
+            i = i + 1
+            outdir = argv[i]
+        elif EQUAL(argv[i], "-threads") and i < nArgc-1:
+            i = i + 1
+            threads = int(argv[i])
         elif argv[i][0] == '-':
             return Usage(argv[0])
-        elif pszFilename is None:
-            pszFilename = argv[i]
-        elif dst_cub is None:
-            dst_cub = argv[i]
         else:
-            return Usage(argv[0])
+            files.append(argv[i])
 
         i = i + 1
 
-    if pszFilename is None:
-        return Usage(argv[0])
-    if dst_cub is None:
+    #an attached label needs the image behind it
+    if not bMakeImage:
+        attach = False
+
+    options = { 'bComputeMinMax' : bComputeMinMax, 'bSample' : bSample,
+                'bShowGCPs' : bShowGCPs, 'bShowMetadata' : bShowMetadata,
+                'bShowRAT' : bShowRAT, 'debug' : debug, 'attach' : attach,
+                'bTiled' : bTiled, 'bMD5' : bMD5, 'tileSamples' : tileSamples,
+                'tileLines' : tileLines, 'bStats' : bStats,
+                'bApproxStats' : bApproxStats,
+                'bShowColorTable' : bShowColorTable,
+                'bComputeChecksum' : bComputeChecksum,
+                'bReportHistograms' : bReportHistograms,
+                'papszExtraMDDomains' : papszExtraMDDomains,
+                'bShowFileList' : bShowFileList, 'centerLon' : centerLon,
+                'bMakeImage' : bMakeImage, 'force360' : force360,
+                'base' : base, 'multiplier' : multiplier, 'bProgress' : True }
+
+    if outdir is None:
+        if len(files) != 2:
+            return Usage(argv[0])
+        return ConvertToISIS(files[0], files[1], options)
+
+#/* -------------------------------------------------------------------- */
+#/*      Batch: every input goes to outdir/<name>.cub                    */
+#/* -------------------------------------------------------------------- */
+    infiles = [ ]
+    for name in files:
+        if glob.has_magic(name):
+            infiles.extend(sorted(glob.glob(name)))
+        else:
+            infiles.append(name)
+    if len(infiles) == 0:
         return Usage(argv[0])
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    jobs = [ ]
+    outputs = { }
+    for infile in infiles:
+        name = os.path.splitext(os.path.basename(infile))[0] + ".cub"
+        outputs.setdefault(name, [ ]).append(infile)
+        jobs.append((infile, os.path.join(outdir, name), options))
+    #inputs from different folders can share a name, don't let one
+    #overwrite the other
+    nClash = 0
+    for name in sorted(outputs):
+        if len(outputs[name]) > 1:
+            nClash = nClash + 1
+            print('ERROR: %s would be written by: %s' % (
+                  os.path.join(outdir, name), ', '.join(outputs[name])))
+    if nClash > 0:
+        return 1
+
+    #progress bars of concurrent workers would interleave on the terminal
+    if threads > 1 and len(jobs) > 1:
+        options['bProgress'] = False
+
+    t0 = time.time()
+    if threads > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(threads, len(jobs)))
+        results = pool.imap_unordered(_ConvertWorker, jobs)
+    else:
+        pool = None
+        results = (_ConvertWorker(job) for job in jobs)
+
+    nFailed = 0
+    nBytes = 0
+    for (infile, seconds, size, error) in results:
+        if error is None:
+            nBytes = nBytes + size
+            print('%s: %.2f s, %.1f MB/s' % (infile, seconds,
+                  size / 1048576.0 / max(seconds, 1e-6)))
+        else:
+            nFailed = nFailed + 1
+            print('%s: FAILED (%s)' % (infile, error))
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    seconds = time.time() - t0
+    print('%d files, %d failed, %.2f s, %.1f MB/s' % (len(jobs), nFailed,
+          seconds, nBytes / 1048576.0 / max(seconds, 1e-6)))
+    if nFailed > 0:
+        return 1
+    return 0
+
+#/************************************************************************/
+#/*                           _ConvertWorker()                           */
+#/************************************************************************/
+
+def _ConvertWorker( job ):
+    """Convert one (infile, outfile, options) job, for the batch pool.
+
+    Returns (infile, seconds, bytes read, error); error is None on success.
+    ConvertToISIS exits on bad input, which is caught so that one file
+    can't take down the pool.
+    """
+    (infile, outfile, options) = job
+    t0 = time.time()
+    try:
+        ret = ConvertToISIS(infile, outfile, options)
+        error = None
+        if ret:
+            error = 'returned %s' % ret
+    except SystemExit as e:
+        error = 'exit %s' % e.code
+    except Exception as e:
+        error = str(e)
+    try:
+        size = os.path.getsize(infile)
+    except OSError:
+        size = 0
+    return (infile, time.time() - t0, size, error)
+
+#/************************************************************************/
+#/*                           ConvertToISIS()                            */
+#/************************************************************************/
+
+def ConvertToISIS( pszFilename, dst_cub, options ):
+
+    bComputeMinMax = options['bComputeMinMax']
+    bSample = options['bSample']
+    bShowGCPs = options['bShowGCPs']
+    bShowMetadata = options['bShowMetadata']
+    bShowRAT = options['bShowRAT']
+    debug = options['debug']
+    attach = options['attach']
+    bTiled = options['bTiled']
+    bMD5 = options['bMD5']
+    tileSamples = options['tileSamples']
+    tileLines = options['tileLines']
+    bStats = options['bStats']
+    bApproxStats = options['bApproxStats']
+    bShowColorTable = options['bShowColorTable']
+    bComputeChecksum = options['bComputeChecksum']
+    bReportHistograms = options['bReportHistograms']
+    papszExtraMDDomains = options['papszExtraMDDomains']
+    bShowFileList = options['bShowFileList']
+    centerLon = options['centerLon']
+    bMakeImage = options['bMakeImage']
+    force360 = options['force360']
+    base = options['base']
+    multiplier = options['multiplier']
+    bProgress = options['bProgress']
+
+    pszProjection = None
+    hTransform = None
+    dst_lbl = None
+    dst_hst = None
+    bands = 1
 
 #/* -------------------------------------------------------------------- */
 #/*      Open dataset.                                                   */
@@ -215,25 +389,10 @@ def main( argv = None ):
         dst_lbl = dst_lbl.replace("cub","lbl")
         dst_hst = dst_cub.replace("CUB","History.IsisCube")
         dst_hst = dst_hst.replace("cub","History.IsisCube")
-        dst_hdr = dst_cub.replace("CUB","hdr")
-        dst_hdr = dst_hdr.replace("cub","hdr")
-        dst_aux = dst_cub.replace("CUB","cub.aux.xml")
-        dst_aux = dst_aux.replace("cub","cub.aux.xml")
-        if attach:
-            attach_cub = dst_cub
-            dst_cub = "XXX"+dst_cub
-            dst_lbl = "XXX"+dst_lbl
-            dst_hst = "XXX"+dst_hst
-            dst_hdr = "XXX"+dst_hdr
-            dst_aux = "XXX"+dst_aux
         if (EQUAL(dst_lbl,dst_cub)):
             print('Extension must be .CUB or .cub - unable to run using filename: %s' % pszFilename )
             sys.exit(1)
-        else:
-            f = open(dst_lbl,'wt')
-            f_hst = open(dst_hst,'wt')
 
-        
 #    else:
 #        f = sys.stdout
 #        dst_cub = "out.cub"
@@ -264,100 +423,24 @@ def main( argv = None ):
 #/* -------------------------------------------------------------------- */
 #/*      Report projection.                                              */
 #/* -------------------------------------------------------------------- */
-    pszProjection = hDataset.GetProjectionRef()
-    if pszProjection is not None:
-
-        hSRS = osr.SpatialReference()
-        if hSRS.ImportFromWkt(pszProjection ) == gdal.CE_None:
-            pszPrettyWkt = hSRS.ExportToPrettyWkt(False)
-            if debug:
-                print( "Coordinate System is:\n%s" % pszPrettyWkt )
-        else:
-            if debug:
-                print( "Coordinate System is `%s'" % pszProjection )
-
-
-        hSRS = osr.SpatialReference()
-        if hSRS.ImportFromWkt(pszProjection) == gdal.CE_None:
-            pszPrettyWkt = hSRS.ExportToPrettyWkt(False)
-
-            #print( "Coordinate System is:\n%s" % pszPrettyWkt )
-            mapProjection = "None"
-            #Extract projection information
-            target = hSRS.GetAttrValue("DATUM",0)
-            target = target.replace("D_","").replace("_2000","").replace("GCS_","")
-
-            semiMajor = hSRS.GetSemiMajor() 
-            semiMinor = hSRS.GetSemiMinor()
-            if (pszProjection[0:6] == "GEOGCS"):
-                mapProjection = "SimpleCylindrical"
-                centLon = hSRS.GetProjParm('central_meridian')
-
-            if (pszProjection[0:6] == "PROJCS"):
-                mapProjection = hSRS.GetAttrValue("PROJECTION",0)
-
-                if EQUAL(mapProjection,"Sinusoidal"):
-                    centLon = hSRS.GetProjParm('central_meridian')
-
-                if EQUAL(mapProjection,"Equirectangular"):
-                    centLat = hSRS.GetProjParm('standard_parallel_1')
-                    centLon = hSRS.GetProjParm('central_meridian')
-
-                if EQUAL(mapProjection,"Transverse_Mercator"):
-                    mapProjection = "TransverseMercator"
-                    centLat = hSRS.GetProjParm('standard_parallel_1')
-                    centLon = hSRS.GetProjParm('central_meridian')
-                    TMscale = hSRS.GetProjParm('scale_factor')
-                    #Need to research when TM actually applies false values
-                    falseEast =  hSRS.GetProjParm('false_easting')
-                    falseNorth =  hSRS.GetProjParm('false_northing')
-
-                if EQUAL(mapProjection,"Orthographic"):
-                    centLat = hSRS.GetProjParm('standard_parallel_1')
-                    centLon = hSRS.GetProjParm('central_meridian')
-
-                if EQUAL(mapProjection,"Mercator_1SP"):
-                    mapProjection = "Mercator"
-                    centLat = hSRS.GetProjParm('standard_parallel_1')
-                    centLon = hSRS.GetProjParm('central_meridian')
-
-                if EQUAL(mapProjection,"Mercator"):
-                    centLat = hSRS.GetProjParm('standard_parallel_1')
-                    centLon = hSRS.GetProjParm('central_meridian')
-
-                if EQUAL(mapProjection,"Polar_Stereographic"):
-                    mapProjection = "PolarStereographic"
-                    centLat = hSRS.GetProjParm('latitude_of_origin')
-                    centLon = hSRS.GetProjParm('central_meridian')
-
-                if EQUAL(mapProjection,"Stereographic_South_Pole"):
-                    mapProjection = "PolarStereographic"
-                    centLat = hSRS.GetProjParm('latitude_of_origin')
-                    centLon = hSRS.GetProjParm('central_meridian')
-                
-                if EQUAL(mapProjection,"Stereographic_North_Pole"):
-                    mapProjection = "PolarStereographic"
-                    centLat = hSRS.GetProjParm('latitude_of_origin')
-                    centLon = hSRS.GetProjParm('central_meridian')
-            if debug:
-                print( "Coordinate System is:\n%s" % pszPrettyWkt )
-        else:
-            print( "Warning - Currently we can't parse this type of projection" )
-            print( "Coordinate System is `%s'" % pszProjection )
-            target = "n/a"
-            #sys.exit(1)
+    #header values of the label, the projection is parsed once per
+    #unique WKT (see gdal2label.Inspect)
+    record = Inspect(hDataset, pszFilename)
+    pszProjection = record['wkt']
+    if record['srs'] is not None:
+        if debug:
+            print( "Coordinate System is:\n%s" % record['srs']['prettyWkt'] )
+    elif pszProjection is not None and len(pszProjection) > 0:
+        print( "Warning - Currently we can't parse this type of projection" )
+        print( "Coordinate System is `%s'" % pszProjection )
     else:
         print( "Warning - No Coordinate System defined:\n" )
-        target = "n/a"
-        #sys.exit(1)
         
 #/* -------------------------------------------------------------------- */
 #/*      Report Geotransform.                                            */
 #/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
+    adfGeoTransform = record['geoTransform']
     if adfGeoTransform is not None:
-        UpperLeftCornerX = adfGeoTransform[0] - falseEast
-        UpperLeftCornerY = adfGeoTransform[3] - falseNorth
 
         if adfGeoTransform[2] == 0.0 and adfGeoTransform[4] == 0.0:
             if debug:
@@ -379,17 +462,6 @@ def main( argv = None ):
                         adfGeoTransform[4], \
                         adfGeoTransform[5] ))
 
-        #Using a very simple method to calculate cellsize. 
-        #Warning: might not always be good.
-        if (pszProjection[0:6] == "GEOGCS"):
-            #convert degrees/pixel to m/pixel 
-             mapres = 1 / adfGeoTransform[1]
-             mres = adfGeoTransform[1] * (semiMajor * math.pi / 180.0)
-        else:
-            #convert m/pixel to pixel/degree
-             mapres = 1 / (adfGeoTransform[1] / (semiMajor * math.pi / 180.0))
-             mres = adfGeoTransform[1] 
-
 #/* -------------------------------------------------------------------- */
 #/*      Report GCPs.                                                    */
 #/* -------------------------------------------------------------------- */
@@ -489,17 +561,8 @@ def main( argv = None ):
 #/* -------------------------------------------------------------------- */
 #/*      Setup projected to lat/long transform if appropriate.           */
 #/* -------------------------------------------------------------------- */
-    if pszProjection is not None and len(pszProjection) > 0:
-        hProj = osr.SpatialReference( pszProjection )
-        if hProj is not None:
-            hLatLong = hProj.CloneGeogCS()
-
-        if hLatLong is not None:
-            gdal.PushErrorHandler( 'CPLQuietErrorHandler' )
-            hTransform = osr.CoordinateTransformation( hProj, hLatLong )
-            gdal.PopErrorHandler()
-            if gdal.GetLastErrorMsg().find( 'Unable to load PROJ.4 library' ) != -1:
-                hTransform = None
+    if record['srs'] is not None:
+        hTransform = LatLongTransform( record['wkt'] )
 
 #/* -------------------------------------------------------------------- */
 #/*      Report corners.                                                 */
@@ -519,28 +582,14 @@ def main( argv = None ):
                               hDataset.RasterXSize/2.0, \
                               hDataset.RasterYSize/2.0 );
 
-    #Get bounds
-    ulx = GDALGetLon( hDataset, hTransform, 0.0, 0.0 );
-    uly = GDALGetLat( hDataset, hTransform, 0.0, 0.0 );
-    lrx = GDALGetLon( hDataset, hTransform, hDataset.RasterXSize, \
-                          hDataset.RasterYSize );
-    lry = GDALGetLat( hDataset, hTransform, hDataset.RasterXSize, \
-                          hDataset.RasterYSize );
-   
-    if (centerLon):
-       centLon = centerLon
- 
-    #Calculate Simple Cylindrical X,Y in meters from bounds if not projected.
-    #Needs testing.                     
-    if (pszProjection[0:6] == "GEOGCS"):
-        #note that: mres = adfGeoTransform[1] * (semiMajor * math.pi / 180.0)
-        UpperLeftCornerX = semiMajor * (ulx - centLon) * math.pi / 180.0
-        UpperLeftCornerY = semiMajor * uly * math.pi / 180.0
-        
 
 #/* ==================================================================== */
 #/*      Loop over bands.                                                */
 #/* ==================================================================== */
+    #with -noimage no pixel block is read: only cached values are reported
+    #and anything that would need a scan of the image is listed instead
+    bScan = bMakeImage
+    scans = [ ]
     if debug:
         bands = hDataset.RasterCount
         for iBand in range(hDataset.RasterCount):
@@ -576,7 +625,9 @@ def main( argv = None ):
                         if dfMax is not None:
                                 line = line + ("Max=%.3f " % dfMax)
 
-                        if bComputeMinMax:
+                        if bComputeMinMax and not bScan:
+                                scans.append("band %d computed min/max" % (iBand+1))
+                        elif bComputeMinMax:
                                 gdal.ErrorReset()
                                 adfCMinMax = hBand.ComputeRasterMinMax(False)
                                 if gdal.GetLastErrorType() == gdal.CE_None:
@@ -584,16 +635,23 @@ def main( argv = None ):
                                                   adfCMinMax[0], adfCMinMax[1] ))
                         print( line )
 
-                stats = hBand.GetStatistics( bApproxStats, bStats)
+                stats = hBand.GetStatistics( bApproxStats, bStats and bScan)
                 # Dirty hack to recognize if stats are valid. If invalid, the returned
                 # stddev is negative
                 if stats[3] >= 0.0:
                         print( "  Minimum=%.3f, Maximum=%.3f, Mean=%.3f, StdDev=%.3f" % ( \
                                         stats[0], stats[1], stats[2], stats[3] ))
+                elif not bScan:
+                        scans.append("band %d statistics (none cached)" % (iBand+1))
 
                 if bReportHistograms:
 
-                        hist = hBand.GetDefaultHistogram(force = True, callback = gdal.TermProgress)
+                        if bScan:
+                                hist = hBand.GetDefaultHistogram(force = True, callback = gdal.TermProgress if bProgress else None)
+                        else:
+                                hist = hBand.GetDefaultHistogram(force = False)
+                                if hist is None:
+                                        scans.append("band %d histogram (none cached)" % (iBand+1))
                         if hist is not None:
                                 dfMin = hist[0]
                                 dfMax = hist[1]
@@ -608,7 +666,9 @@ def main( argv = None ):
 
                                 print(line)
 
-                if bComputeChecksum:
+                if bComputeChecksum and not bScan:
+                        scans.append("band %d checksum" % (iBand+1))
+                elif bComputeChecksum:
                         print( "  Checksum=%d" % hBand.Checksum())
 
                 dfNoData = hBand.GetNoDataValue()
@@ -644,7 +704,9 @@ def main( argv = None ):
 
                         print(line)
 
-                        if bComputeChecksum:
+                        if bComputeChecksum and not bScan:
+                                scans.append("band %d overview checksums" % (iBand+1))
+                        elif bComputeChecksum:
 
                                 line = "  Overviews checksum: "
                                 for iOverview in range(hBand.GetOverviewCount()):
@@ -678,7 +740,7 @@ def main( argv = None ):
                                 line = line + "ALL_VALID "
                         print(line)
 
-                        if hMaskBand is not None and \
+                        if hMaskBand is not None and bScan and \
                                 hMaskBand.GetOverviewCount() > 0:
 
                                 line = "  Overviews of mask band: "
@@ -754,289 +816,214 @@ def main( argv = None ):
 
             #GDALRATDumpReadable( hRAT, None );
 
+    if len(scans) > 0:
+        print( "Label only (-noimage), not reported as they need a scan of the image:" )
+        for scan in scans:
+            print( "  %s" % scan )
+
 #/***************************************************************************/
 #/*                           WriteISISlabel()                              */
 #/***************************************************************************/
 #def WriteISISLabel(outFile, DataSetID, pszFilename, sampleBits, lines, samples):
 #Currently just procedural programming. Gets the job done...
 #
-    instrList = pszFilename.split("_")
     hBand = hDataset.GetRasterBand( 1 )
     #get the datatype
-    print gdal.GetDataTypeName(hBand.DataType)
-    if EQUAL(gdal.GetDataTypeName(hBand.DataType), "Float32"):
-        sample_bits = 32
-        sample_type = "Real"
-        sample_mask = "2#11111111111111111111111111111111#"
-    elif EQUAL(gdal.GetDataTypeName(hBand.DataType), "Float64"):
-        sample_bits = 32
-        sample_type = "Real"
-        sample_mask = "2#11111111111111111111111111111111#"
-    elif EQUAL(gdal.GetDataTypeName(hBand.DataType), "INT16"):
-        sample_bits = 16
-        sample_type = "SignedWord"
-        sample_mask = "2#1111111111111111#"
-    elif EQUAL(gdal.GetDataTypeName(hBand.DataType), "UINT16"):
-        sample_bits = 16
-        sample_type = "UsignedWord"
-        sample_mask = "2#1111111111111111#"
-    elif EQUAL(gdal.GetDataTypeName(hBand.DataType), "Byte"):
-        sample_bits = 8
-        sample_type = "UnsignedByte"
-        sample_mask = "2#11111111#"
-    else:
+    if debug:
+        print( gdal.GetDataTypeName(hBand.DataType) )
+    #sample_dtype is how pixels are written to the cube (ByteOrder = Lsb)
+    ptype = PixelType(record)
+    if ptype is None:
         print( "  %s: Not supported pixel type. Please convert to 8, 16 Int, or 32 Float" % gdal.GetDataTypeName(hBand.DataType))
         sys.exit(1)
-
-    f.write('Object = IsisCube\n')
-    f.write('  Object = Core\n')
-    f.write('    StartByte = 1\n')
-    #f.write('/* The source image data definition. */\n')
-    f.write('    ^Core     = %s\n' % (dst_cub))
-    f.write('    Format    = BandSequential\n')
-    f.write('\n')
-    f.write('    Group = Dimensions\n')
-    f.write('      Samples = %d\n' % (hDataset.RasterXSize))
-    f.write('      Lines   = %d\n' % hDataset.RasterYSize)
-    f.write('      Bands   = %d\n' % hDataset.RasterCount)
-    f.write('    End_Group\n')
-    f.write('\n')
-    f.write('    Group = Pixels\n')
-    f.write('      Type       = %s\n' % (sample_type))
-    f.write('      ByteOrder  = Lsb\n')
-    if base is None: 
-        f.write('      Base       = %.10g\n' % ( hBand.GetOffset() ))
-        if EQUAL(sample_type, "REAL"):
-           if (hBand.GetOffset() <> 0):
-              print("Warning: a none 0 'base' was set but input is 32bit Float. ISIS will not use this value when type is REAL. Please use 'fx' to apply this base value: %.10g" % ( hBand.GetOffset() ))
-    else:
-        f.write('      Base       = %.10g\n' % base )
-        if EQUAL(sample_type, "REAL"):
-            print("Warning: '-base' was set but input is 32bit Float. ISIS will not use this value when type is REAL. Please use 'fx' to apply this base value.")
-    if multiplier is None: 
-        f.write('      Multiplier = %.10g\n' % ( hBand.GetScale() ))
-        if EQUAL(sample_type, "REAL"):
-           if (hBand.GetScale() <> 1):
-              print("Warning: a none 1 'multiplier' was set but input is 32bit Float. ISIS will not use this value when type is REAL. Please use 'fx' to apply this multiplier value: %.10g" % ( hBand.GetScale() ))
-    else:
-        f.write('      Multiplier = %.10g\n' % multiplier )
-        if EQUAL(sample_type, "REAL"):
-            print("Warning: '-multiplier' was set but input is 32bit Float. ISIS will not use this value when type is REAL. Please use 'fx' to apply this multiplier value.")
-    f.write('    End_Group\n')
-    f.write('  End_Object\n')
-    f.write('\n')
-    f.write('  Group = Archive\n')
-    f.write('    DataSetId               = %s\n' %  pszFilename.split(".")[0])
-    f.write('    ProducerInstitutionName = \"Astrogeology Science Center\"\n')
-    f.write('    ProducerId              = Astrogeology\n')
-    f.write('    ProducerFullName        = USGS\n')
-    if "_v" in pszFilename:
-        f.write('    ProductId               = %s\n' % instrList[-1].split(".")[0].upper())
-    else:
-        f.write('    ProductId               = n/a\n')
-    f.write('    ProductVersionId        = n/a\n')
-    f.write('    InstrumentHostName      = n/a\n')
-    f.write('    InstrumentName          = n/a\n')
-    f.write('    InstrumentId            = n/a\n')
-    f.write('    TargetName              = %s\n' % target)
-    f.write('    MissionPhaseName        = n/a\n')
-    f.write('  End_Group\n')
-    f.write('\n')
-    if target <> "n/a":
-        f.write('  Group = Mapping\n')
-        f.write('    ProjectionName          = %s\n' % mapProjection)
-        if ((centLon < 0) and force360):
-          centLon = centLon + 360  
-        f.write('    CenterLongitude         = %.5f\n' % centLon)
-        f.write('    CenterLatitude          = %.5f\n' % centLat)
-        if EQUAL(mapProjection,"TransverseMercator"):
-          f.write('    ScaleFactor             = %6.5f\n' % TMscale)
-        f.write('    TargetName              = %s\n' % target)
-        f.write('    EquatorialRadius        = %.1f <meters>\n' % semiMajor)
-        f.write('    PolarRadius             = %.1f <meters>\n' % semiMinor)
-        if EQUAL(mapProjection,"TransverseMercator"):
-          f.write('    LatitudeType            = Planetographic\n')
-        else:
-          f.write('    LatitudeType            = Planetocentric\n')
-        f.write('    LongitudeDirection      = PositiveEast\n')
-        if (force360 or (lrx > 180)):
-          f.write('    LongitudeDomain         = 360\n')
-        else:
-          f.write('    LongitudeDomain         = 180\n')
-        f.write('    PixelResolution         = %.8f <meters/pixel>\n' % mres )
-        f.write('    Scale                   = %.4f <pixel/degree>\n' % mapres )
-        if lry < uly:
-          f.write('    MinimumLatitude         = %.8f\n' % lry)
-          f.write('    MaximumLatitude         = %.8f\n' % uly)
+    (sample_dtype, sample_type) = (ptype[1], ptype[2])
+
+    #scaling as ISIS applies it, for the statistics (Real is never scaled)
+    coreBase = 0.0
+    coreMultiplier = 1.0
+    if not EQUAL(sample_type, "REAL"):
+        coreBase = hBand.GetOffset() if base is None else base
+        coreMultiplier = hBand.GetScale() if multiplier is None else multiplier
+    if EQUAL(sample_type, "REAL"):
+        if base is None:
+            if (hBand.GetOffset() != 0):
+                print("Warning: a none 0 'base' was set but input is 32bit Float. ISIS will not use this value when type is REAL. Please use 'fx' to apply this base value: %.10g" % ( hBand.GetOffset() ))
         else:
-          f.write('    MinimumLatitude         = %.8f\n' % uly)
-          f.write('    MaximumLatitude         = %.8f\n' % lry)
-
-        #push into 360 domain (for Astropedia)
-        if (force360):
-          if (ulx < 0):
-             ulx = ulx + 360
-          if (lrx < 0):
-             lrx = lrx + 360
-        if lrx < ulx:
-            f.write('    MinimumLongitude        = %.8f\n' % lrx)
-            f.write('    MaximumLongitude        = %.8f\n' % ulx)
+            print("Warning: '-base' was set but input is 32bit Float. ISIS will not use this value when type is REAL. Please use 'fx' to apply this base value.")
+        if multiplier is None:
+            if (hBand.GetScale() != 1):
+                print("Warning: a none 1 'multiplier' was set but input is 32bit Float. ISIS will not use this value when type is REAL. Please use 'fx' to apply this multiplier value: %.10g" % ( hBand.GetScale() ))
         else:
-          f.write('    MinimumLongitude        = %.8f\n' % ulx)
-          f.write('    MaximumLongitude        = %.8f\n' % lrx)
-        f.write('    UpperLeftCornerX        = %.6f <meters>\n' % ( UpperLeftCornerX ))
-        f.write('    UpperLeftCornerY        = %.6f <meters>\n' % ( UpperLeftCornerY ))
-        f.write('  End_Group\n')
-    f.write('End_Object\n')
-    f.write('\n')
-    f.write('Object = Label\n')
-    #NOT correct
-    f.write('  Bytes = 256\n')
-    f.write('End_Object\n')
-    f.write('\n')
-    f.write('Object = History\n')
-    f.write('  Name           = IsisCube\n')
-    f.write('  StartByte      = 1\n')
-    #NOT correct
-    f.write('  Bytes          = 0\n')
-    f.write('  ^History       = %s\n' % dst_hst)
-    f.write('End_Object\n')
-    f.write('End\n')
-    f.close()
-   
-    #remove history until we fix the size. This is causing issues with cathist 
-    #f_hst.write('Object = Astropedia_gdal2isis.py\n')
-    #f_hst.write('  Version           = 0.1\n')
-    #f_hst.write('  ProgramVersion    = 2013-06-05\n')
-    #f_hst.write('  ExecutionDateTime = %s\n' % str(datetime.datetime.now().isoformat()))
-    #f_hst.write('  Description        = \"Convert GDAL supported image to an ISIS detached label and raw image\"\n')
-    #f_hst.write('End_Object\n')
-    f_hst.close()
+            print("Warning: '-multiplier' was set but input is 32bit Float. ISIS will not use this value when type is REAL. Please use 'fx' to apply this multiplier value.")
 
+    #layout of the output: an attached cube holds the label, padded to
+    #ISIS_LABEL_BYTES, followed by the core. A detached label points to
+    #the raw core with ^Core.
+    tile = None
+    if bTiled:
+        tile = (tileSamples, tileLines)
+    label = ISIS3Label(record, dst_cub, attach, tile, base, multiplier, force360,
+                       centerLon, dst_hst)
+   
     #########################
-    #Export out raw image
+    #Write out label and raw image
     #########################
-    #Setup the output dataset
-    print (' - ISIS3 label created:   %s' % dst_lbl)
-    print (' - ISIS3 history created: %s' % dst_hst)
-    if bMakeImage:
-      print ('Please wait, writing out raw image: %s' % dst_cub)
-      driver = gdal.GetDriverByName('ENVI')
-      output = driver.CreateCopy(dst_cub, hDataset, 1) 
+    #checksums of the written files, for the -md5 manifest
+    manifest = [ ]
+    #per band statistics of the stored pixels, gathered while the core is
+    #written, nodata and special pixels left out (see ISISStatistics)
+    stats = [StatsNew() for iBand in range(hDataset.RasterCount)]
+    validRange = ISIS_VALID_RANGE[sample_dtype]
     if attach:
-      #print 'sleeping 5 seconds'
-      #time.sleep(5)
-      cmd = "/usgs/cdev/contrib/bin/run_cubeatt.sh %s %s" % (dst_lbl, attach_cub)
-      #cmd = "cubeatt from=%s to=%s\n" % (dst_lbl, attach_cub)
-      print cmd
-      #subprocess.call(cmd, shell=True)
-      os.system(cmd)
-      os.remove(dst_cub)
-      os.remove(dst_lbl)
-      os.remove(dst_hst)
-      os.remove(dst_hdr)
-      os.remove(dst_aux)
+        if len(label) > ISIS_LABEL_BYTES:
+            print('Label is larger than %d bytes, unable to attach it' % ISIS_LABEL_BYTES)
+            sys.exit(1)
+        print ('Please wait, writing out ISIS3 cube: %s' % dst_cub)
+        fout = open(dst_cub, 'wb')
+        if bMD5:
+            #the label is final before the core, so the whole cube is
+            #hashed as it is streamed out
+            fout = MD5Writer(fout)
+        #label padded with nulls up to the core
+        fout.write(label.encode('ascii'))
+        fout.write(b'\0' * (ISIS_LABEL_BYTES - len(label)))
+        WriteCore(fout, hDataset, sample_dtype, bTiled, tileSamples, tileLines, stats,
+                  bProgress, validRange)
+        fout.close()
+        if bMD5:
+            manifest.append((fout.hexdigest(), dst_cub))
+    else:
+        if bMakeImage:
+            print ('Please wait, writing out raw image: %s' % dst_cub)
+            fout = open(dst_cub, 'wb')
+            if bMD5:
+                #checksum taken while the core is streamed out
+                fout = MD5Writer(fout)
+            WriteCore(fout, hDataset, sample_dtype, bTiled, tileSamples, tileLines, stats,
+                      bProgress, validRange)
+            fout.close()
+            if bMD5:
+                manifest.append((fout.hexdigest(), dst_cub))
+
+        f = open(dst_lbl,'wb')
+        f.write(label.encode('ascii'))
+        f.close()
+        manifest.append((hashlib.md5(label.encode('ascii')).hexdigest(), dst_lbl))
+
+        #remove history until we fix the size. This is causing issues with cathist 
+        f_hst = open(dst_hst,'wt')
+        #f_hst.write('Object = Astropedia_gdal2isis.py\n')
+        #f_hst.write('  Version           = 0.1\n')
+        #f_hst.write('  ProgramVersion    = 2013-06-05\n')
+        #f_hst.write('  ExecutionDateTime = %s\n' % str(datetime.datetime.now().isoformat()))
+        #f_hst.write('  Description        = \"Convert GDAL supported image to an ISIS detached label and raw image\"\n')
+        #f_hst.write('End_Object\n')
+        f_hst.close()
+        print (' - ISIS3 label created:   %s' % dst_lbl)
+        print (' - ISIS3 history created: %s' % dst_hst)
+        manifest.append((hashlib.md5(b'').hexdigest(), dst_hst))
+
+    if bMakeImage:
+        #the statistics go next to the cube, in the form "stats to=" writes
+        dst_stats = os.path.splitext(dst_cub)[0] + '.stats.pvl'
+        text = ISISStatistics(dst_cub, stats, hDataset.RasterXSize * hDataset.RasterYSize,
+                              coreBase, coreMultiplier).encode('ascii')
+        f = open(dst_stats, 'wb')
+        f.write(text)
+        f.close()
+        print (' - ISIS3 statistics:      %s' % dst_stats)
+        manifest.append((hashlib.md5(text).hexdigest(), dst_stats))
+
+    if bMD5:
+        dst_md5 = os.path.splitext(dst_cub)[0] + '.md5'
+        WriteManifest(dst_md5, manifest)
+        print (' - MD5 checksum manifest: %s' % dst_md5)
     print ('Complete')
     
     return 0
 
 #/************************************************************************/
-#/*                        GDALInfoReportCorner()                        */
+#/*                           ISISStatistics()                           */
 #/************************************************************************/
 
-def GDALInfoReportCorner( hDataset, hTransform, corner_name, x, y ):
-
-    line = "%-11s " % corner_name
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform the point into georeferenced coordinates.             */
-#/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
-    if adfGeoTransform is not None:
-        dfGeoX = adfGeoTransform[0] + adfGeoTransform[1] * x \
-            + adfGeoTransform[2] * y
-        dfGeoY = adfGeoTransform[3] + adfGeoTransform[4] * x \
-            + adfGeoTransform[5] * y
-
-    else:
-        line = line + ("(%7.1f,%7.1f)" % (x, y ))
-        print(line)
-        return False
-
-#/* -------------------------------------------------------------------- */
-#/*      Report the georeferenced coordinates.                           */
-#/* -------------------------------------------------------------------- */
-    if abs(dfGeoX) < 181 and abs(dfGeoY) < 91:
-        line = line + ( "(%12.7f,%12.7f) " % (dfGeoX, dfGeoY ))
-
-    else:
-        line = line + ( "(%12.3f,%12.3f) " % (dfGeoX, dfGeoY ))
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform to latlong and report.                                */
-#/* -------------------------------------------------------------------- */
-    if hTransform is not None:
-        pnt = hTransform.TransformPoint(dfGeoX, dfGeoY, 0)
-        if pnt is not None:
-            line = line + ( "(%s," % gdal.DecToDMS( pnt[0], "Long", 2 ) )
-            line = line + ( "%s)" % gdal.DecToDMS( pnt[1], "Lat", 2 ) )
-
-    print(line)
-
-    return True
-
-#/************************************************************************/
-#/*                        GDALGetLon()                              */
-#/************************************************************************/
-def GDALGetLon( hDataset, hTransform, x, y ):
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform the point into georeferenced coordinates.             */
-#/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
-    if adfGeoTransform is not None:
-        dfGeoX = adfGeoTransform[0] + adfGeoTransform[1] * x \
-            + adfGeoTransform[2] * y
-        dfGeoY = adfGeoTransform[3] + adfGeoTransform[4] * x \
-            + adfGeoTransform[5] * y
-    else:
-        return 0.0
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform to latlong and report.                                */
-#/* -------------------------------------------------------------------- */
-    if hTransform is not None:
-        pnt = hTransform.TransformPoint(dfGeoX, dfGeoY, 0)
-        if pnt is not None:
-          return pnt[0]
-    return dfGeoX
-
+def ISISStatistics( dst_cub, stats, nTotal, base = 0.0, multiplier = 1.0 ):
+    """PVL text with one Results group per band, laid out like ISIS stats.
+
+    stats holds one accumulator (see StatsNew) per band, taken from the
+    stored pixels, which are scaled by base and multiplier as ISIS reads
+    them. nTotal is the pixel count of a band. A band without valid
+    pixels only gets its counts.
+    """
+    f = StringIO()
+    for iBand in range(len(stats)):
+        band = stats[iBand]
+        f.write('Group = Results\n')
+        f.write('  From              = %s\n' % os.path.basename(dst_cub))
+        f.write('  Band              = %d\n' % (iBand + 1))
+        if band['count'] > 0:
+            variance = band['m2'] / band['count'] * multiplier * multiplier
+            average = band['mean'] * multiplier + base
+            (vmin, vmax) = sorted([band['min'] * multiplier + base,
+                                   band['max'] * multiplier + base])
+            f.write('  Average           = %.10g\n' % average)
+            f.write('  StandardDeviation = %.10g\n' % math.sqrt(variance))
+            f.write('  Variance          = %.10g\n' % variance)
+            f.write('  Minimum           = %.10g\n' % vmin)
+            f.write('  Maximum           = %.10g\n' % vmax)
+            f.write('  Sum               = %.10g\n' % (average * band['count']))
+        f.write('  TotalPixels       = %d\n' % nTotal)
+        f.write('  ValidPixels       = %d\n' % band['count'])
+        f.write('End_Group\n')
+        f.write('\n')
+    f.write('End\n')
+    text = f.getvalue()
+    f.close()
+    return text
 
 #/************************************************************************/
-#/*                        GDALGetLat()                              */
+#/*                           WriteCoreTile()                            */
 #/************************************************************************/
 
-def GDALGetLat( hDataset, hTransform, x, y ):
-#/* -------------------------------------------------------------------- */
-#/*      Transform the point into georeferenced coordinates.             */
-#/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
-    if adfGeoTransform is not None:
-        dfGeoX = adfGeoTransform[0] + adfGeoTransform[1] * x \
-            + adfGeoTransform[2] * y
-        dfGeoY = adfGeoTransform[3] + adfGeoTransform[4] * x \
-            + adfGeoTransform[5] * y
+def WriteCoreTile( fout, hDataset, sample_dtype, tileSamples, tileLines, stats = None,
+                   bProgress = True, validRange = None ):
+    """Stream all bands of hDataset to fout as ISIS3 tiles.
+
+    One row of tiles (tileLines lines) is read at a time into a buffer
+    padded out to whole tiles, then reordered so each tile is contiguous.
+    Tiles run left to right, top to bottom, band after band, with the
+    padding of partial tiles set to 0. stats, bProgress and validRange
+    are as for WriteCoreBSQ.
+    """
+    dtype = np.dtype(sample_dtype)
+    nXSize = hDataset.RasterXSize
+    nYSize = hDataset.RasterYSize
+    nBands = hDataset.RasterCount
+    nTilesX = -(-nXSize // tileSamples)
+    buf = np.zeros((tileLines, nTilesX * tileSamples), dtype=dtype)
+    for iBand in range(nBands):
+        hBand = hDataset.GetRasterBand(iBand + 1)
+        nodata = hBand.GetNoDataValue()
+        for y in range(0, nYSize, tileLines):
+            n = min(tileLines, nYSize - y)
+            if n < tileLines:
+                buf[n:, :] = 0
+            data = hBand.ReadAsArray(0, y, nXSize, n).astype(dtype, copy=False)
+            buf[:n, :nXSize] = data
+            if stats is not None:
+                StatsAccumulate(stats[iBand], data, nodata, validRange)
+            tiles = buf.reshape(tileLines, nTilesX, tileSamples).transpose(1, 0, 2)
+            fout.write(np.ascontiguousarray(tiles).tobytes())
+            if bProgress:
+                gdal.TermProgress_nocb((iBand + float(y + n) / nYSize) / nBands)
+
+def WriteCore( fout, hDataset, sample_dtype, bTiled, tileSamples, tileLines, stats = None,
+               bProgress = True, validRange = None ):
+    if bTiled:
+        WriteCoreTile(fout, hDataset, sample_dtype, tileSamples, tileLines, stats,
+                      bProgress, validRange)
     else:
-        return 0.0
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform to latlong and report.                                */
-#/* -------------------------------------------------------------------- */
-    if hTransform is not None:
-        pnt = hTransform.TransformPoint(dfGeoX, dfGeoY, 0)
-        if pnt is not None:
-          return pnt[1]
-    return dfGeoY
+        WriteCoreBSQ(fout, hDataset, sample_dtype, stats, bProgress = bProgress,
+                     validRange = validRange)
 
 if __name__ == '__main__':
     version_num = int(gdal.VersionInfo('VERSION_NUM'))
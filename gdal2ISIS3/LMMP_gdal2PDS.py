@@ -36,14 +36,18 @@
 # ****************************************************************************/
 
 import sys
-import math
-from time import strftime
+import os
+import hashlib
 try:
     from osgeo import gdal
     from osgeo import osr
 except:
     import gdal
     import osr
+from gdal2label import Inspect, PixelType, PDS3Label
+from gdal2label import GDALInfoReportCorner, LatLongTransform, WriteCoreBSQ
+from gdal2label import StatsNew, StatsFill
+from gdal2label import MD5Writer, MD5File, WriteManifest
 
 #/************************************************************************/
 #/*                               Usage()                                */
@@ -52,6 +56,10 @@ except:
 def Usage(theApp):
     print( '\nUsage: LMMP_gdal2PDS in.tif output.img') # % theApp)
     print( '   optional: to print out image information also send -debug')
+    print( '   optional: to just get a label *.lbl, send -noimage')
+    print( '   optional: to write the label attached to the image (one file), send -attach')
+    print( '   optional: to write an MD5 checksum manifest (output.md5), send -md5')
+    print( '             (with -attach the finished file is read back once to hash it)')
     print( 'Usage: LMMP_gdal2PDS -debug in.tif output.img\n') # % theApp)
     print( 'Note: Currently this routine only supports LMMP products in')
     print('      (geographic, equirectangular, polar_stereographic)\n')
@@ -61,6 +69,32 @@ def Usage(theApp):
 def EQUAL(a, b):
     return a.lower() == b.lower()
 
+#/************************************************************************/
+#/*                            LabelRecords()                            */
+#/************************************************************************/
+
+def LabelRecords( label, record_bytes, image_records, attach ):
+    """Fill the @FILE_RECORDS@, @LABEL_RECORDS@ and @IMAGE@ fields of label.
+
+    Returns (text, label_records). An attached label is sized in whole
+    records of record_bytes in front of the image_records image records;
+    the counts written into it can change its length, so this repeats
+    until it fits. A detached label has label_records 0.
+    """
+    label_records = 0
+    while True:
+        if attach:
+            file_records = label_records + image_records
+        else:
+            file_records = image_records
+        text = label.replace('@FILE_RECORDS@', '%d' % file_records)
+        text = text.replace('@LABEL_RECORDS@', '%d' % label_records)
+        text = text.replace('@IMAGE@', '%d' % (label_records + 1))
+        needed = -(-len(text) // record_bytes)
+        if not attach or needed <= label_records:
+            return (text, label_records)
+        label_records = needed
+
 
 #/************************************************************************/
 #/*                                main()                                */
@@ -87,8 +121,9 @@ def main( argv = None ):
     dst_img = None
     dst_lbl = None
     bands = 1
-    centLat = None
-    centLon = None
+    bMakeImage = True
+    attach = False
+    bMD5 = False
 
     #/* Must process GDAL_SKIP before GDALAllRegister(), but we can't call */
     #/* GDALGeneralCmdLineProcessor before it needs the drivers to be registered */
@@ -154,6 +189,12 @@ def main( argv = None ):
             papszExtraMDDomains.append( argv[i] )
         elif EQUAL(argv[i], "-nofl"):
             bShowFileList = False
+        elif EQUAL(argv[i], "-noimage"):
+            bMakeImage = False
+        elif EQUAL(argv[i], "-attach"):
+            attach = True
+        elif EQUAL(argv[i], "-md5"):
+            bMD5 = True
         elif argv[i][0] == '-':
             return Usage(argv[0])
         elif pszFilename is None:
@@ -169,6 +210,9 @@ def main( argv = None ):
         return Usage(argv[0])
     if dst_img is None:
         return Usage(argv[0])
+    #an attached label needs the image behind it
+    if not bMakeImage:
+        attach = False
 
 #/* -------------------------------------------------------------------- */
 #/*      Open dataset.                                                   */
@@ -185,8 +229,6 @@ def main( argv = None ):
         if (EQUAL(dst_lbl,dst_img)):
             print('Extension must be .IMG or .img - unable to run using filename: %s' % pszFilename )
             sys.exit(1)
-        else:
-            f = open(dst_lbl,'wt')
 #    else:
 #        f = sys.stdout
 #        dst_img = "out.img"
@@ -216,47 +258,16 @@ def main( argv = None ):
 #/* -------------------------------------------------------------------- */
 #/*      Report projection.                                              */
 #/* -------------------------------------------------------------------- */
-    pszProjection = hDataset.GetProjectionRef()
-    if pszProjection is not None:
-
-        hSRS = osr.SpatialReference()
-        if hSRS.ImportFromWkt(pszProjection ) == gdal.CE_None:
-            pszPrettyWkt = hSRS.ExportToPrettyWkt(False)
-
-            #print( "Coordinate System is:\n%s" % pszPrettyWkt )
-            mapProjection = "None"
-            #Extract projection information
-            target = hSRS.GetAttrValue("DATUM",0).replace("D_","").replace("_2000","")
-            semiMajor = hSRS.GetSemiMajor() / 1000.0
-            semiMinor = hSRS.GetSemiMinor() / 1000.0
-            if (pszProjection[0:6] == "GEOGCS"):
-                mapProjection = "SIMPLE_CYLINDRICAL"
-                centLat = 0
-                centLon = 0
-            if (pszProjection[0:6] == "PROJCS"):
-                mapProjection = hSRS.GetAttrValue("PROJECTION",0)
-
-                if EQUAL(mapProjection,"Equirectangular"):
-                    centLat = hSRS.GetProjParm('standard_parallel_1')
-                    centLon = hSRS.GetProjParm('central_meridian')
-
-                if EQUAL(mapProjection,"Polar_Stereographic"):
-                    centLat = hSRS.GetProjParm('latitude_of_origin')
-                    centLon = hSRS.GetProjParm('central_meridian')
-
-                if EQUAL(mapProjection,"Stereographic_South_Pole"):
-                    centLat = hSRS.GetProjParm('latitude_of_origin')
-                    centLon = hSRS.GetProjParm('central_meridian')
-                
-                if EQUAL(mapProjection,"Stereographic_North_Pole"):
-                    centLat = hSRS.GetProjParm('latitude_of_origin')
-                    centLon = hSRS.GetProjParm('central_meridian')
-            if debug:
-                print( "Coordinate System is:\n%s" % pszPrettyWkt )
-        else:
-            print( "Warning - Can't parse this type of projection\n" )
-            print( "Coordinate System is `%s'" % pszProjection )
-            sys.exit(1)
+    #header values of the label, see gdal2label.Inspect
+    record = Inspect(hDataset, pszFilename)
+    pszProjection = record['wkt']
+    if record['srs'] is not None:
+        if debug:
+            print( "Coordinate System is:\n%s" % record['srs']['prettyWkt'] )
+    elif pszProjection is not None and len(pszProjection) > 0:
+        print( "Warning - Can't parse this type of projection\n" )
+        print( "Coordinate System is `%s'" % pszProjection )
+        sys.exit(1)
     else:
         print( "Warning - No Coordinate System defined:\n" )
         sys.exit(1)
@@ -264,7 +275,7 @@ def main( argv = None ):
 #/* -------------------------------------------------------------------- */
 #/*      Report Geotransform.                                            */
 #/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
+    adfGeoTransform = record['geoTransform']
     if adfGeoTransform is not None:
 
         if adfGeoTransform[2] == 0.0 and adfGeoTransform[4] == 0.0:
@@ -287,15 +298,6 @@ def main( argv = None ):
                         adfGeoTransform[4], \
                         adfGeoTransform[5] ))
 
-        if (pszProjection[0:6] == "GEOGCS"):
-            #convert degrees/pixel to km/pixel 
-             mapres = 1 / adfGeoTransform[1]
-             kmres = adfGeoTransform[1] * (semiMajor * math.pi / 180.0)
-        else:
-            #convert m/pixel to pixel/degree
-             mapres = 1 / (adfGeoTransform[1] / (semiMajor * 1000.0 * math.pi / 180.0))
-             kmres = adfGeoTransform[1] / 1000.0
-
 #/* -------------------------------------------------------------------- */
 #/*      Report GCPs.                                                    */
 #/* -------------------------------------------------------------------- */
@@ -396,17 +398,7 @@ def main( argv = None ):
 #/* -------------------------------------------------------------------- */
 #/*      Setup projected to lat/long transform if appropriate.           */
 #/* -------------------------------------------------------------------- */
-    if pszProjection is not None and len(pszProjection) > 0:
-        hProj = osr.SpatialReference( pszProjection )
-        if hProj is not None:
-            hLatLong = hProj.CloneGeogCS()
-
-        if hLatLong is not None:
-            gdal.PushErrorHandler( 'CPLQuietErrorHandler' )
-            hTransform = osr.CoordinateTransformation( hProj, hLatLong )
-            gdal.PopErrorHandler()
-            if gdal.GetLastErrorMsg().find( 'Unable to load PROJ.4 library' ) != -1:
-                hTransform = None
+    hTransform = LatLongTransform( record['wkt'] )
 
 #/* -------------------------------------------------------------------- */
 #/*      Report corners.                                                 */
@@ -426,17 +418,13 @@ def main( argv = None ):
                               hDataset.RasterXSize/2.0, \
                               hDataset.RasterYSize/2.0 );
 
-    #Get bounds
-    ulx = GDALGetLon( hDataset, hTransform, 0.0, 0.0 );
-    uly = GDALGetLat( hDataset, hTransform, 0.0, 0.0 );
-    lrx = GDALGetLon( hDataset, hTransform, hDataset.RasterXSize, \
-                          hDataset.RasterYSize );
-    lry = GDALGetLat( hDataset, hTransform, hDataset.RasterXSize, \
-                          hDataset.RasterYSize );
-
 #/* ==================================================================== */
 #/*      Loop over bands.                                                */
 #/* ==================================================================== */
+    #with -noimage no pixel block is read: only cached values are reported
+    #and anything that would need a scan of the image is listed instead
+    bScan = bMakeImage
+    scans = [ ]
     if debug:
         bands = hDataset.RasterCount
         for iBand in range(hDataset.RasterCount):
@@ -473,7 +461,9 @@ def main( argv = None ):
                         if dfMax is not None:
                                 line = line + ("Max=%.3f " % dfMax)
 
-                        if bComputeMinMax:
+                        if bComputeMinMax and not bScan:
+                                scans.append("band %d computed min/max" % (iBand+1))
+                        elif bComputeMinMax:
                                 gdal.ErrorReset()
                                 adfCMinMax = hBand.ComputeRasterMinMax(False)
                                 if gdal.GetLastErrorType() == gdal.CE_None:
@@ -482,16 +472,23 @@ def main( argv = None ):
 
                         print( line )
 
-                stats = hBand.GetStatistics( bApproxStats, bStats)
+                stats = hBand.GetStatistics( bApproxStats, bStats and bScan)
                 # Dirty hack to recognize if stats are valid. If invalid, the returned
                 # stddev is negative
                 if stats[3] >= 0.0:
                         print( "  Minimum=%.3f, Maximum=%.3f, Mean=%.3f, StdDev=%.3f" % ( \
                                         stats[0], stats[1], stats[2], stats[3] ))
+                elif not bScan:
+                        scans.append("band %d statistics (none cached)" % (iBand+1))
 
                 if bReportHistograms:
 
-                        hist = hBand.GetDefaultHistogram(force = True, callback = gdal.TermProgress)
+                        if bScan:
+                                hist = hBand.GetDefaultHistogram(force = True, callback = gdal.TermProgress)
+                        else:
+                                hist = hBand.GetDefaultHistogram(force = False)
+                                if hist is None:
+                                        scans.append("band %d histogram (none cached)" % (iBand+1))
                         if hist is not None:
                                 dfMin = hist[0]
                                 dfMax = hist[1]
@@ -506,7 +503,9 @@ def main( argv = None ):
 
                                 print(line)
 
-                if bComputeChecksum:
+                if bComputeChecksum and not bScan:
+                        scans.append("band %d checksum" % (iBand+1))
+                elif bComputeChecksum:
                         print( "  Checksum=%d" % hBand.Checksum())
 
                 dfNoData = hBand.GetNoDataValue()
@@ -542,7 +541,9 @@ def main( argv = None ):
 
                         print(line)
 
-                        if bComputeChecksum:
+                        if bComputeChecksum and not bScan:
+                                scans.append("band %d overview checksums" % (iBand+1))
+                        elif bComputeChecksum:
 
                                 line = "  Overviews checksum: "
                                 for iOverview in range(hBand.GetOverviewCount()):
@@ -576,7 +577,7 @@ def main( argv = None ):
                                 line = line + "ALL_VALID "
                         print(line)
 
-                        if hMaskBand is not None and \
+                        if hMaskBand is not None and bScan and \
                                 hMaskBand.GetOverviewCount() > 0:
 
                                 line = "  Overviews of mask band: "
@@ -652,254 +653,82 @@ def main( argv = None ):
 
             #GDALRATDumpReadable( hRAT, None );
 
+    if len(scans) > 0:
+        print( "Label only (-noimage), not reported as they need a scan of the image:" )
+        for scan in scans:
+            print( "  %s" % scan )
+
 #/************************************************************************/
 #/*                           WritePDSlabel()                            */
 #/************************************************************************/
 #def WritePDSlabel(outFile, DataSetID, pszFilename, sampleBits, lines, samples):
-    instrList = pszFilename.split("_")
     hBand = hDataset.GetRasterBand( 1 )
     #get the datatype
-    if EQUAL(gdal.GetDataTypeName(hBand.DataType), "Float32"):
-        sample_bits = 32
-        sample_type = "PC_REAL"
-        sample_mask = "2#11111111111111111111111111111111#"
-    elif EQUAL(gdal.GetDataTypeName(hBand.DataType), "INT16"):
-        sample_bits = 16
-        sample_type = "LSB_INTEGER"
-        sample_mask = "2#1111111111111111#"
-    elif EQUAL(gdal.GetDataTypeName(hBand.DataType), "UINT16"):
-        sample_bits = 16
-        sample_type = "UNSIGNED_INTEGER"
-        sample_mask = "2#1111111111111111#"
-    elif EQUAL(gdal.GetDataTypeName(hBand.DataType), "Byte"):
-        sample_bits = 8
-        sample_type = "UNSIGNED_INTEGER"
-        sample_mask = "2#11111111#"
-    else:
+    #sample_dtype is how pixels are written to the image (little endian)
+    ptype = PixelType(record)
+    if ptype is None or ptype[3] is None:
         print( "  %s: Not supported pixel type" % gdal.GetDataTypeName(hBand.DataType))
         sys.exit(1)
+    (sample_bits, sample_dtype) = (ptype[0], ptype[1])
+
+    #one record per image line, an attached label takes whole records
+    #in front of the image. @..@ values are filled in below.
+    record_bytes = hDataset.RasterXSize * sample_bits // 8
+    image_records = hDataset.RasterYSize * hDataset.RasterCount
+    label = PDS3Label(record, dst_img, attach, bMakeImage)
+
+    (text, label_records) = LabelRecords(label, record_bytes, image_records, attach)
 
-    f.write('PDS_VERSION_ID            = PDS3\n')
-    f.write('\n')
-    f.write('/* The source image data definition. */\n')
-    f.write('FILE_NAME      = \"%s\"\n' % (dst_img))
-    f.write('RECORD_TYPE   = FIXED_LENGTH\n')
-    f.write('RECORD_BYTES  = %d\n' % (hDataset.RasterYSize))
-    f.write('FILE_RECORDS  = %d\n' % ((hDataset.RasterXSize * sample_bits / 8)) )
-    #f.write('LABEL_RECORDS = 1\n')
-    f.write('^IMAGE        = \"%s\"\n' % (dst_img))
-    f.write('\n')
-    f.write('/* Identification Information  */\n')
-    f.write('DATA_SET_ID               = "%s"\n' % pszFilename.split(".")[0])
-    f.write('DATA_SET_NAME             = "%s"\n' % pszFilename.split(".")[0])
-    f.write('PRODUCER_INSTITUTION_NAME = "Lunar Mapping and Modeling Project"\n')
-    f.write('PRODUCER_ID               = "LMMP_TEAM"\n')
-    f.write('PRODUCER_FULL_NAME        = "LMMP TEAM"\n')
-    f.write('PRODUCT_ID                = "%s"\n' % pszFilename.split(".")[0])
-    if "_v" in pszFilename:
-        f.write('PRODUCT_VERSION_ID        = "%s.0"\n' % instrList[-1].split(".")[0].upper())
-    else:
-        f.write('PRODUCT_VERSION_ID        = "%s"\n' % "V1.0")
-    f.write('PRODUCT_TYPE              = "RDR"\n')
-    if len(instrList) > 1:
-        f.write('INSTRUMENT_HOST_NAME      = "%s"\n' % instrList[0])
-        f.write('INSTRUMENT_HOST_ID        = "%s"\n' % instrList[0])
-        f.write('INSTRUMENT_NAME           = "%s"\n' % instrList[1])
-        f.write('INSTRUMENT_ID             = "%s"\n' % instrList[1])
-    f.write('TARGET_NAME               = MOON\n')
-    f.write('MISSION_PHASE_NAME        = "POST MISSION"\n')
-    f.write('RATIONALE_DESC            = "Created at the request of NASA\'s Exploration\n')
-    f.write('                            Systems Mission Directorate to support future\n')
-    f.write('                            human exploration"\n')
-    f.write('SOFTWARE_NAME             = "ISIS 3.2.1 | SOCET SET v5.5 (r) BAE Systems\n')
-    f.write('                            | GDAL 1.8"\n')
-    f.write('\n')
-    f.write('/* Time Parameters */\n')
-    f.write('START_TIME                   = "N/A"\n')
-    f.write('STOP_TIME                    = "N/A"\n')
-    f.write('SPACECRAFT_CLOCK_START_COUNT = "N/A"\n')
-    f.write('SPACECRAFT_CLOCK_STOP_COUNT  = "N/A"\n')
-    f.write('PRODUCT_CREATION_TIME        = %s\n' % strftime("%Y-%m-%dT%H:%M:%S"))   #2011-03-11T22:13:40
-    f.write('\n')
-    f.write('OBJECT = IMAGE_MAP_PROJECTION\n')
-    f.write('    ^DATA_SET_MAP_PROJECTION     = "DSMAP.CAT"\n')
-    f.write('    MAP_PROJECTION_TYPE          = \"%s\"\n' % mapProjection)
-    f.write('    PROJECTION_LATITUDE_TYPE     = PLANETOCENTRIC\n')
-    f.write('    A_AXIS_RADIUS                = %.1f <KM>\n' % semiMajor)
-    f.write('    B_AXIS_RADIUS                = %.1f <KM>\n' % semiMajor)
-    f.write('    C_AXIS_RADIUS                = %.1f <KM>\n' % semiMinor)
-    f.write('    COORDINATE_SYSTEM_NAME       = PLANETOCENTRIC\n')
-    f.write('    POSITIVE_LONGITUDE_DIRECTION = EAST\n')
-    f.write('    KEYWORD_LATITUDE_TYPE        = PLANETOCENTRIC\n')
-    f.write('    /* NOTE:  CENTER_LATITUDE and CENTER_LONGITUDE describe the location   */\n')
-    f.write('    /* of the center of projection, which is not necessarily equal to the  */\n')
-    f.write('    /* location of the center point of the image.                          */\n')
-    if (centLat != None):
-        f.write('    CENTER_LATITUDE              = %5.2f <DEG>\n' % centLat)
-    if (centLon != None):
-        f.write('    CENTER_LONGITUDE             = %5.2f <DEG>\n' % centLon)
-    f.write('    LINE_FIRST_PIXEL             = 1\n')
-    f.write('    LINE_LAST_PIXEL              = %d\n' % hDataset.RasterYSize)
-    f.write('    SAMPLE_FIRST_PIXEL           = 1\n')
-    f.write('    SAMPLE_LAST_PIXEL            = %d\n' % hDataset.RasterXSize)
-    f.write('    MAP_PROJECTION_ROTATION      = 0.0 <DEG>\n')
-    f.write('    MAP_RESOLUTION               = %.4f <PIX/DEG>\n' % mapres )
-    f.write('    MAP_SCALE                    = %.8f <KM/PIXEL>\n' % kmres )
-    f.write('    MINIMUM_LATITUDE             = %.8f <DEGREE>\n' % lry)
-    f.write('    MAXIMUM_LATITUDE             = %.8f <DEGREE>\n' % uly)
-    f.write('    WESTERNMOST_LONGITUDE        = %.8f <DEGREE>\n' % ulx)
-    f.write('    EASTERNMOST_LONGITUDE        = %.8f <DEGREE>\n' % lrx)
-    f.write('    LINE_PROJECTION_OFFSET       = %.1f\n' % ( (ulx / kmres * 1000 ) - 0.5 ))
-    f.write('    SAMPLE_PROJECTION_OFFSET     = %.1f\n' % ( (uly / kmres * 1000 ) + 0.5 ))
-    f.write('END_OBJECT = IMAGE_MAP_PROJECTION\n')
-    f.write('\n')
-    f.write('OBJECT = IMAGE\n')
-    f.write('    NAME                       = \"%s\"\n' % (pszFilename))
-    f.write('    DESCRIPTION                = "Export data set from LMMP portal.\n')
-    f.write('                                 see filename for data type."\n')
-    #f.write('\n')
-    f.write('    LINES                      = %d\n' % hDataset.RasterYSize)
-    f.write('    LINE_SAMPLES               = %d\n' % hDataset.RasterXSize)
-    f.write('    UNIT                       = METER\n')
-    f.write('    OFFSET                     = %.10g\n' % ( hBand.GetOffset() ))
-    f.write('    SCALING_FACTOR             = %.10g\n' % ( hBand.GetScale() ))
-    f.write('    SAMPLE_TYPE                = %s\n' % (sample_type) )
-    f.write('    SAMPLE_BITS                = %d\n' % (sample_bits) )
-    f.write('    SAMPLE_BIT_MASK            = %s\n' % (sample_mask) )
-    #f.write('\n')
-    f.write('    BANDS                      = %d\n' % hDataset.RasterCount)
-    #f.write('\n')
-    f.write('    BAND_STORAGE_TYPE          = BAND_SEQUENTIAL\n')
-    if (sample_bits == 32) :
-        f.write('    CORE_NULL                  = 16#FF7FFFFB#\n')
-        f.write('    CORE_LOW_REPR_SATURATION   = 16#FF7FFFFC#\n')
-        f.write('    CORE_LOW_INSTR_SATURATION  = 16#FF7FFFFD#\n')
-        f.write('    CORE_HIGH_REPR_SATURATION  = 16#FF7FFFFF#\n')
-        f.write('    CORE_HIGH_INSTR_SATURATION = 16#FF7FFFFE#\n')
-    elif (sample_bits == 16) :
-        f.write('    CORE_NULL                  = -32768\n')
-        f.write('    CORE_LOW_REPR_SATURATION   = -32767\n')
-        f.write('    CORE_LOW_INSTR_SATURATION  = -32766\n')
-        f.write('    CORE_HIGH_REPR_SATURATION  = 32767\n')
-        f.write('    CORE_HIGH_INSTR_SATURATION = 32768\n')
-    else : #8bit
-        f.write('    CORE_NULL                  = 0\n')
-        f.write('    CORE_LOW_REPR_SATURATION   = 0\n')
-        f.write('    CORE_LOW_INSTR_SATURATION  = 0\n')
-        f.write('    CORE_HIGH_REPR_SATURATION  = 255\n')
-        f.write('    CORE_HIGH_INSTR_SATURATION = 255\n')
-    f.write('END_OBJECT = IMAGE\n')
-    f.write('END\n')
-    f.close()
-    
     #########################
     #Export out raw image
     #########################
-    #Setup the output dataset
-    print ('Please wait, writing out raw image: %s' % dst_img)
-    driver = gdal.GetDriverByName('ENVI')
-    output = driver.CreateCopy(dst_img, hDataset, 1) 
-    print ('Complete. PDS label also created: %s' % dst_lbl)
-    
-    return 0
-
-#/************************************************************************/
-#/*                        GDALInfoReportCorner()                        */
-#/************************************************************************/
-
-def GDALInfoReportCorner( hDataset, hTransform, corner_name, x, y ):
-
-    line = "%-11s " % corner_name
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform the point into georeferenced coordinates.             */
-#/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
-    if adfGeoTransform is not None:
-        dfGeoX = adfGeoTransform[0] + adfGeoTransform[1] * x \
-            + adfGeoTransform[2] * y
-        dfGeoY = adfGeoTransform[3] + adfGeoTransform[4] * x \
-            + adfGeoTransform[5] * y
-
-    else:
-        line = line + ("(%7.1f,%7.1f)" % (x, y ))
-        print(line)
-        return False
-
-#/* -------------------------------------------------------------------- */
-#/*      Report the georeferenced coordinates.                           */
-#/* -------------------------------------------------------------------- */
-    if abs(dfGeoX) < 181 and abs(dfGeoY) < 91:
-        line = line + ( "(%12.7f,%12.7f) " % (dfGeoX, dfGeoY ))
-
-    else:
-        line = line + ( "(%12.3f,%12.3f) " % (dfGeoX, dfGeoY ))
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform to latlong and report.                                */
-#/* -------------------------------------------------------------------- */
-    if hTransform is not None:
-        pnt = hTransform.TransformPoint(dfGeoX, dfGeoY, 0)
-        if pnt is not None:
-            line = line + ( "(%s," % gdal.DecToDMS( pnt[0], "Long", 2 ) )
-            line = line + ( "%s)" % gdal.DecToDMS( pnt[1], "Lat", 2 ) )
-
-    print(line)
-
-    return True
-
-#/************************************************************************/
-#/*                        GDALGetLon()                              */
-#/************************************************************************/
-def GDALGetLon( hDataset, hTransform, x, y ):
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform the point into georeferenced coordinates.             */
-#/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
-    if adfGeoTransform is not None:
-        dfGeoX = adfGeoTransform[0] + adfGeoTransform[1] * x \
-            + adfGeoTransform[2] * y
-        dfGeoY = adfGeoTransform[3] + adfGeoTransform[4] * x \
-            + adfGeoTransform[5] * y
+    #checksums of the written files, for the -md5 manifest
+    manifest = [ ]
+    if attach:
+        print ('Please wait, writing out PDS image: %s' % dst_img)
+        stats = StatsNew()
+        fout = open(dst_img, 'wb')
+        #label padded with spaces up to the first image record
+        fout.write(text.encode('ascii'))
+        fout.write(b' ' * (label_records * record_bytes - len(text)))
+        WriteCoreBSQ(fout, hDataset, sample_dtype, [stats] * hDataset.RasterCount)
+        #back-fill the statistics, the label keeps its length
+        fout.seek(0)
+        fout.write(StatsFill(text, stats).encode('ascii'))
+        fout.close()
+        if bMD5:
+            #the label changed after the image was streamed out, so the
+            #finished file is read back once (the input is still read once)
+            manifest.append((MD5File(dst_img), dst_img))
+        print ('Complete. PDS label attached to: %s' % dst_img)
     else:
-        return 0.0
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform to latlong and report.                                */
-#/* -------------------------------------------------------------------- */
-    if hTransform is not None:
-        pnt = hTransform.TransformPoint(dfGeoX, dfGeoY, 0)
-        if pnt is not None:
-          return pnt[0]
-    return dfGeoX
-
-
-#/************************************************************************/
-#/*                        GDALGetLat()                              */
-#/************************************************************************/
-
-def GDALGetLat( hDataset, hTransform, x, y ):
-#/* -------------------------------------------------------------------- */
-#/*      Transform the point into georeferenced coordinates.             */
-#/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
-    if adfGeoTransform is not None:
-        dfGeoX = adfGeoTransform[0] + adfGeoTransform[1] * x \
-            + adfGeoTransform[2] * y
-        dfGeoY = adfGeoTransform[3] + adfGeoTransform[4] * x \
-            + adfGeoTransform[5] * y
-    else:
-        return 0.0
+        if bMakeImage:
+            print ('Please wait, writing out raw image: %s' % dst_img)
+            fout = open(dst_img, 'wb')
+            if bMD5:
+                #checksum taken while the image is streamed out
+                fout = MD5Writer(fout)
+            stats = StatsNew()
+            WriteCoreBSQ(fout, hDataset, sample_dtype, [stats] * hDataset.RasterCount)
+            fout.close()
+            text = StatsFill(text, stats)
+            if bMD5:
+                manifest.append((fout.hexdigest(), dst_img))
+        f = open(dst_lbl,'wb')
+        f.write(text.encode('ascii'))
+        f.close()
+        manifest.append((hashlib.md5(text.encode('ascii')).hexdigest(), dst_lbl))
+        if bMakeImage:
+            print ('Complete. PDS label also created: %s' % dst_lbl)
+        else:
+            print ('Complete. PDS label created: %s' % dst_lbl)
 
-#/* -------------------------------------------------------------------- */
-#/*      Transform to latlong and report.                                */
-#/* -------------------------------------------------------------------- */
-    if hTransform is not None:
-        pnt = hTransform.TransformPoint(dfGeoX, dfGeoY, 0)
-        if pnt is not None:
-          return pnt[1]
-    return dfGeoY
+    if bMD5:
+        dst_md5 = os.path.splitext(dst_img)[0] + '.md5'
+        WriteManifest(dst_md5, manifest)
+        print ('MD5 checksum manifest created: %s' % dst_md5)
+    
+    return 0
 
 if __name__ == '__main__':
     version_num = int(gdal.VersionInfo('VERSION_NUM'))
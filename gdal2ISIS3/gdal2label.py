@@ -0,0 +1,947 @@
+#!/usr/bin/env python
+#/******************************************************************************
+# * $Id$
+# *
+# * Project: GDAL Utilities
+# * Purpose: Label core shared by Astropedia_gdal2ISIS3.py, LMMP_gdal2PDS.py
+# *          and gdal2metadata.py. A dataset is inspected once into a record
+# *          (size, bands, projection parameters, corners, resolution) that
+# *          is rendered as an ISIS3 label, a PDS3 label or FGDC metadata.
+# *          Also streaming the image core, label statistics and MD5
+# *          checksums.
+# * Author:  Trent Hare, <thare@usgs.gov>
+# *
+# * Port from gdalinfo.py whose author is Even Rouault
+# ******************************************************************************
+# * Copyright (c) 2010, Even Rouault
+# * Copyright (c) 1998, Frank Warmerdam
+# *
+# * Permission is hereby granted, free of charge, to any person obtaining a
+# * copy of this software and associated documentation files (the "Software"),
+# * to deal in the Software without restriction, including without limitation
+# * the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# * and/or sell copies of the Software, and to permit persons to whom the
+# * Software is furnished to do so, subject to the following conditions:
+# *
+# * The above copyright notice and this permission notice shall be included
+# * in all copies or substantial portions of the Software.
+# *
+# * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# * OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# * THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# * FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# * DEALINGS IN THE SOFTWARE.
+# ****************************************************************************/
+#
+# Usage from python (the scripts import it from the folder they live in):
+#
+#   record = Inspect(hDataset, pszFilename)
+#   label = ISIS3Label(record, 'out.cub')
+
+import os
+import math
+import hashlib
+from time import strftime
+try:
+    from osgeo import gdal
+    from osgeo import osr
+except:
+    import gdal
+    import osr
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+#per process caches of lat/long transforms keyed by the WKT
+_transformCache = {}
+_srsCache = {}
+
+#projection parameters kept in a record, see InspectSRS()
+PROJ_PARMS = ['central_meridian', 'standard_parallel_1', 'latitude_of_origin',
+              'longitude_of_center', 'scale_factor', 'false_easting',
+              'false_northing']
+
+#GDAL type -> (bits, dtype written, ISIS3 Type, PDS3 SAMPLE_TYPE, SAMPLE_BIT_MASK)
+#ISIS has no 64 bit type, Float64 is written out as 32 bit Real; the PDS3
+#label doesn't take it
+PIXEL_TYPES = {
+    'byte'    : (8,  'u1',  'UnsignedByte', 'UNSIGNED_INTEGER',     '2#11111111#'),
+    'int16'   : (16, '<i2', 'SignedWord',   'LSB_INTEGER',          '2#1111111111111111#'),
+    'uint16'  : (16, '<u2', 'UnsignedWord', 'LSB_UNSIGNED_INTEGER', '2#1111111111111111#'),
+    'float32' : (32, '<f4', 'Real',         'PC_REAL',              '2#11111111111111111111111111111111#'),
+    'float64' : (32, '<f4', 'Real',         None,                   '2#11111111111111111111111111111111#'),
+}
+
+#an attached ISIS3 label is padded to this size, the core follows it
+ISIS_LABEL_BYTES = 65536
+
+#WKT projection -> (ISIS ProjectionName, CenterLatitude, CenterLongitude parameters)
+ISIS_PROJECTIONS = {
+    'Sinusoidal' : ('Sinusoidal', None, 'central_meridian'),
+    'Equirectangular' : ('Equirectangular', 'standard_parallel_1', 'central_meridian'),
+    'Transverse_Mercator' : ('TransverseMercator', 'standard_parallel_1', 'central_meridian'),
+    'Orthographic' : ('Orthographic', 'standard_parallel_1', 'central_meridian'),
+    'Mercator' : ('Mercator', 'standard_parallel_1', 'central_meridian'),
+    'Mercator_1SP' : ('Mercator', 'standard_parallel_1', 'central_meridian'),
+    'Polar_Stereographic' : ('PolarStereographic', 'latitude_of_origin', 'central_meridian'),
+    'Stereographic_South_Pole' : ('PolarStereographic', 'latitude_of_origin', 'central_meridian'),
+    'Stereographic_North_Pole' : ('PolarStereographic', 'latitude_of_origin', 'central_meridian'),
+}
+
+#WKT projection -> (FGDC mapprojn, projection element, [(element, parameters)])
+FGDC_PROJECTIONS = {
+    'Equirectangular' : ('Equirectangular', 'equirect',
+        [('stdparll', ('standard_parallel_1', 'latitude_of_origin')),
+         ('longcm', ('central_meridian',))]),
+    'Mercator' : ('Mercator', 'transmer',
+        [('stdparll', ('latitude_of_origin', 'standard_parallel_1')),
+         ('longcm', ('central_meridian',)),
+         ('sfequat', ('scale_factor',))]),
+    'Orthographic' : ('Orthographic', 'orthogr',
+        [('stdparll', ('latitude_of_origin',)),
+         ('longcm', ('central_meridian',))]),
+    'Stereographic' : ('Stereographic', 'stereo',
+        [('latprjc', ('latitude_of_origin',)),
+         ('longpc', ('central_meridian',))]),
+    'Sinusoidal' : ('Sinusoidal', 'sinusoid',
+        [('longcm', ('longitude_of_center', 'central_meridian'))]),
+    'Robinson' : ('Robinson', 'robinson',
+        [('longpc', ('longitude_of_center', 'central_meridian'))]),
+    'Polar_Stereographic' : ('Polar Stereographic', 'polarst',
+        [('stdparll', ('latitude_of_origin',)),
+         ('svlong', ('central_meridian',)),
+         ('sfprjorg', ('scale_factor',))]),
+    'Transverse_Mercator' : ('Transverse Mercator', 'transmer',
+        [('latprjo', ('latitude_of_origin',)),
+         ('longcm', ('central_meridian',)),
+         ('sfctrmer', ('scale_factor',))]),
+}
+FGDC_PROJECTIONS['Stereographic_North_Pole'] = FGDC_PROJECTIONS['Polar_Stereographic']
+FGDC_PROJECTIONS['Stereographic_South_Pole'] = FGDC_PROJECTIONS['Polar_Stereographic']
+
+#statistics gathered while the image is written are back-filled into labels
+#in fields of this fixed width, so the label size is known before the data
+STATS_WIDTH = 24
+STATS_NAMES = ['MINIMUM', 'MAXIMUM', 'MEAN', 'STANDARD_DEVIATION', 'VALID_PIXELS']
+
+#/************************************************************************/
+#/*                         LatLongTransform()                           */
+#/************************************************************************/
+
+def LatLongTransform( pszProjection ):
+    """Projected to lat/long transform for a WKT, cached per unique WKT."""
+    if pszProjection in _transformCache:
+        return _transformCache[pszProjection]
+
+    hTransform = None
+    hProj = osr.SpatialReference( pszProjection )
+    if hProj is not None:
+        hLatLong = hProj.CloneGeogCS()
+        if hLatLong is not None:
+            gdal.PushErrorHandler( 'CPLQuietErrorHandler' )
+            hTransform = osr.CoordinateTransformation( hProj, hLatLong )
+            gdal.PopErrorHandler()
+            if gdal.GetLastErrorMsg().find( 'Unable to load PROJ.4 library' ) != -1:
+                hTransform = None
+    _transformCache[pszProjection] = hTransform
+    return hTransform
+
+#/************************************************************************/
+#/*                            InspectSRS()                              */
+#/************************************************************************/
+
+def InspectSRS( pszProjection ):
+    """Values of a WKT used by the labels, or None if it can't be parsed.
+
+    A dict: prettyWkt, geographic, projection (the PROJECTION name, None
+    when geographic), datum, semiMajor, semiMinor (meters), invFlat and
+    parms (PROJ_PARMS, missing ones None). Cached per unique WKT, so a
+    product set sharing one projection is only parsed once per process.
+    """
+    if pszProjection in _srsCache:
+        return _srsCache[pszProjection]
+
+    srs = None
+    hSRS = osr.SpatialReference()
+    if pszProjection is not None and len(pszProjection) > 0 and \
+            hSRS.ImportFromWkt(pszProjection) == gdal.CE_None:
+        srs = { 'prettyWkt' : hSRS.ExportToPrettyWkt(False),
+                'geographic' : pszProjection[0:6] == "GEOGCS",
+                'projection' : None,
+                'datum' : hSRS.GetAttrValue("DATUM",0),
+                'semiMajor' : hSRS.GetSemiMajor(),
+                'semiMinor' : hSRS.GetSemiMinor(),
+                'invFlat' : hSRS.GetInvFlattening(),
+                'parms' : { } }
+        if pszProjection[0:6] == "PROJCS":
+            srs['projection'] = hSRS.GetAttrValue("PROJECTION",0)
+        for name in PROJ_PARMS:
+            #NaN default, to tell a missing parameter from a 0
+            value = hSRS.GetProjParm(name, float('nan'))
+            if value == value:
+                srs['parms'][name] = value
+            else:
+                srs['parms'][name] = None
+    _srsCache[pszProjection] = srs
+    return srs
+
+#/************************************************************************/
+#/*                              Inspect()                               */
+#/************************************************************************/
+
+def Inspect( hDataset, pszFilename = None ):
+    """Read what the labels need from an open dataset, once.
+
+    Returns a dict: filename, samples, lines, bands, geoTransform, wkt,
+    srs (see InspectSRS, None without a usable projection), corners
+    ('ul' and 'lr' as lon,lat), mres (meters/pixel), mapres (pixels/degree)
+    and bandInfo (type, offset, scale, nodata of every band). Only header
+    values are used, no pixel block is read. ISIS3Label, PDS3Label and
+    FGDCTree render it.
+    """
+    if pszFilename is None:
+        pszFilename = hDataset.GetDescription()
+    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
+    pszProjection = hDataset.GetProjectionRef()
+    srs = InspectSRS(pszProjection)
+
+    hTransform = None
+    if srs is not None:
+        hTransform = LatLongTransform( pszProjection )
+
+    record = { 'filename' : pszFilename,
+               'samples' : hDataset.RasterXSize,
+               'lines' : hDataset.RasterYSize,
+               'bands' : hDataset.RasterCount,
+               'geoTransform' : adfGeoTransform,
+               'wkt' : pszProjection,
+               'srs' : srs,
+               'corners' : {
+                   'ul' : GDALGetLonLat( hDataset, hTransform, 0.0, 0.0 ),
+                   'lr' : GDALGetLonLat( hDataset, hTransform, hDataset.RasterXSize,
+                                         hDataset.RasterYSize ) },
+               'mres' : None,
+               'mapres' : None }
+
+    #Using a very simple method to calculate cellsize.
+    #Warning: might not always be good.
+    if adfGeoTransform is not None and srs is not None:
+        semiMajor = srs['semiMajor']
+        if srs['geographic']:
+            #convert degrees/pixel to m/pixel
+            record['mapres'] = 1 / adfGeoTransform[1]
+            record['mres'] = adfGeoTransform[1] * (semiMajor * math.pi / 180.0)
+        else:
+            #convert m/pixel to pixel/degree
+            record['mapres'] = 1 / (adfGeoTransform[1] / (semiMajor * math.pi / 180.0))
+            record['mres'] = adfGeoTransform[1]
+
+    record['bandInfo'] = [ ]
+    for iBand in range(hDataset.RasterCount):
+        hBand = hDataset.GetRasterBand(iBand+1)
+        record['bandInfo'].append({ 'type' : gdal.GetDataTypeName(hBand.DataType),
+                                    'offset' : hBand.GetOffset(),
+                                    'scale' : hBand.GetScale(),
+                                    'nodata' : hBand.GetNoDataValue() })
+    return record
+
+#/************************************************************************/
+#/*                             PixelType()                              */
+#/************************************************************************/
+
+def PixelType( record ):
+    """(bits, dtype, ISIS3 Type, PDS3 SAMPLE_TYPE, SAMPLE_BIT_MASK) of the
+    first band, or None if the type isn't supported."""
+    return PIXEL_TYPES.get(record['bandInfo'][0]['type'].lower())
+
+def _Parm( srs, *names ):
+    """First of the named projection parameters that is set, else 0."""
+    for name in names:
+        if srs['parms'][name] is not None:
+            return srs['parms'][name]
+    return 0.0
+
+#/************************************************************************/
+#/*                             ISIS3Label()                             */
+#/************************************************************************/
+
+def ISIS3Label( record, dst_cub, attach = False, tile = None, base = None,
+                multiplier = None, force360 = False, centerLon = None,
+                dst_hst = None ):
+    """ISIS3 cube label for a record (see Inspect).
+
+    An attached label is padded to ISIS_LABEL_BYTES and followed by the
+    core, a detached one points to dst_cub with ^Core. tile is
+    (tileSamples, tileLines) for a tiled core, None for band sequential.
+    base and multiplier replace the band offset and scale, centerLon the
+    center longitude, force360 puts the longitudes in the 0 to 360 domain.
+    """
+    ptype = PixelType(record)
+    if ptype is None:
+        raise ValueError('%s: Not supported pixel type' % record['bandInfo'][0]['type'])
+    (sample_bits, sample_type) = (ptype[0], ptype[2])
+    band = record['bandInfo'][0]
+
+    #a tiled core is padded out to whole tiles
+    if tile is not None:
+        coreSamples = -(-record['samples'] // tile[0]) * tile[0]
+        coreLines = -(-record['lines'] // tile[1]) * tile[1]
+    else:
+        coreSamples = record['samples']
+        coreLines = record['lines']
+    coreBytes = coreSamples * coreLines * record['bands'] * (sample_bits // 8)
+    if attach:
+        coreStartByte = ISIS_LABEL_BYTES + 1
+    else:
+        coreStartByte = 1
+
+    srs = record['srs']
+    target = "n/a"
+    if srs is not None:
+        target = srs['datum'].replace("D_","").replace("_2000","").replace("GCS_","")
+
+    f = StringIO()
+    f.write('Object = IsisCube\n')
+    f.write('  Object = Core\n')
+    f.write('    StartByte = %d\n' % coreStartByte)
+    if not attach:
+        f.write('    ^Core     = %s\n' % (dst_cub))
+    if tile is not None:
+        f.write('    Format      = Tile\n')
+        f.write('    TileSamples = %d\n' % tile[0])
+        f.write('    TileLines   = %d\n' % tile[1])
+    else:
+        f.write('    Format    = BandSequential\n')
+    f.write('\n')
+    f.write('    Group = Dimensions\n')
+    f.write('      Samples = %d\n' % record['samples'])
+    f.write('      Lines   = %d\n' % record['lines'])
+    f.write('      Bands   = %d\n' % record['bands'])
+    f.write('    End_Group\n')
+    f.write('\n')
+    f.write('    Group = Pixels\n')
+    f.write('      Type       = %s\n' % (sample_type))
+    f.write('      ByteOrder  = Lsb\n')
+    if base is None:
+        base = band['offset']
+    if multiplier is None:
+        multiplier = band['scale']
+    f.write('      Base       = %.10g\n' % base)
+    f.write('      Multiplier = %.10g\n' % multiplier)
+    f.write('    End_Group\n')
+    f.write('  End_Object\n')
+    f.write('\n')
+    f.write('  Group = Archive\n')
+    f.write('    DataSetId               = %s\n' % record['filename'].split(".")[0])
+    f.write('    ProducerInstitutionName = \"Astrogeology Science Center\"\n')
+    f.write('    ProducerId              = Astrogeology\n')
+    f.write('    ProducerFullName        = USGS\n')
+    if "_v" in record['filename']:
+        f.write('    ProductId               = %s\n' % record['filename'].split("_")[-1].split(".")[0].upper())
+    else:
+        f.write('    ProductId               = n/a\n')
+    f.write('    ProductVersionId        = n/a\n')
+    f.write('    InstrumentHostName      = n/a\n')
+    f.write('    InstrumentName          = n/a\n')
+    f.write('    InstrumentId            = n/a\n')
+    f.write('    TargetName              = %s\n' % target)
+    f.write('    MissionPhaseName        = n/a\n')
+    f.write('  End_Group\n')
+    f.write('\n')
+    if srs is not None:
+        if srs['geographic']:
+            (mapProjection, latParm, lonParm) = ("SimpleCylindrical", None, 'central_meridian')
+        else:
+            (mapProjection, latParm, lonParm) = ISIS_PROJECTIONS.get(srs['projection'],
+                                                  (srs['projection'], None, None))
+        centLat = 0.0
+        centLon = 0.0
+        if latParm is not None:
+            centLat = _Parm(srs, latParm)
+        if lonParm is not None:
+            centLon = _Parm(srs, lonParm)
+        if centerLon:
+            centLon = centerLon
+        (ulx, uly) = record['corners']['ul']
+        (lrx, lry) = record['corners']['lr']
+        #Calculate Simple Cylindrical X,Y in meters from bounds if not projected.
+        UpperLeftCornerX = 0.0
+        UpperLeftCornerY = 0.0
+        adfGeoTransform = record['geoTransform']
+        if srs['geographic']:
+            UpperLeftCornerX = srs['semiMajor'] * (ulx - centLon) * math.pi / 180.0
+            UpperLeftCornerY = srs['semiMajor'] * uly * math.pi / 180.0
+        elif adfGeoTransform is not None:
+            UpperLeftCornerX = adfGeoTransform[0]
+            UpperLeftCornerY = adfGeoTransform[3]
+            #Need to research when TM actually applies false values
+            if mapProjection == "TransverseMercator":
+                UpperLeftCornerX = UpperLeftCornerX - _Parm(srs, 'false_easting')
+                UpperLeftCornerY = UpperLeftCornerY - _Parm(srs, 'false_northing')
+
+        f.write('  Group = Mapping\n')
+        f.write('    ProjectionName          = %s\n' % mapProjection)
+        if centLon < 0 and force360:
+            centLon = centLon + 360
+        f.write('    CenterLongitude         = %.5f\n' % centLon)
+        f.write('    CenterLatitude          = %.5f\n' % centLat)
+        if mapProjection == "TransverseMercator":
+            f.write('    ScaleFactor             = %6.5f\n' % _Parm(srs, 'scale_factor'))
+        f.write('    TargetName              = %s\n' % target)
+        f.write('    EquatorialRadius        = %.1f <meters>\n' % srs['semiMajor'])
+        f.write('    PolarRadius             = %.1f <meters>\n' % srs['semiMinor'])
+        if mapProjection == "TransverseMercator":
+            f.write('    LatitudeType            = Planetographic\n')
+        else:
+            f.write('    LatitudeType            = Planetocentric\n')
+        f.write('    LongitudeDirection      = PositiveEast\n')
+        if force360 or lrx > 180:
+            f.write('    LongitudeDomain         = 360\n')
+        else:
+            f.write('    LongitudeDomain         = 180\n')
+        if record['mres'] is not None:
+            f.write('    PixelResolution         = %.8f <meters/pixel>\n' % record['mres'])
+            f.write('    Scale                   = %.4f <pixel/degree>\n' % record['mapres'])
+        f.write('    MinimumLatitude         = %.8f\n' % min(uly, lry))
+        f.write('    MaximumLatitude         = %.8f\n' % max(uly, lry))
+        #push into 360 domain (for Astropedia)
+        if force360:
+            if ulx < 0:
+                ulx = ulx + 360
+            if lrx < 0:
+                lrx = lrx + 360
+        f.write('    MinimumLongitude        = %.8f\n' % min(ulx, lrx))
+        f.write('    MaximumLongitude        = %.8f\n' % max(ulx, lrx))
+        f.write('    UpperLeftCornerX        = %.6f <meters>\n' % UpperLeftCornerX)
+        f.write('    UpperLeftCornerY        = %.6f <meters>\n' % UpperLeftCornerY)
+        f.write('  End_Group\n')
+    f.write('End_Object\n')
+    f.write('\n')
+    f.write('Object = Label\n')
+    if attach:
+        f.write('  Bytes = %d\n' % ISIS_LABEL_BYTES)
+    else:
+        #NOT correct
+        f.write('  Bytes = 256\n')
+    f.write('End_Object\n')
+    f.write('\n')
+    f.write('Object = History\n')
+    f.write('  Name           = IsisCube\n')
+    if attach:
+        #empty history, placed right after the core
+        f.write('  StartByte      = %d\n' % (coreStartByte + coreBytes))
+        f.write('  Bytes          = 0\n')
+    else:
+        f.write('  StartByte      = 1\n')
+        #NOT correct
+        f.write('  Bytes          = 0\n')
+        f.write('  ^History       = %s\n' % dst_hst)
+    f.write('End_Object\n')
+    f.write('End\n')
+    label = f.getvalue()
+    f.close()
+    return label
+
+#/************************************************************************/
+#/*                             PDS3Label()                              */
+#/************************************************************************/
+
+def PDS3Label( record, dst_img, attach = False, bStats = True ):
+    """PDS3 label for a record (see Inspect), one record per image line.
+
+    FILE_RECORDS (and with attach LABEL_RECORDS and ^IMAGE) are left as
+    @..@ placeholders to fill in once the label size is known. With bStats
+    the IMAGE statistics are StatsPlaceholder fields, see StatsFill.
+    """
+    ptype = PixelType(record)
+    if ptype is None or ptype[3] is None:
+        raise ValueError('%s: Not supported pixel type' % record['bandInfo'][0]['type'])
+    (sample_bits, sample_type, sample_mask) = (ptype[0], ptype[3], ptype[4])
+    band = record['bandInfo'][0]
+    pszFilename = record['filename']
+    instrList = pszFilename.split("_")
+
+    f = StringIO()
+    f.write('PDS_VERSION_ID            = PDS3\n')
+    f.write('\n')
+    f.write('/* The source image data definition. */\n')
+    f.write('FILE_NAME      = \"%s\"\n' % (os.path.basename(dst_img)))
+    f.write('RECORD_TYPE   = FIXED_LENGTH\n')
+    f.write('RECORD_BYTES  = %d\n' % (record['samples'] * sample_bits // 8))
+    f.write('FILE_RECORDS  = @FILE_RECORDS@\n')
+    if attach:
+        f.write('LABEL_RECORDS = @LABEL_RECORDS@\n')
+        f.write('^IMAGE        = @IMAGE@\n')
+    else:
+        f.write('^IMAGE        = \"%s\"\n' % (os.path.basename(dst_img)))
+    f.write('\n')
+    f.write('/* Identification Information  */\n')
+    f.write('DATA_SET_ID               = "%s"\n' % pszFilename.split(".")[0])
+    f.write('DATA_SET_NAME             = "%s"\n' % pszFilename.split(".")[0])
+    f.write('PRODUCER_INSTITUTION_NAME = "Lunar Mapping and Modeling Project"\n')
+    f.write('PRODUCER_ID               = "LMMP_TEAM"\n')
+    f.write('PRODUCER_FULL_NAME        = "LMMP TEAM"\n')
+    f.write('PRODUCT_ID                = "%s"\n' % pszFilename.split(".")[0])
+    if "_v" in pszFilename:
+        f.write('PRODUCT_VERSION_ID        = "%s.0"\n' % instrList[-1].split(".")[0].upper())
+    else:
+        f.write('PRODUCT_VERSION_ID        = "%s"\n' % "V1.0")
+    f.write('PRODUCT_TYPE              = "RDR"\n')
+    if len(instrList) > 1:
+        f.write('INSTRUMENT_HOST_NAME      = "%s"\n' % instrList[0])
+        f.write('INSTRUMENT_HOST_ID        = "%s"\n' % instrList[0])
+        f.write('INSTRUMENT_NAME           = "%s"\n' % instrList[1])
+        f.write('INSTRUMENT_ID             = "%s"\n' % instrList[1])
+    f.write('TARGET_NAME               = MOON\n')
+    f.write('MISSION_PHASE_NAME        = "POST MISSION"\n')
+    f.write('RATIONALE_DESC            = "Created at the request of NASA\'s Exploration\n')
+    f.write('                            Systems Mission Directorate to support future\n')
+    f.write('                            human exploration"\n')
+    f.write('SOFTWARE_NAME             = "ISIS 3.2.1 | SOCET SET v5.5 (r) BAE Systems\n')
+    f.write('                            | GDAL 1.8"\n')
+    f.write('\n')
+    f.write('/* Time Parameters */\n')
+    f.write('START_TIME                   = "N/A"\n')
+    f.write('STOP_TIME                    = "N/A"\n')
+    f.write('SPACECRAFT_CLOCK_START_COUNT = "N/A"\n')
+    f.write('SPACECRAFT_CLOCK_STOP_COUNT  = "N/A"\n')
+    f.write('PRODUCT_CREATION_TIME        = %s\n' % strftime("%Y-%m-%dT%H:%M:%S"))   #2011-03-11T22:13:40
+    f.write('\n')
+    srs = record['srs']
+    if srs is not None and record['mres'] is not None:
+        centLat = None
+        centLon = None
+        if srs['geographic']:
+            mapProjection = "SIMPLE_CYLINDRICAL"
+            centLat = 0
+            centLon = 0
+        else:
+            mapProjection = srs['projection']
+            if mapProjection == "Equirectangular":
+                centLat = _Parm(srs, 'standard_parallel_1')
+                centLon = _Parm(srs, 'central_meridian')
+            if mapProjection in ("Polar_Stereographic", "Stereographic_South_Pole",
+                                 "Stereographic_North_Pole"):
+                centLat = _Parm(srs, 'latitude_of_origin')
+                centLon = _Parm(srs, 'central_meridian')
+        (ulx, uly) = record['corners']['ul']
+        (lrx, lry) = record['corners']['lr']
+        kmres = record['mres'] / 1000.0
+        f.write('OBJECT = IMAGE_MAP_PROJECTION\n')
+        f.write('    ^DATA_SET_MAP_PROJECTION     = "DSMAP.CAT"\n')
+        f.write('    MAP_PROJECTION_TYPE          = \"%s\"\n' % mapProjection)
+        f.write('    PROJECTION_LATITUDE_TYPE     = PLANETOCENTRIC\n')
+        f.write('    A_AXIS_RADIUS                = %.1f <KM>\n' % (srs['semiMajor'] / 1000.0))
+        f.write('    B_AXIS_RADIUS                = %.1f <KM>\n' % (srs['semiMajor'] / 1000.0))
+        f.write('    C_AXIS_RADIUS                = %.1f <KM>\n' % (srs['semiMinor'] / 1000.0))
+        f.write('    COORDINATE_SYSTEM_NAME       = PLANETOCENTRIC\n')
+        f.write('    POSITIVE_LONGITUDE_DIRECTION = EAST\n')
+        f.write('    KEYWORD_LATITUDE_TYPE        = PLANETOCENTRIC\n')
+        f.write('    /* NOTE:  CENTER_LATITUDE and CENTER_LONGITUDE describe the location   */\n')
+        f.write('    /* of the center of projection, which is not necessarily equal to the  */\n')
+        f.write('    /* location of the center point of the image.                          */\n')
+        if centLat is not None:
+            f.write('    CENTER_LATITUDE              = %5.2f <DEG>\n' % centLat)
+        if centLon is not None:
+            f.write('    CENTER_LONGITUDE             = %5.2f <DEG>\n' % centLon)
+        f.write('    LINE_FIRST_PIXEL             = 1\n')
+        f.write('    LINE_LAST_PIXEL              = %d\n' % record['lines'])
+        f.write('    SAMPLE_FIRST_PIXEL           = 1\n')
+        f.write('    SAMPLE_LAST_PIXEL            = %d\n' % record['samples'])
+        f.write('    MAP_PROJECTION_ROTATION      = 0.0 <DEG>\n')
+        f.write('    MAP_RESOLUTION               = %.4f <PIX/DEG>\n' % record['mapres'])
+        f.write('    MAP_SCALE                    = %.8f <KM/PIXEL>\n' % kmres)
+        f.write('    MINIMUM_LATITUDE             = %.8f <DEGREE>\n' % lry)
+        f.write('    MAXIMUM_LATITUDE             = %.8f <DEGREE>\n' % uly)
+        f.write('    WESTERNMOST_LONGITUDE        = %.8f <DEGREE>\n' % ulx)
+        f.write('    EASTERNMOST_LONGITUDE        = %.8f <DEGREE>\n' % lrx)
+        f.write('    LINE_PROJECTION_OFFSET       = %.1f\n' % ( (ulx / kmres * 1000 ) - 0.5 ))
+        f.write('    SAMPLE_PROJECTION_OFFSET     = %.1f\n' % ( (uly / kmres * 1000 ) + 0.5 ))
+        f.write('END_OBJECT = IMAGE_MAP_PROJECTION\n')
+        f.write('\n')
+    f.write('OBJECT = IMAGE\n')
+    f.write('    NAME                       = \"%s\"\n' % (pszFilename))
+    f.write('    DESCRIPTION                = "Export data set from LMMP portal.\n')
+    f.write('                                 see filename for data type."\n')
+    f.write('    LINES                      = %d\n' % record['lines'])
+    f.write('    LINE_SAMPLES               = %d\n' % record['samples'])
+    f.write('    UNIT                       = METER\n')
+    f.write('    OFFSET                     = %.10g\n' % band['offset'])
+    f.write('    SCALING_FACTOR             = %.10g\n' % band['scale'])
+    f.write('    SAMPLE_TYPE                = %s\n' % (sample_type) )
+    f.write('    SAMPLE_BITS                = %d\n' % (sample_bits) )
+    f.write('    SAMPLE_BIT_MASK            = %s\n' % (sample_mask) )
+    f.write('    BANDS                      = %d\n' % record['bands'])
+    f.write('    BAND_STORAGE_TYPE          = BAND_SEQUENTIAL\n')
+    if bStats:
+        #all bands, gathered while the image is written (see StatsFill)
+        f.write('    MINIMUM                    = %s\n' % StatsPlaceholder('MINIMUM'))
+        f.write('    MAXIMUM                    = %s\n' % StatsPlaceholder('MAXIMUM'))
+        f.write('    MEAN                       = %s\n' % StatsPlaceholder('MEAN'))
+        f.write('    STANDARD_DEVIATION         = %s\n' % StatsPlaceholder('STANDARD_DEVIATION'))
+        f.write('    VALID_PIXELS               = %s\n' % StatsPlaceholder('VALID_PIXELS'))
+    if (sample_bits == 32) :
+        f.write('    CORE_NULL                  = 16#FF7FFFFB#\n')
+        f.write('    CORE_LOW_REPR_SATURATION   = 16#FF7FFFFC#\n')
+        f.write('    CORE_LOW_INSTR_SATURATION  = 16#FF7FFFFD#\n')
+        f.write('    CORE_HIGH_REPR_SATURATION  = 16#FF7FFFFF#\n')
+        f.write('    CORE_HIGH_INSTR_SATURATION = 16#FF7FFFFE#\n')
+    elif (sample_bits == 16) :
+        f.write('    CORE_NULL                  = -32768\n')
+        f.write('    CORE_LOW_REPR_SATURATION   = -32767\n')
+        f.write('    CORE_LOW_INSTR_SATURATION  = -32766\n')
+        f.write('    CORE_HIGH_REPR_SATURATION  = 32767\n')
+        f.write('    CORE_HIGH_INSTR_SATURATION = 32768\n')
+    else : #8bit
+        f.write('    CORE_NULL                  = 0\n')
+        f.write('    CORE_LOW_REPR_SATURATION   = 0\n')
+        f.write('    CORE_LOW_INSTR_SATURATION  = 0\n')
+        f.write('    CORE_HIGH_REPR_SATURATION  = 255\n')
+        f.write('    CORE_HIGH_INSTR_SATURATION = 255\n')
+    f.write('END_OBJECT = IMAGE\n')
+    f.write('END\n')
+    label = f.getvalue()
+    f.close()
+    return label
+
+#/************************************************************************/
+#/*                              FGDCTree()                              */
+#/************************************************************************/
+
+def FGDCDatum( srs ):
+    """(horizdn, ellips) of the FGDC geodetic model for a srs."""
+    targetD = srs['datum'].replace("_2000","").replace("_localRadius","").title()
+    return (targetD, targetD.replace("D_","").title())
+
+def FGDCTree( record, tree ):
+    """Fill an FGDC (CSDGM) template from a record (see Inspect), in place.
+
+    tree needs iter(tag) and SubElement(parent, tag), as the Template of
+    gdal2metadata.py has. A projected record gets a planar/mapproj block
+    under every horizsys; projection elements already in the template are
+    filled in too.
+    """
+    for citation in tree.iter('citation'):
+        for citeinfo in citation.iter('citeinfo'):
+            title = citeinfo.find('title')
+            if title is None:
+                title = tree.SubElement(citeinfo, 'title')
+            title.text = record['filename']
+
+    for rasttype in tree.iter('rasttype'):
+        rasttype.text = "Pixel"
+
+    srs = record['srs']
+    adfGeoTransform = record['geoTransform']
+    if srs is not None:
+        (targetD, target) = FGDCDatum(srs)
+        # the USGS tool MP doesn't like 0 for the invFlat so we are putting a giant number to represent a sphere
+        invFlat = srs['invFlat']
+        if invFlat < 0.1:
+            invFlat = 1.0e+10
+        for horizdn in tree.iter('horizdn'):
+            horizdn.text = targetD
+        for ellips in tree.iter('ellips'):
+            ellips.text = target
+        for semiaxis in tree.iter('semiaxis'):
+            semiaxis.text = str(srs['semiMajor'])
+        for denflat in tree.iter('denflat'):
+            denflat.text = "{:.2e}".format(invFlat)
+
+    if srs is not None and not srs['geographic']:
+        proj = FGDC_PROJECTIONS.get(srs['projection'])
+        for horizsys in tree.iter('horizsys'):
+            planar = tree.SubElement(horizsys, 'planar')
+            mapproj = tree.SubElement(planar, 'mapproj')
+            tree.SubElement(mapproj, 'mapprojn')
+            if proj is not None:
+                tree.SubElement(mapproj, proj[1])
+            #Create cellsize block for all projections
+            planci = tree.SubElement(planar, 'planci')
+            tree.SubElement(planci, 'plance').text = 'row and column'
+            coordrep = tree.SubElement(planci, 'coordrep')
+            tree.SubElement(coordrep, 'absres')
+            tree.SubElement(coordrep, 'ordres')
+            tree.SubElement(planci, 'plandu')
+        if proj is not None:
+            (mapprojnText, projTag, parms) = proj
+            for mapprojn in tree.iter('mapprojn'):
+                mapprojn.text = mapprojnText
+            for element in tree.iter(projTag):
+                for (tag, names) in parms + [('feast', ('false_easting',)),
+                                             ('fnorth', ('false_northing',))]:
+                    child = element.find(tag)
+                    if child is None:
+                        child = tree.SubElement(element, tag)
+                    child.text = str(_Parm(srs, *names))
+
+    if srs is not None and adfGeoTransform is not None:
+        if srs['geographic']:
+            for latres in tree.iter('latres'):
+                latres.text = "{:.6f}".format(adfGeoTransform[5])
+            for lonres in tree.iter('lonres'):
+                lonres.text = "{:.6f}".format(adfGeoTransform[1])
+            for geogunit in tree.iter('geogunit'):
+                geogunit.text = "Decimal degrees"
+        else:
+            for absres in tree.iter('absres'): # in meters
+                absres.text = "{:.6f}".format(adfGeoTransform[1])
+            for ordres in tree.iter('ordres'):
+                ordres.text = "{:.6f}".format(adfGeoTransform[5] * -1)
+            for plandu in tree.iter('plandu'):
+                plandu.text = "meters"
+
+    (ulx, uly) = record['corners']['ul']
+    (lrx, lry) = record['corners']['lr']
+    #FGDC metadata requires -180 to 180 to pass validation (not 0 to 360).
+    if lrx > 179.99:
+        lrx = lrx - 360
+    if ulx > 179.99:
+        ulx = ulx - 360
+    for southbc in tree.iter('southbc'):
+        southbc.text = "{:.4f}".format(lry)
+    for northbc in tree.iter('northbc'):
+        northbc.text = "{:.4f}".format(uly)
+    for westbc in tree.iter('westbc'):
+        westbc.text = "{:.4f}".format(ulx)
+    for eastbc in tree.iter('eastbc'):
+        eastbc.text = "{:.4f}".format(lrx)
+    for rowcount in tree.iter('rowcount'):
+        rowcount.text = str(record['lines'])
+    for colcount in tree.iter('colcount'):
+        colcount.text = str(record['samples'])
+    for vrtcount in tree.iter('vrtcount'):
+        vrtcount.text = str(record['bands'])
+    for metstdn in tree.iter('metstdn'):
+        metstdn.text = "FGDC Content Standards for Digital Geospatial Metadata"
+    for metstdv in tree.iter('metstdv'):
+        metstdv.text = "FGDC-STD-001-1998"
+    return tree
+
+#/************************************************************************/
+#/*                            StatsNew()                                */
+#/************************************************************************/
+
+def StatsNew():
+    """Empty statistics accumulator for StatsAccumulate()."""
+    return { 'count' : 0, 'min' : None, 'max' : None, 'mean' : 0.0, 'm2' : 0.0 }
+
+def StatsAccumulate( stats, data, nodata = None, validRange = None ):
+    """Add the valid pixels of a block (a numpy array) to stats.
+
+    NaN/inf and nodata pixels are skipped, as are pixels outside
+    validRange (min, max) when it is given, e.g. the ISIS special pixels.
+    Blocks are merged with their mean and sum of squared deviations, so
+    the standard deviation stays exact over any number of blocks.
+    """
+    import numpy as np
+    if data.dtype.kind == 'f':
+        valid = data[np.isfinite(data)]
+    else:
+        valid = data.ravel()
+    if nodata is not None and nodata == nodata:
+        valid = valid[valid != np.asarray(nodata).astype(data.dtype)]
+    if validRange is not None:
+        valid = valid[(valid >= validRange[0]) & (valid <= validRange[1])]
+    n = valid.size
+    if n == 0:
+        return stats
+    valid = valid.astype(np.float64)
+    mean = valid.mean()
+    m2 = ((valid - mean) ** 2).sum()
+    vmin = float(valid.min())
+    vmax = float(valid.max())
+    if stats['count'] == 0:
+        stats['min'] = vmin
+        stats['max'] = vmax
+        stats['mean'] = float(mean)
+        stats['m2'] = float(m2)
+    else:
+        total = stats['count'] + n
+        delta = mean - stats['mean']
+        stats['mean'] = float(stats['mean'] + delta * n / total)
+        stats['m2'] = float(stats['m2'] + m2 + delta * delta * stats['count'] * n / total)
+        stats['min'] = min(stats['min'], vmin)
+        stats['max'] = max(stats['max'], vmax)
+    stats['count'] = stats['count'] + n
+    return stats
+
+def StatsPlaceholder( name ):
+    """Fixed width label field for one of STATS_NAMES, see StatsFill()."""
+    return ('@%s@' % name).ljust(STATS_WIDTH)
+
+def StatsFill( text, stats ):
+    """Replace the StatsPlaceholder() fields of a label with stats values.
+
+    Every field keeps its width, so the filled label has the same length
+    and can be written over the one reserved before the data.
+    """
+    if stats is None or stats['count'] == 0:
+        values = dict((name, '"N/A"') for name in STATS_NAMES)
+    else:
+        values = { 'MINIMUM' : '%.10g' % stats['min'],
+                   'MAXIMUM' : '%.10g' % stats['max'],
+                   'MEAN' : '%.10g' % stats['mean'],
+                   'STANDARD_DEVIATION' : '%.10g' % math.sqrt(stats['m2'] / stats['count']),
+                   'VALID_PIXELS' : '%d' % stats['count'] }
+    for name in STATS_NAMES:
+        text = text.replace(StatsPlaceholder(name), values[name].ljust(STATS_WIDTH))
+    return text
+
+#/************************************************************************/
+#/*                           WriteCoreBSQ()                             */
+#/************************************************************************/
+
+def WriteCoreBSQ( fout, hDataset, sample_dtype, stats = None,
+                  nTargetBytes = 16*1024*1024, bProgress = True,
+                  validRange = None ):
+    """Stream all bands of hDataset to fout as band sequential pixels.
+
+    Lines are read a few blocks at a time (about nTargetBytes per read),
+    converted to sample_dtype and appended with sequential writes, so the
+    image is written in one pass with bounded memory and no temporary files.
+    fout = None only gathers the statistics.
+    If stats is given, it holds one accumulator (see StatsNew) per band,
+    and the pixels as written are added to them on the way (see
+    StatsAccumulate for nodata and validRange); pass the same accumulator
+    for every band to combine them. bProgress = False skips the progress
+    bar, for concurrent writers.
+    """
+    import numpy as np
+    dtype = np.dtype(sample_dtype)
+    nXSize = hDataset.RasterXSize
+    nYSize = hDataset.RasterYSize
+    nBands = hDataset.RasterCount
+    for iBand in range(nBands):
+        hBand = hDataset.GetRasterBand(iBand + 1)
+        (nBlockXSize, nBlockYSize) = hBand.GetBlockSize()
+        nLines = max(1, nTargetBytes // (nXSize * dtype.itemsize))
+        #whole blocks, so each block is decoded only once
+        nLines = max(nBlockYSize, (nLines // nBlockYSize) * nBlockYSize)
+        nodata = hBand.GetNoDataValue()
+        for y in range(0, nYSize, nLines):
+            n = min(nLines, nYSize - y)
+            data = hBand.ReadAsArray(0, y, nXSize, n).astype(dtype, copy=False)
+            if fout is not None:
+                fout.write(data.tobytes())
+            if stats is not None:
+                StatsAccumulate(stats[iBand], data, nodata, validRange)
+            if bProgress:
+                gdal.TermProgress_nocb((iBand + float(y + n) / nYSize) / nBands)
+
+#/************************************************************************/
+#/*                           MD5Writer                                  */
+#/************************************************************************/
+
+class MD5Writer(object):
+    """File wrapper that updates an MD5 digest with everything written.
+
+    Used around a raw image or cube, so the checksum is taken while the
+    file is streamed out instead of reading the finished file back.
+    """
+    def __init__( self, fout ):
+        self.fout = fout
+        self.md5 = hashlib.md5()
+
+    def write( self, data ):
+        self.md5.update(data)
+        self.fout.write(data)
+
+    def close( self ):
+        self.fout.close()
+
+    def hexdigest( self ):
+        return self.md5.hexdigest()
+
+def MD5File( path, blocksize = 1048576 ):
+    """MD5 digest of a finished file, read back in blocks.
+
+    For files that are rewritten after streaming, such as an attached PDS3
+    label back-filled with the image statistics.
+    """
+    md5 = hashlib.md5()
+    f = open(path, 'rb')
+    data = f.read(blocksize)
+    while data:
+        md5.update(data)
+        data = f.read(blocksize)
+    f.close()
+    return md5.hexdigest()
+
+def WriteManifest( path, entries ):
+    """Write an md5sum style checksum manifest of (digest, file) entries.
+
+    Files are listed by name relative to the manifest, so "md5sum -c" can
+    check a delivery in place.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    f = open(path, 'wt')
+    for (digest, name) in entries:
+        f.write('%s  %s\n' % (digest, os.path.relpath(os.path.abspath(name), base)))
+    f.close()
+
+#/************************************************************************/
+#/*                        GDALInfoReportCorner()                        */
+#/************************************************************************/
+
+def GDALInfoReportCorner( hDataset, hTransform, corner_name, x, y ):
+
+    line = "%-11s " % corner_name
+
+#/* -------------------------------------------------------------------- */
+#/*      Transform the point into georeferenced coordinates.             */
+#/* -------------------------------------------------------------------- */
+    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
+    if adfGeoTransform is not None:
+        dfGeoX = adfGeoTransform[0] + adfGeoTransform[1] * x \
+            + adfGeoTransform[2] * y
+        dfGeoY = adfGeoTransform[3] + adfGeoTransform[4] * x \
+            + adfGeoTransform[5] * y
+
+    else:
+        line = line + ("(%7.1f,%7.1f)" % (x, y ))
+        print(line)
+        return False
+
+#/* -------------------------------------------------------------------- */
+#/*      Report the georeferenced coordinates.                           */
+#/* -------------------------------------------------------------------- */
+    if abs(dfGeoX) < 181 and abs(dfGeoY) < 91:
+        line = line + ( "(%12.7f,%12.7f) " % (dfGeoX, dfGeoY ))
+
+    else:
+        line = line + ( "(%12.3f,%12.3f) " % (dfGeoX, dfGeoY ))
+
+#/* -------------------------------------------------------------------- */
+#/*      Transform to latlong and report.                                */
+#/* -------------------------------------------------------------------- */
+    if hTransform is not None:
+        pnt = hTransform.TransformPoint(dfGeoX, dfGeoY, 0)
+        if pnt is not None:
+            line = line + ( "(%s," % gdal.DecToDMS( pnt[0], "Long", 2 ) )
+            line = line + ( "%s)" % gdal.DecToDMS( pnt[1], "Lat", 2 ) )
+
+    print(line)
+
+    return True
+
+#/************************************************************************/
+#/*                        GDALGetLonLat()                               */
+#/************************************************************************/
+def GDALGetLonLat( hDataset, hTransform, x, y ):
+    """Lon/lat of pixel x,y, through hTransform when there is one."""
+    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
+    if adfGeoTransform is None:
+        return (0.0, 0.0)
+    dfGeoX = adfGeoTransform[0] + adfGeoTransform[1] * x \
+        + adfGeoTransform[2] * y
+    dfGeoY = adfGeoTransform[3] + adfGeoTransform[4] * x \
+        + adfGeoTransform[5] * y
+    if hTransform is not None:
+        pnt = hTransform.TransformPoint(dfGeoX, dfGeoY, 0)
+        if pnt is not None:
+            return (pnt[0], pnt[1])
+    return (dfGeoX, dfGeoY)
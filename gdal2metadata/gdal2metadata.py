@@ -35,7 +35,13 @@
 # ****************************************************************************/
 
 import sys
+import os
 import math
+import copy
+import glob
+import time
+import multiprocessing
+import sqlite3
 from time import strftime
 try:
     from osgeo import gdal
@@ -71,6 +77,17 @@ except ImportError:
         except ImportError:
           print("Failed to import ElementTree from any known place")
 
+#the dataset is inspected and rendered by gdal2label.py, which lives with
+#the ISIS3/PDS3 writers in the gdal2ISIS3 folder next to this one
+try:
+    from gdal2label import Inspect, FGDCTree, FGDCDatum
+    from gdal2label import GDALInfoReportCorner, LatLongTransform
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    os.pardir, 'gdal2ISIS3'))
+    from gdal2label import Inspect, FGDCTree, FGDCDatum
+    from gdal2label import GDALInfoReportCorner, LatLongTransform
+
 
 #/************************************************************************/
 #/*                               Usage()                                */
@@ -80,6 +97,16 @@ def Usage(theApp):
     print( '\nUsage: gdal2metadata in_Geo.tif in_FGDCtemplate.xml output.xml') # % theApp)
     print( '   Optional: to print out image information also send -debug')
     print( 'Usage: gdal2metadata -debug in_Geo.tif in_FGDCtemplate.xml output.xml\n') # % theApp)
+    print( 'Batch: gdal2metadata [-threads 4] -outdir dir in_FGDCtemplate.xml in1.tif "*.tif" ...')
+    print( '   optional: to read the rasters from a file (one per line, - for stdin), send -list files.txt')
+    print( '   each raster is written to dir/<raster name>.xml\n')
+    print( 'Catalog: gdal2metadata [-threads 4] -catalog catalog.sqlite [-outdir dir in_FGDCtemplate.xml] in1.tif "*.tif" ...')
+    print( '   extents, projection, resolution and band statistics are stored in a SQLite catalog')
+    print( '   with an R-tree on the footprints; rasters unchanged since the last run are skipped.')
+    print( '   /vsi* rasters have no file date or size to compare, they are read on every run.')
+    print( '   e.g. sqlite3 catalog.sqlite "SELECT DISTINCT p.path FROM products p, products_rtree r')
+    print( '        WHERE p.id = r.product_id AND r.maxx >= 10 AND r.minx <= 20 AND r.maxy >= -5 AND r.miny <= 5"')
+    print( '   footprints crossing +/-180 are stored as two boxes, longitudes are -180 to 180\n')
     print( 'Note: Currently this routine only supports FGDC version CSDGM - FGDC-STD-001-1998\n')
     sys.exit(1)
 
@@ -93,6 +120,210 @@ def recursive_search(element, tag_to_search, replacement_value):
     for child in element: 
         recursive_search(child, tag_to_search, replacement_value)
 
+#/************************************************************************/
+#/*                              Template                                */
+#/************************************************************************/
+
+#parsed templates keyed by path, reused for every raster of a run
+_templateCache = {}
+
+class Template(object):
+    """FGDC template tree with an index of its elements by tag and path.
+
+    The elements are indexed in one pass, so iter(tag) and find(path)
+    are dictionary lookups instead of scans of the whole template.
+    Elements added with SubElement() are indexed as they are created.
+    iter() and write() mirror the ElementTree calls, so a Template can be
+    used where the parsed tree was.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.tags = {}
+        self.paths = {}
+        self.pathOf = {}
+        self._Index(tree.getroot(), '')
+
+    def _Index(self, element, parent):
+        #skip comments and processing instructions
+        if not isinstance(element.tag, str):
+            return
+        path = parent + '/' + element.tag
+        self.tags.setdefault(element.tag, []).append(element)
+        self.paths.setdefault(path, []).append(element)
+        self.pathOf[element] = path
+        for child in element:
+            self._Index(child, path)
+
+    def iter(self, tag):
+        return list(self.tags.get(tag, ()))
+
+    def find(self, path):
+        """Elements at an absolute path, e.g. /metadata/idinfo/citation."""
+        return list(self.paths.get(path, ()))
+
+    def SubElement(self, parent, tag):
+        element = etree.SubElement(parent, tag)
+        self._Index(element, self.pathOf.get(parent, ''))
+        return element
+
+    def SetText(self, tag, text):
+        for element in self.tags.get(tag, ()):
+            element.text = text
+
+    def write(self, *args, **kwargs):
+        return self.tree.write(*args, **kwargs)
+
+def LoadTemplate(template_xml):
+    """Indexed copy of an FGDC template, parsed only once per process.
+
+    The parsed template is cached (keyed by path and modification time)
+    and every call gets a deep copy to fill in, so many rasters can be
+    stamped from one template without reading it again.
+    """
+    key = os.path.abspath(template_xml)
+    mtime = os.path.getmtime(key)
+    if key not in _templateCache or _templateCache[key][0] != mtime:
+        try:
+            parser = etree.XMLParser(remove_blank_text=True)
+            tree = etree.parse(template_xml, parser)
+        except (AttributeError, TypeError):
+            #ElementTree without lxml's parser options
+            tree = etree.parse(template_xml)
+        _templateCache[key] = (mtime, tree)
+    return Template(copy.deepcopy(_templateCache[key][1]))
+
+#/************************************************************************/
+#/*                            OpenCatalog()                             */
+#/************************************************************************/
+
+def OpenCatalog(catalog):
+    """Open (creating if needed) the SQLite product catalog.
+
+    products holds one row per raster keyed by its absolute path (GDAL
+    paths such as /vsicurl/ as given, with no mtime or size), bands
+    the per band statistics and products_rtree the lon/lat footprints, one
+    or two boxes (see Footprint) per product_id. kmres is in km/pixel.
+    """
+    conn = sqlite3.connect(catalog)
+    conn.execute("""CREATE TABLE IF NOT EXISTS products (
+                        id INTEGER PRIMARY KEY,
+                        path TEXT UNIQUE NOT NULL,
+                        mtime REAL, size INTEGER,
+                        samples INTEGER, lines INTEGER, bands INTEGER,
+                        datatype TEXT, projection TEXT, target TEXT,
+                        semi_major REAL, semi_minor REAL, wkt TEXT,
+                        xres REAL, yres REAL, kmres REAL,
+                        west REAL, east REAL, south REAL, north REAL,
+                        updated TEXT)""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS bands (
+                        product_id INTEGER NOT NULL, band INTEGER NOT NULL,
+                        minimum REAL, maximum REAL, mean REAL, stddev REAL,
+                        nodata REAL, PRIMARY KEY (product_id, band))""")
+    conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS products_rtree
+                        USING rtree(id, minx, maxx, miny, maxy,
+                                    +product_id INTEGER)""")
+    conn.commit()
+    return conn
+
+def CatalogCurrent(conn, path, mtime, size):
+    """True if path is already catalogued with this mtime and size."""
+    row = conn.execute('SELECT mtime, size FROM products WHERE path = ?',
+                       (path,)).fetchone()
+    return row is not None and row[0] == mtime and row[1] == size
+
+def CatalogInsert(conn, record):
+    """Replace the catalog rows of one raster and commit."""
+    row = conn.execute('SELECT id FROM products WHERE path = ?',
+                       (record['path'],)).fetchone()
+    if row is not None:
+        conn.execute('DELETE FROM products WHERE id = ?', row)
+        conn.execute('DELETE FROM bands WHERE product_id = ?', row)
+        conn.execute('DELETE FROM products_rtree WHERE product_id = ?', row)
+    cur = conn.execute("""INSERT INTO products (path, mtime, size, samples,
+                              lines, bands, datatype, projection, target,
+                              semi_major, semi_minor, wkt, xres, yres, kmres,
+                              west, east, south, north, updated)
+                          VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+                       (record['path'], record['mtime'], record['size'],
+                        record['samples'], record['lines'], record['bands'],
+                        record['datatype'], record['projection'],
+                        record['target'], record['semi_major'],
+                        record['semi_minor'], record['wkt'], record['xres'],
+                        record['yres'], record['kmres'], record['west'],
+                        record['east'], record['south'], record['north'],
+                        strftime("%Y-%m-%dT%H:%M:%S")))
+    product_id = cur.lastrowid
+    for stats in record['band_stats']:
+        conn.execute('INSERT INTO bands VALUES (?,?,?,?,?,?,?)',
+                     (product_id,) + tuple(stats))
+    for (west, east, south, north) in record['footprint']:
+        conn.execute("""INSERT INTO products_rtree (minx, maxx, miny, maxy,
+                              product_id) VALUES (?,?,?,?,?)""",
+                     (west, east, south, north, product_id))
+    conn.commit()
+
+#/************************************************************************/
+#/*                             Footprint()                              */
+#/************************************************************************/
+
+def Footprint(adfGeoTransform, hTransform, nXSize, nYSize, steps = 16):
+    """Lon/lat boxes (west, east, south, north) covering a raster.
+
+    The edges are sampled steps times each and the longitudes unwound
+    along them, so 0 to 360 rasters and curved projected edges come out
+    right. Longitudes are -180 to 180: a box crossing +/-180 is split in
+    two and a raster spanning 360 degrees gets -180 to 180. A raster
+    whose edges circle a pole also runs up to that pole.
+    """
+    corners = [(0, 0), (nXSize, 0), (nXSize, nYSize), (0, nYSize), (0, 0)]
+    lons = [ ]
+    lats = [ ]
+    for i in range(4):
+        (x0, y0) = corners[i]
+        (x1, y1) = corners[i+1]
+        for k in range(steps):
+            x = x0 + (x1 - x0) * float(k) / steps
+            y = y0 + (y1 - y0) * float(k) / steps
+            lon = adfGeoTransform[0] + adfGeoTransform[1] * x + adfGeoTransform[2] * y
+            lat = adfGeoTransform[3] + adfGeoTransform[4] * x + adfGeoTransform[5] * y
+            if hTransform is not None:
+                pnt = hTransform.TransformPoint(lon, lat, 0)
+                if pnt is None:
+                    continue
+                (lon, lat) = (pnt[0], pnt[1])
+            if math.isinf(lon) or math.isinf(lat) or lon != lon or lat != lat:
+                continue
+            #keep each longitude within 180 of the one before it
+            if len(lons) > 0:
+                lon = lon - 360.0 * round((lon - lons[-1]) / 360.0)
+            lons.append(lon)
+            lats.append(lat)
+    if len(lons) == 0:
+        return [ ]
+    south = min(lats)
+    north = max(lats)
+
+    #back to the first point: a full turn means the edges circle a pole
+    closing = lons[0] - lons[-1]
+    closing = closing - 360.0 * round(closing / 360.0)
+    if abs(lons[-1] + closing - lons[0]) > 180.0:
+        if sum(lats) > 0:
+            north = 90.0
+        else:
+            south = -90.0
+        return [(-180.0, 180.0, south, north)]
+
+    west = min(lons)
+    east = max(lons)
+    if east - west >= 360.0 - 1e-9:
+        return [(-180.0, 180.0, south, north)]
+    shift = 360.0 * math.floor((west + 180.0) / 360.0)
+    west = west - shift
+    east = east - shift
+    if east > 180.0:
+        return [(west, 180.0, south, north), (-180.0, east - 360.0, south, north)]
+    return [(west, east, south, north)]
+
 #/************************************************************************/
 #/*                                main()                                */
 #/************************************************************************/
@@ -110,15 +341,13 @@ def main( argv = None ):
     bShowColorTable = True
     bComputeChecksum = False
     bReportHistograms = False
-    pszFilename = None
     papszExtraMDDomains = [ ]
-    pszProjection = None
-    hTransform = None
     bShowFileList = True
-    dst_xml = None
-    template_xml = None
-    bands = 1
-    iOverview = None
+    files = [ ]
+    listFile = None
+    outdir = None
+    threads = 1
+    catalog = None
 
     if argv is None:
         argv = sys.argv
@@ -169,24 +398,205 @@ def main( argv = None ):
             papszExtraMDDomains.append( argv[i] )
         elif EQUAL(argv[i], "-nofl"):
             bShowFileList = False
+        elif EQUAL(argv[i], "-outdir") and i < nArgc-1:
+            i = i + 1
+            outdir = argv[i]
+        elif EQUAL(argv[i], "-list") and i < nArgc-1:
+            i = i + 1
+            listFile = argv[i]
+        elif EQUAL(argv[i], "-threads") and i < nArgc-1:
+            i = i + 1
+            threads = int(argv[i])
+        elif EQUAL(argv[i], "-catalog") and i < nArgc-1:
+            i = i + 1
+            catalog = argv[i]
         elif argv[i][0] == '-':
             return Usage(argv[0])
-        elif pszFilename is None:
-            pszFilename = argv[i]
-        elif template_xml is None:
-            template_xml = argv[i]
-        elif dst_xml is None:
-            dst_xml = argv[i]
         else:
-            return Usage(argv[0])
+            files.append(argv[i])
         i = i + 1
 
-    if pszFilename is None:
-        return Usage(argv[0])
-    if template_xml is None:
-        return Usage(argv[0])
-    if dst_xml is None:
+    options = { 'bComputeMinMax' : bComputeMinMax, 'bSample' : bSample,
+                'bShowGCPs' : bShowGCPs, 'bShowMetadata' : bShowMetadata,
+                'bShowRAT' : bShowRAT, 'debug' : debug, 'bStats' : bStats,
+                'bApproxStats' : bApproxStats,
+                'bShowColorTable' : bShowColorTable,
+                'bComputeChecksum' : bComputeChecksum,
+                'bReportHistograms' : bReportHistograms,
+                'papszExtraMDDomains' : papszExtraMDDomains,
+                'bShowFileList' : bShowFileList }
+
+    if outdir is None and catalog is None:
+        if len(files) != 3:
+            return Usage(argv[0])
+        return WriteMetadata(files[0], files[1], files[2], options)
+
+#/* -------------------------------------------------------------------- */
+#/*      Batch: the template is parsed once, every raster goes to        */
+#/*      outdir/<raster name>.xml and/or the catalog                     */
+#/* -------------------------------------------------------------------- */
+    template_xml = None
+    if outdir is not None:
+        if len(files) < 1:
+            return Usage(argv[0])
+        template_xml = files[0]
+        files = files[1:]
+    rasters = [ ]
+    for name in files:
+        if glob.has_magic(name):
+            rasters.extend(sorted(glob.glob(name)))
+        else:
+            rasters.append(name)
+    if listFile is not None:
+        if listFile == '-':
+            fp = sys.stdin
+        else:
+            fp = open(listFile)
+        for line in fp:
+            if len(line.strip()) > 0:
+                rasters.append(line.strip())
+        if fp is not sys.stdin:
+            fp.close()
+    if len(rasters) == 0:
         return Usage(argv[0])
+    if outdir is not None:
+        #rasters from different folders can share a name, don't let one
+        #overwrite the other
+        outputs = { }
+        for raster in rasters:
+            name = os.path.basename(raster) + ".xml"
+            outputs.setdefault(name, [ ]).append(raster)
+        nClash = 0
+        for name in sorted(outputs):
+            if len(outputs[name]) > 1:
+                nClash = nClash + 1
+                print('ERROR: %s would be written by: %s' % (
+                      os.path.join(outdir, name), ', '.join(outputs[name])))
+        if nClash > 0:
+            return 1
+        if not os.path.isdir(outdir):
+            os.makedirs(outdir)
+        #parse the template before any work is handed out, forked workers
+        #start with it already in the cache
+        LoadTemplate(template_xml)
+
+    conn = None
+    if catalog is not None:
+        conn = OpenCatalog(catalog)
+    jobs = [ ]
+    stamps = { }
+    nSkipped = 0
+    for raster in rasters:
+        if conn is not None and os.path.exists(raster):
+            #unchanged rasters are not reopened at all
+            path = os.path.abspath(raster)
+            st = os.stat(raster)
+            if CatalogCurrent(conn, path, st.st_mtime, st.st_size):
+                nSkipped = nSkipped + 1
+                continue
+            stamps[raster] = (path, st.st_mtime, st.st_size)
+        elif conn is not None:
+            #/vsi* and other GDAL paths have no local file to stamp, they
+            #are catalogued as given and read again on every run
+            stamps[raster] = (raster, None, None)
+        dst_xml = None
+        if outdir is not None:
+            dst_xml = os.path.join(outdir, os.path.basename(raster) + ".xml")
+        jobs.append((raster, template_xml, dst_xml, options, conn is not None))
+    if nSkipped > 0:
+        print('%d rasters unchanged in %s, skipped' % (nSkipped, catalog))
+    if len(jobs) == 0:
+        return 0
+
+    t0 = time.time()
+    if threads > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(threads, len(jobs)))
+        results = pool.imap_unordered(_MetadataWorker, jobs)
+    else:
+        pool = None
+        results = (_MetadataWorker(job) for job in jobs)
+
+    nFailed = 0
+    for (raster, seconds, error, record) in results:
+        if error is None and record and raster in stamps:
+            (record['path'], record['mtime'], record['size']) = stamps[raster]
+            CatalogInsert(conn, record)
+        if error is None:
+            print('%s: %.3f s' % (raster, seconds))
+        else:
+            nFailed = nFailed + 1
+            print('%s: FAILED (%s)' % (raster, error))
+    if pool is not None:
+        pool.close()
+        pool.join()
+    if conn is not None:
+        conn.close()
+
+    seconds = time.time() - t0
+    print('%d rasters, %d failed, %.2f s (%.1f rasters/s)' % (len(jobs), nFailed,
+          seconds, len(jobs) / max(seconds, 1e-6)))
+    if nFailed > 0:
+        return 1
+    return 0
+
+#/************************************************************************/
+#/*                          _MetadataWorker()                           */
+#/************************************************************************/
+
+def _MetadataWorker( job ):
+    """Write the metadata of one (raster, template, output, options,
+    bCatalog) job.
+
+    Returns (raster, seconds, error, record); error is None on success and
+    record holds the catalog fields when bCatalog is set.
+    WriteMetadata exits on bad input, which is caught so that one raster
+    can't take down the pool.
+    """
+    (pszFilename, template_xml, dst_xml, options, bCatalog) = job
+    record = None
+    if bCatalog:
+        record = { }
+    t0 = time.time()
+    try:
+        ret = WriteMetadata(pszFilename, template_xml, dst_xml, options, record)
+        error = None
+        if ret:
+            error = 'returned %s' % ret
+    except SystemExit as e:
+        error = 'exit %s' % e.code
+    except Exception as e:
+        error = str(e)
+    return (pszFilename, time.time() - t0, error, record)
+
+#/************************************************************************/
+#/*                          WriteMetadata()                             */
+#/************************************************************************/
+
+def WriteMetadata( pszFilename, template_xml, dst_xml, options, record = None ):
+    """Fill template_xml from pszFilename and write it to dst_xml.
+
+    Without a template an empty skeleton is filled and dst_xml may be None
+    (catalog only). If record is a dict it receives the catalog fields.
+    """
+
+    bComputeMinMax = options['bComputeMinMax']
+    bSample = options['bSample']
+    bShowGCPs = options['bShowGCPs']
+    bShowMetadata = options['bShowMetadata']
+    bShowRAT = options['bShowRAT']
+    debug = options['debug']
+    bStats = options['bStats']
+    bApproxStats = options['bApproxStats']
+    bShowColorTable = options['bShowColorTable']
+    bComputeChecksum = options['bComputeChecksum']
+    bReportHistograms = options['bReportHistograms']
+    papszExtraMDDomains = options['papszExtraMDDomains']
+    bShowFileList = options['bShowFileList']
+
+    pszProjection = None
+    hTransform = None
+    bands = 1
+    iOverview = None
 
 #/* -------------------------------------------------------------------- */
 #/*      Open GDAL dataset.                                              */
@@ -200,20 +610,14 @@ def main( argv = None ):
 #/* -------------------------------------------------------------------- */
 #/*     load XML template file (generally fgdc-template.xml)             */
 #/* -------------------------------------------------------------------- */
-    parser = etree.XMLParser(remove_blank_text=True)
-    tree = etree.parse(template_xml, parser)
+    if template_xml is None:
+        tree = Template(etree.ElementTree(etree.Element('metadata')))
+    else:
+        tree = LoadTemplate(template_xml)
 
 #    root = tree.getroot()
 #    recursive_search(root, 'title', pszFilename)   
 
-
-    for citation in tree.iter('citation'):
-        for citeinfo in citation.iter('citeinfo'):
-            title = citeinfo.find('title')
-            if title is None:        
-               title = etree.SubElement(citeinfo, 'title')
-            title.text = pszFilename
-
 #/* -------------------------------------------------------------------- */
 #/*      Report general info.                                            */
 #/* -------------------------------------------------------------------- */
@@ -239,194 +643,16 @@ def main( argv = None ):
 #/* -------------------------------------------------------------------- */
 #/*      Report projection.                                              */
 #/* -------------------------------------------------------------------- */
-    pszProjection = hDataset.GetProjectionRef()
-    if pszProjection is not None:
-
-        hSRS = osr.SpatialReference()
-        if hSRS.ImportFromWkt(pszProjection ) == gdal.CE_None:
-            pszPrettyWkt = hSRS.ExportToPrettyWkt(False)
-
-            #print( "Coordinate System is:\n%s" % pszPrettyWkt )
-            mapProjection = "None"
-            #Extract projection information
-            targetD = hSRS.GetAttrValue("DATUM",0).replace("_2000","").replace("_localRadius","").title()
-            target = targetD.replace("D_","").title()
-            semiMajor = hSRS.GetSemiMajor() #/ 1000.0
-            semiMinor = hSRS.GetSemiMinor() #/ 1000.0
-            invFlat = hSRS.GetInvFlattening()
-            # the USGS tool MP doesn't like 0 for the invFlat so we are putting a giant number to represent a sphere
-            if (invFlat < 0.1):
-               invFlat = 1.0e+10
-
-            if (pszProjection[0:6] == "GEOGCS"):
-                mapProjection = "SIMPLE_CYLINDRICAL"
-                centLat = 0
-                centLon = 0
-            if (pszProjection[0:6] == "PROJCS"):
-                mapProjection = hSRS.GetAttrValue("PROJECTION",0)
-
-                for horizsys in tree.iter('horizsys'):
-                    #horizsys.clear()
-                    planar = etree.SubElement(horizsys, 'planar')
-                    mapproj = etree.SubElement(planar, 'mapproj')
-                    mapprojn = etree.SubElement(mapproj, 'mapprojn')
-
-                if EQUAL(mapProjection,"Equirectangular"):
-                    #for mapprojn in tree.iter('mapprojn'):
-                    mapprojn.text = "Equirectangular"
-                    centLat = None
-                    centLat = hSRS.GetProjParm('standard_parallel_1')
-                    if centLat == None:
-                        centLat = hSRS.GetProjParm('latitude_of_origin')
-                    centLon = hSRS.GetProjParm('central_meridian')
-                    equirect = etree.SubElement(mapproj, 'equirect')
-                    #for equirect in tree.iter('equirect'):
-                    stdparll = etree.SubElement(equirect, 'stdparll')
-                    #for stdparll in equirect.iter('stdparll'):
-                    stdparll.text = str(centLat)
-                    #for longcm in equirect.iter('longcm'):
-                    longcm = etree.SubElement(equirect, 'longcm')
-                    longcm.text = str(centLon)
-                    #for feast in equirect.iter('feast'):
-                    feast = etree.SubElement(equirect, 'feast')
-                    feast.text = str(hSRS.GetProjParm('false_easting'))
-                    #for fnorth in equirect.iter('fnorth'):
-                    fnorth = etree.SubElement(equirect, 'fnorth')
-                    fnorth.text = str(hSRS.GetProjParm('false_northing'))
-                            
-                if EQUAL(mapProjection,"Mercator"):
-                    for mapprojn in tree.iter('mapprojn'):
-                        mapprojn.text = "Mercator"
-                    centLat = None
-                    centLat = hSRS.GetProjParm('latitude_of_origin')
-                    if centLat == None:
-                        centLat = hSRS.GetProjParm('standard_parallel_1')
-                    centLon = hSRS.GetProjParm('central_meridian')
-                    scale = hSRS.GetProjParm('scale_factor')
-                    for merc in tree.iter('transmer'):
-                        for stdparll in merc.iter('stdparll'):
-                            stdparll.text = str(centLat)
-                        for longcm in merc.iter('longcm'):
-                            longcm.text = str(centLon)
-                        for sfequat in merc.iter('sfequat'):
-                            sfequat.text = str(scale)
-                        for feast in merc.iter('feast'):
-                            feast.text = str(hSRS.GetProjParm('false_easting'))
-                        for fnorth in merc.iter('fnorth'):
-                            fnorth.text = str(hSRS.GetProjParm('false_northing'))
-                
-                if EQUAL(mapProjection,"Orthographic "):
-                    for mapprojn in tree.iter('mapprojn'):
-                        mapprojn.text = "Orthographic"
-                    centLat = hSRS.GetProjParm('latitude_of_origin ')
-                    centLon = hSRS.GetProjParm('central_meridian')
-                    for orthogr in tree.iter('orthogr'):
-                        for stdparll in orthogr.iter('stdparll'):
-                            stdparll.text = str(centLat)
-                        for longcm in orthogr.iter('longcm'):
-                            longcm.text = str(centLon)
-                        for feast in orthogr.iter('feast'):
-                            feast.text = str(hSRS.GetProjParm('false_easting'))
-                        for fnorth in orthogr.iter('fnorth'):
-                            fnorth.text = str(hSRS.GetProjParm('false_northing'))
-
-                if EQUAL(mapProjection,"Stereographic"):
-                    for mapprojn in tree.iter('mapprojn'):
-                        mapprojn.text = "Stereographic"
-                    centLat = hSRS.GetProjParm('latitude_of_origin')
-                    centLon = hSRS.GetProjParm('central_meridian')
-                    for stereo in tree.iter('stereo'):
-                        for latprjc in stereo.iter('latprjc'):
-                            latprjc.text = str(centLat)
-                        for longpc in stereo.iter('longpc'):
-                            longpc.text = str(centLon)
-                        for feast in stereo.iter('feast'):
-                            feast.text = str(hSRS.GetProjParm('false_easting'))
-                        for fnorth in stereo.iter('fnorth'):
-                            fnorth.text = str(hSRS.GetProjParm('false_northing'))
-
-                if EQUAL(mapProjection,"Sinusoidal"):
-                    for mapprojn in tree.iter('mapprojn'):
-                        mapprojn.text = "Sinusoidal"
-                    centLon = None
-                    centLon = hSRS.GetProjParm('longitude_of_center')
-                    if centLon == None:
-                        centLon = hSRS.GetProjParm('central_meridian')
-                    for sinusoid in tree.iter('sinusoid'):
-                        for longcm in sinusoid.iter('longcm'):
-                            longcm.text = str(centLon)
-                        for feast in sinusoid.iter('feast'):
-                            feast.text = str(hSRS.GetProjParm('false_easting'))
-                        for fnorth in sinusoid.iter('fnorth'):
-                            fnorth.text = str(hSRS.GetProjParm('false_northing'))
-
-                if EQUAL(mapProjection,"Robinson"):
-                    for mapprojn in tree.iter('mapprojn'):
-                        mapprojn.text = "Robinson"
-                    centLon = None
-                    centLon = hSRS.GetProjParm('longitude_of_center')
-                    if centLon == None:
-                        centLon = hSRS.GetProjParm('central_meridian')
-                    for robinson in tree.iter('robinson'):
-                        for longpc in robinson.iter('longpc'):
-                            longpc.text = str(centLon)
-                        for feast in robinson.iter('feast'):
-                            feast.text = str(hSRS.GetProjParm('false_easting'))
-                        for fnorth in robinson.iter('fnorth'):
-                            fnorth.text = str(hSRS.GetProjParm('false_northing'))
-
-                if (EQUAL(mapProjection,"Polar_Stereographic") or EQUAL(mapProjection,"Stereographic_North_Pole") or EQUAL(mapProjection,"Stereographic_South_Pole")):
-                    for mapprojn in tree.iter('mapprojn'):
-                        mapprojn.text = "Polar Stereographic"
-                    centLat = hSRS.GetProjParm('latitude_of_origin')
-                    centLon = hSRS.GetProjParm('central_meridian')
-                    scale = hSRS.GetProjParm('scale_factor')
-                    for polarst in tree.iter('polarst'):
-                        for stdparll in polarst.iter('stdparll'):
-                            stdparll.text = str(centLat)
-                        for svlong in polarst.iter('svlong'):
-                            svlong.text = str(centLon)
-                        for sfprjorg in polarst.iter('sfprjorg'):
-                            sfprjorg.text = str(scale)
-                        for feast in polarst.iter('feast'):
-                            feast.text = str(hSRS.GetProjParm('false_easting'))
-                        for fnorth in polarst.iter('fnorth'):
-                            fnorth.text = str(hSRS.GetProjParm('false_northing'))
-
-                if EQUAL(mapProjection,"Transverse_Mercator"):
-                    for mapprojn in tree.iter('mapprojn'):
-                        mapprojn.text = "Transverse Mercator"
-                    centLat = hSRS.GetProjParm('latitude_of_origin')
-                    centLon = hSRS.GetProjParm('central_meridian')
-                    scale = hSRS.GetProjParm('scale_factor')
-                    for transmer in tree.iter('transmer'):
-                        for latprjo in transmer.iter('latprjo'):
-                            latprjo.text = str(centLat)
-                        for longcm in transmer.iter('longcm'):
-                            longcm.text = str(centLon)
-                        for sfctrmer in transmer.iter('sfctrmer'):
-                            sfctrmer.text = str(scale)
-                        for feast in transmer.iter('feast'):
-                            feast.text = str(hSRS.GetProjParm('false_easting'))
-                        for fnorth in transmer.iter('fnorth'):
-                            fnorth.text = str(hSRS.GetProjParm('false_northing'))
-                
-
-                #Create cellsize block for all projections
-                planci = etree.SubElement(planar, 'planci')
-                plance = etree.SubElement(planci, 'plance')
-                plance.text = 'row and column'
-                coordrep = etree.SubElement(planci, 'coordrep')
-                absres = etree.SubElement(coordrep, 'absres')
-                ordres = etree.SubElement(coordrep, 'ordres')
-                plandu = etree.SubElement(planci, 'plandu')
-
-            if debug:
-                print(( "Coordinate System is:\n%s" % pszPrettyWkt ))
-        else:
-            print( "Warning - Can't parse this type of projection\n" )
-            print(( "Coordinate System is `%s'" % pszProjection ))
-            sys.exit(1)
+    #header values of the metadata, see gdal2label.Inspect
+    info = Inspect(hDataset, pszFilename)
+    pszProjection = info['wkt']
+    if info['srs'] is not None:
+        if debug:
+            print(( "Coordinate System is:\n%s" % info['srs']['prettyWkt'] ))
+    elif pszProjection is not None and len(pszProjection) > 0:
+        print( "Warning - Can't parse this type of projection\n" )
+        print(( "Coordinate System is `%s'" % pszProjection ))
+        sys.exit(1)
     else:
         print( "Warning - No Coordinate System defined:\n" )
         sys.exit(1)
@@ -434,7 +660,7 @@ def main( argv = None ):
 #/* -------------------------------------------------------------------- */
 #/*      Report Geotransform.                                            */
 #/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
+    adfGeoTransform = info['geoTransform']
     if adfGeoTransform is not None:
 
         if adfGeoTransform[2] == 0.0 and adfGeoTransform[4] == 0.0:
@@ -457,21 +683,6 @@ def main( argv = None ):
                         adfGeoTransform[4], \
                         adfGeoTransform[5] )))
 
-        if (pszProjection[0:6] == "GEOGCS"):
-            #convert degrees/pixel to km/pixel 
-             mapres = 1 / adfGeoTransform[1]
-             lonres = adfGeoTransform[1]
-             latres = adfGeoTransform[5]
-             kmres = adfGeoTransform[1] * (semiMajor * math.pi / 180.0)
-        else:
-            #convert m/pixel to pixel/degree
-             mapres = 1 / (adfGeoTransform[1] / (semiMajor * 1000.0 * math.pi / 180.0))
-             lonres = adfGeoTransform[1] / (semiMajor * 1000.0 * math.pi / 180.0)
-             latres = adfGeoTransform[5] / (semiMajor * 1000.0 * math.pi / 180.0)
-             xres = adfGeoTransform[1]
-             yres = adfGeoTransform[5]
-             kmres = adfGeoTransform[1] / 1000.0
-
 #/* -------------------------------------------------------------------- */
 #/*      Report GCPs.                                                    */
 #/* -------------------------------------------------------------------- */
@@ -572,17 +783,7 @@ def main( argv = None ):
 #/* -------------------------------------------------------------------- */
 #/*      Setup projected to lat/long transform if appropriate.           */
 #/* -------------------------------------------------------------------- */
-    if pszProjection is not None and len(pszProjection) > 0:
-        hProj = osr.SpatialReference( pszProjection )
-        if hProj is not None:
-            hLatLong = hProj.CloneGeogCS()
-
-        if hLatLong is not None:
-            gdal.PushErrorHandler( 'CPLQuietErrorHandler' )
-            hTransform = osr.CoordinateTransformation( hProj, hLatLong )
-            gdal.PopErrorHandler()
-            if gdal.GetLastErrorMsg().find( 'Unable to load PROJ.4 library' ) != -1:
-                hTransform = None
+    hTransform = LatLongTransform( info['wkt'] )
 
 #/* -------------------------------------------------------------------- */
 #/*      Report corners.                                                 */
@@ -602,20 +803,6 @@ def main( argv = None ):
                               hDataset.RasterXSize/2.0, \
                               hDataset.RasterYSize/2.0 );
 
-    #Get bounds
-    ulx = GDALGetLon( hDataset, hTransform, 0.0, 0.0 );
-    uly = GDALGetLat( hDataset, hTransform, 0.0, 0.0 );
-    lrx = GDALGetLon( hDataset, hTransform, hDataset.RasterXSize, \
-                          hDataset.RasterYSize );
-    lry = GDALGetLat( hDataset, hTransform, hDataset.RasterXSize, \
-                          hDataset.RasterYSize );
-       
-    #FGDC metadata requires -180 to 180 to pass validation (not 0 to 360).                   
-    if (lrx > 179.99):
-       lrx = lrx - 360   
-    if (ulx > 179.99):
-       ulx = ulx - 360
-
 #/* ==================================================================== */
 #/*      Loop over bands.                                                */
 #/* ==================================================================== */
@@ -940,188 +1127,66 @@ def main( argv = None ):
 #/************************************************************************/
 #/*                      WriteXML bits to FGDC template                  */
 #/************************************************************************/
-    for rasttype in tree.iter('rasttype'):
-        rasttype.text = "Pixel"
-    #~ instrList = pszFilename.split("_")
     hBand = hDataset.GetRasterBand( 1 )
-    #~ #get the datatype
-    #~ if EQUAL(gdal.GetDataTypeName(hBand.DataType), "Float32"):
-        #~ sample_bits = 32
-        #~ sample_type = "PC_REAL"
-        #~ sample_mask = "2#11111111111111111111111111111111#"
-    #~ elif EQUAL(gdal.GetDataTypeName(hBand.DataType), "INT16"):
-        #~ sample_bits = 16
-        #~ sample_type = "LSB_INTEGER"
-        #~ sample_mask = "2#1111111111111111#"
-    #~ elif EQUAL(gdal.GetDataTypeName(hBand.DataType), "UINT16"):
-        #~ sample_bits = 16
-        #~ sample_type = "UNSIGNED_INTEGER"
-        #~ sample_mask = "2#1111111111111111#"
-    #~ elif EQUAL(gdal.GetDataTypeName(hBand.DataType), "Byte"):
-        #~ sample_bits = 8
-        #~ sample_type = "UNSIGNED_INTEGER"
-        #~ sample_mask = "2#11111111#"
-    #~ else:
-        #~ print( "  %s: Not supported pixel type" % gdal.GetDataTypeName(hBand.DataType))
-        #~ sys.exit(1)
-
-    #~ f.write('PDS_VERSION_ID            = PDS3\n')
-    #~ f.write('\n')
-    #~ f.write('/* The source image data definition. */\n')
-    #~ f.write('FILE_NAME      = \"%s\"\n' % (dst_img))
-    #~ f.write('RECORD_TYPE   = FIXED_LENGTH\n')
-    #~ f.write('RECORD_BYTES  = %d\n' % (hDataset.RasterYSize))
-    #~ f.write('FILE_RECORDS  = %d\n' % ((hDataset.RasterXSize * sample_bits / 8)) )
-    #~ #f.write('LABEL_RECORDS = 1\n')
-    #~ f.write('^IMAGE        = \"%s\"\n' % (dst_img))
-    #~ f.write('\n')
-    #~ f.write('/* Identification Information  */\n')
-    #~ f.write('DATA_SET_ID               = "%s"\n' % pszFilename.split(".")[0])
-    #~ f.write('DATA_SET_NAME             = "%s"\n' % pszFilename.split(".")[0])
-    #~ f.write('PRODUCER_INSTITUTION_NAME = "Lunar Mapping and Modeling Project"\n')
-    #~ f.write('PRODUCER_ID               = "LMMP_TEAM"\n')
-    #~ f.write('PRODUCER_FULL_NAME        = "LMMP TEAM"\n')
-    #~ f.write('PRODUCT_ID                = "%s"\n' % pszFilename.split(".")[0])
-    #~ if "_v" in pszFilename:
-        #~ f.write('PRODUCT_VERSION_ID        = "%s.0"\n' % instrList[-1].split(".")[0].upper())
-    #~ else:
-        #~ f.write('PRODUCT_VERSION_ID        = "%s"\n' % "V1.0")
-    #~ f.write('PRODUCT_TYPE              = "RDR"\n')
-    #~ f.write('INSTRUMENT_HOST_NAME      = "%s"\n' % instrList[0])
-    #~ f.write('INSTRUMENT_HOST_ID        = "%s"\n' % instrList[0])
-    #~ f.write('INSTRUMENT_NAME           = "%s"\n' % instrList[1])
-    #~ f.write('INSTRUMENT_ID             = "%s"\n' % instrList[1])
-    #~ f.write('TARGET_NAME               = MOON\n')
-    for horizdn in tree.iter('horizdn'):
-        horizdn.text = targetD
-    for ellips in tree.iter('ellips'):
-        ellips.text = target
-    #~ f.write('MISSION_PHASE_NAME        = "POST MISSION"\n')
-    #~ f.write('RATIONALE_DESC            = "Created at the request of NASA\'s Exploration\n')
-    #~ f.write('                            Systems Mission Directorate to support future\n')
-    #~ f.write('                            human exploration"\n')
-    #~ f.write('SOFTWARE_NAME             = "ISIS 3.2.1 | SOCET SET v5.5 (r) BAE Systems\n')
-    #~ f.write('                            | GDAL 1.8"\n')
-    #~ f.write('\n')
-    #~ f.write('/* Time Parameters */\n')
-    #~ f.write('START_TIME                   = "N/A"\n')
-    #~ f.write('STOP_TIME                    = "N/A"\n')
-    #~ f.write('SPACECRAFT_CLOCK_START_COUNT = "N/A"\n')
-    #~ f.write('SPACECRAFT_CLOCK_STOP_COUNT  = "N/A"\n')
-    #~ f.write('PRODUCT_CREATION_TIME        = %s\n' % strftime("%Y-%m-%dT%H:%M:%S"))   #2011-03-11T22:13:40
-    #~ f.write('\n')
-    #~ f.write('OBJECT = IMAGE_MAP_PROJECTION\n')
-    #~ f.write('    ^DATA_SET_MAP_PROJECTION     = "DSMAP.CAT"\n')
-    #~ f.write('    MAP_PROJECTION_TYPE          = \"%s\"\n' % mapProjection)
-    #~ f.write('    PROJECTION_LATITUDE_TYPE     = PLANETOCENTRIC\n')
-    #~ f.write('    A_AXIS_RADIUS                = %.1f <KM>\n' % semiMajor)
-    for semiaxis in tree.iter('semiaxis'):
-        semiaxis.text = str(semiMajor)
-    #~ f.write('    B_AXIS_RADIUS                = %.1f <KM>\n' % semiMajor)
-    #~ f.write('    C_AXIS_RADIUS                = %.1f <KM>\n' % semiMinor)
-    for denflat in tree.iter('denflat'):
-        denflat.text = "{:.2e}".format(invFlat)
-    #~ f.write('    COORDINATE_SYSTEM_NAME       = PLANETOCENTRIC\n')
-    #~ f.write('    POSITIVE_LONGITUDE_DIRECTION = EAST\n')
-    #~ f.write('    KEYWORD_LATITUDE_TYPE        = PLANETOCENTRIC\n')
-    #~ f.write('    /* NOTE:  CENTER_LATITUDE and CENTER_LONGITUDE describe the location   */\n')
-    #~ f.write('    /* of the center of projection, which is not necessarily equal to the  */\n')
-    #~ f.write('    /* location of the center point of the image.                          */\n')
-    #~ f.write('    CENTER_LATITUDE              = %5.2f <DEG>\n' % centLat)
-    #~ f.write('    CENTER_LONGITUDE             = %5.2f <DEG>\n' % centLon)
-    #~ f.write('    LINE_FIRST_PIXEL             = 1\n')
-    #~ f.write('    LINE_LAST_PIXEL              = %d\n' % hDataset.RasterYSize)
-    #~ f.write('    SAMPLE_FIRST_PIXEL           = 1\n')
-    #~ f.write('    SAMPLE_LAST_PIXEL            = %d\n' % hDataset.RasterXSize)
-    #~ f.write('    MAP_PROJECTION_ROTATION      = 0.0 <DEG>\n')
-    #~ f.write('    MAP_RESOLUTION               = %.4f <PIX/DEG>\n' % mapres )
-    if (pszProjection[0:6] == "GEOGCS"):
+    FGDCTree(info, tree)
+    if debug and info['srs']['geographic']:
         for latSize in tree.iter('latres'):
-            latSize.text = "{:.6f}".format(latres)
-            if debug:
-               print('Lat resolution: %s' %(latSize.text))
-        for lonSize in tree.iter('lonres'):
-            lonSize.text =  "{:.6f}".format(lonres)
-        for geogunit in tree.iter('geogunit'):
-            geogunit.text = "Decimal degrees"
-    #~ f.write('    MAP_SCALE                    = %.8f <KM/PIXEL>\n' % kmres )
-    else:
-        for absres in tree.iter('absres'): # in meters
-            absres.text = "{:.6f}".format(xres)
-            if debug:
-               print('X resolution: %s' %(absres.text))
-        for ordres in tree.iter('ordres'):
-            ordres.text = "{:.6f}".format(yres * -1)
-        for plandu in tree.iter('plandu'):
-            plandu.text = "meters"
-    #~ f.write('    MINIMUM_LATITUDE             = %.8f <DEGREE>\n' % lry)
-    for southbc in tree.iter('southbc'):
-        southbc.text = "{:.4f}".format(lry)
-    #~ f.write('    MAXIMUM_LATITUDE             = %.8f <DEGREE>\n' % uly)
-    for northbc in tree.iter('northbc'):
-        northbc.text = "{:.4f}".format(uly)
-    #~ f.write('    WESTERNMOST_LONGITUDE        = %.8f <DEGREE>\n' % ulx)
-    for westbc in tree.iter('westbc'):
-        westbc.text = "{:.4f}".format(ulx)
-    #~ f.write('    EASTERNMOST_LONGITUDE        = %.8f <DEGREE>\n' % lrx)
-    for eastbc in tree.iter('eastbc'):
-        eastbc.text = "{:.4f}".format(lrx)
-    #~ f.write('    LINE_PROJECTION_OFFSET       = %.1f\n' % ( (ulx / kmres * 1000 ) - 0.5 ))
-    #~ f.write('    SAMPLE_PROJECTION_OFFSET     = %.1f\n' % ( (uly / kmres * 1000 ) + 0.5 ))
-    #~ f.write('END_OBJECT = IMAGE_MAP_PROJECTION\n')
-    #~ f.write('\n')
-    #~ f.write('OBJECT = IMAGE\n')
-    #~ f.write('    NAME                       = \"%s\"\n' % (pszFilename))
-    #~ f.write('    DESCRIPTION                = "Export data set from LMMP portal.\n')
-    #~ f.write('                                 see filename for data type."\n')
-    #~ #f.write('\n')
-    #~ f.write('    LINES                      = %d\n' % hDataset.RasterYSize)
-    for rowcount in tree.iter('rowcount'):
-        rowcount.text = str(hDataset.RasterYSize)
-    #~ f.write('    LINE_SAMPLES               = %d\n' % hDataset.RasterXSize)
-    for colcount in tree.iter('colcount'):
-        colcount.text = str(hDataset.RasterXSize)
-    #~ f.write('    UNIT                       = METER\n')
-    #~ f.write('    OFFSET                     = %.10g\n' % ( hBand.GetOffset() ))
-    #~ f.write('    SCALING_FACTOR             = %.10g\n' % ( hBand.GetScale() ))
-    #~ f.write('    SAMPLE_TYPE                = %s\n' % (sample_type) )
-    #~ f.write('    SAMPLE_BITS                = %d\n' % (sample_bits) )
-    #~ f.write('    SAMPLE_BIT_MASK            = %s\n' % (sample_mask) )
-    #~ #f.write('\n')
-    #~ f.write('    BANDS                      = %d\n' % hDataset.RasterCount)
-    for vrtcount in tree.iter('vrtcount'):
-        vrtcount.text = str(hDataset.RasterCount)
-    #~ #f.write('\n')
-    #~ f.write('    BAND_STORAGE_TYPE          = BAND_SEQUENTIAL\n')
-    #~ if (sample_bits == 32) :
-        #~ f.write('    CORE_NULL                  = 16#FF7FFFFB#\n')
-        #~ f.write('    CORE_LOW_REPR_SATURATION   = 16#FF7FFFFC#\n')
-        #~ f.write('    CORE_LOW_INSTR_SATURATION  = 16#FF7FFFFD#\n')
-        #~ f.write('    CORE_HIGH_REPR_SATURATION  = 16#FF7FFFFF#\n')
-        #~ f.write('    CORE_HIGH_INSTR_SATURATION = 16#FF7FFFFE#\n')
-    #~ elif (sample_bits == 16) :
-        #~ f.write('    CORE_NULL                  = -32768\n')
-        #~ f.write('    CORE_LOW_REPR_SATURATION   = -32767\n')
-        #~ f.write('    CORE_LOW_INSTR_SATURATION  = -32766\n')
-        #~ f.write('    CORE_HIGH_REPR_SATURATION  = 32767\n')
-        #~ f.write('    CORE_HIGH_INSTR_SATURATION = 32768\n')
-    #~ else : #8bit
-        #~ f.write('    CORE_NULL                  = 0\n')
-        #~ f.write('    CORE_LOW_REPR_SATURATION   = 0\n')
-        #~ f.write('    CORE_LOW_INSTR_SATURATION  = 0\n')
-        #~ f.write('    CORE_HIGH_REPR_SATURATION  = 255\n')
-        #~ f.write('    CORE_HIGH_INSTR_SATURATION = 255\n')
-    #~ f.write('END_OBJECT = IMAGE\n')
-    #~ f.write('END\n')
-    #~ f.close()
-    for metstdn in tree.iter('metstdn'):
-        metstdn.text = "FGDC Content Standards for Digital Geospatial Metadata"
-    for metstdv in tree.iter('metstdv'):
-        metstdv.text = "FGDC-STD-001-1998"
+            print('Lat resolution: %s' %(latSize.text))
+    elif debug:
+        for absres in tree.iter('absres'):
+            print('X resolution: %s' %(absres.text))
+
+#/* ==================================================================== */
+#/*      fields for the catalog                                          */
+#/* ==================================================================== */
+    #a raster without a geotransform and SRS has no footprint, so it is
+    #left out of the catalog (record stays empty)
+    if record is not None and adfGeoTransform is None:
+        print('%s: not georeferenced, not catalogued' % pszFilename)
+    elif record is not None:
+        record['samples'] = hDataset.RasterXSize
+        record['lines'] = hDataset.RasterYSize
+        record['bands'] = hDataset.RasterCount
+        record['datatype'] = gdal.GetDataTypeName(hBand.DataType)
+        srs = info['srs']
+        if srs['geographic']:
+            record['projection'] = "SIMPLE_CYLINDRICAL"
+        else:
+            record['projection'] = srs['projection']
+        record['target'] = FGDCDatum(srs)[1]
+        record['semi_major'] = srs['semiMajor']
+        record['semi_minor'] = srs['semiMinor']
+        record['wkt'] = info['wkt']
+        record['xres'] = adfGeoTransform[1]
+        record['yres'] = adfGeoTransform[5]
+        record['kmres'] = info['mres'] / 1000.0
+        #from the unwrapped edges, not the corners folded for FGDC above
+        record['footprint'] = Footprint(adfGeoTransform, hTransform,
+                                        hDataset.RasterXSize, hDataset.RasterYSize)
+        #east < west when the footprint crosses +/-180, none if no edge
+        #point could be transformed
+        (record['west'], record['east'], record['south'], record['north']) = \
+            (None, None, None, None)
+        if len(record['footprint']) > 0:
+            record['west'] = record['footprint'][0][0]
+            record['east'] = record['footprint'][-1][1]
+            record['south'] = record['footprint'][0][2]
+            record['north'] = record['footprint'][0][3]
+        record['band_stats'] = [ ]
+        for iBand in range(hDataset.RasterCount):
+            hBand = hDataset.GetRasterBand(iBand+1)
+            #only computed when asked for with -stats, as for -debug
+            stats = hBand.GetStatistics(bApproxStats, bStats)
+            if stats is None or stats[3] < 0.0:
+                stats = [None, None, None, None]
+            record['band_stats'].append([iBand+1] + list(stats) +
+                                        [hBand.GetNoDataValue()])
 
 #/* ==================================================================== */
 #/*      writeout sparse XML for merging                                 */
 #/* ==================================================================== */
+    if dst_xml is None:
+        return 0
     try:
         #tree.write(dst_xml, pretty_print=True, xml_declaration=True) #mp doesn't like declaration
         tree.write(dst_xml, pretty_print=True)
@@ -1130,104 +1195,6 @@ def main( argv = None ):
     
     return 0
 
-#/************************************************************************/
-#/*                        GDALInfoReportCorner()                        */
-#/************************************************************************/
-
-def GDALInfoReportCorner( hDataset, hTransform, corner_name, x, y ):
-
-    line = "%-11s " % corner_name
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform the point into georeferenced coordinates.             */
-#/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
-    if adfGeoTransform is not None:
-        dfGeoX = adfGeoTransform[0] + adfGeoTransform[1] * x \
-            + adfGeoTransform[2] * y
-        dfGeoY = adfGeoTransform[3] + adfGeoTransform[4] * x \
-            + adfGeoTransform[5] * y
-
-    else:
-        line = line + ("(%7.1f,%7.1f)" % (x, y ))
-        print(line)
-        return False
-
-#/* -------------------------------------------------------------------- */
-#/*      Report the georeferenced coordinates.                           */
-#/* -------------------------------------------------------------------- */
-    if abs(dfGeoX) < 181 and abs(dfGeoY) < 91:
-        line = line + ( "(%12.7f,%12.7f) " % (dfGeoX, dfGeoY ))
-
-    else:
-        line = line + ( "(%12.3f,%12.3f) " % (dfGeoX, dfGeoY ))
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform to latlong and report.                                */
-#/* -------------------------------------------------------------------- */
-    if hTransform is not None:
-        pnt = hTransform.TransformPoint(dfGeoX, dfGeoY, 0)
-        if pnt is not None:
-            line = line + ( "(%s," % gdal.DecToDMS( pnt[0], "Long", 2 ) )
-            line = line + ( "%s)" % gdal.DecToDMS( pnt[1], "Lat", 2 ) )
-
-    print(line)
-
-    return True
-
-#/************************************************************************/
-#/*                        GDALGetLon()                              */
-#/************************************************************************/
-def GDALGetLon( hDataset, hTransform, x, y ):
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform the point into georeferenced coordinates.             */
-#/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
-    if adfGeoTransform is not None:
-        dfGeoX = adfGeoTransform[0] + adfGeoTransform[1] * x \
-            + adfGeoTransform[2] * y
-        dfGeoY = adfGeoTransform[3] + adfGeoTransform[4] * x \
-            + adfGeoTransform[5] * y
-    else:
-        return 0.0
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform to latlong and report.                                */
-#/* -------------------------------------------------------------------- */
-    if hTransform is not None:
-        pnt = hTransform.TransformPoint(dfGeoX, dfGeoY, 0)
-        if pnt is not None:
-          return pnt[0]
-    return dfGeoX
-
-
-#/************************************************************************/
-#/*                        GDALGetLat()                              */
-#/************************************************************************/
-
-def GDALGetLat( hDataset, hTransform, x, y ):
-#/* -------------------------------------------------------------------- */
-#/*      Transform the point into georeferenced coordinates.             */
-#/* -------------------------------------------------------------------- */
-    adfGeoTransform = hDataset.GetGeoTransform(can_return_null = True)
-    if adfGeoTransform is not None:
-        dfGeoX = adfGeoTransform[0] + adfGeoTransform[1] * x \
-            + adfGeoTransform[2] * y
-        dfGeoY = adfGeoTransform[3] + adfGeoTransform[4] * x \
-            + adfGeoTransform[5] * y
-    else:
-        return 0.0
-
-#/* -------------------------------------------------------------------- */
-#/*      Transform to latlong and report.                                */
-#/* -------------------------------------------------------------------- */
-    if hTransform is not None:
-        pnt = hTransform.TransformPoint(dfGeoX, dfGeoY, 0)
-        if pnt is not None:
-          return pnt[1]
-    return dfGeoY
-
 
 #Parses attributes and texts and returns a list
 #     Not currently used
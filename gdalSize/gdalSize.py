@@ -38,112 +38,407 @@ except ImportError:
     import gdal
     from gdalconst import *
 
+import math
+import os
 import sys
 
 # =============================================================================
 def Usage():
     print('\nGiven a pair of bounding longs, lats, resolution(m), bittype (8,16,32), and number of bands')
     print('the script will report uncompressed file size. Currently, the projection from the input image.\n')
-    print('Usage: gdalsize.py minlong minlat maxlong maxlat res bitType bands infile\n')
+    print('Usage: gdalsize.py [-densify n] [-tiled blocksize] [-ovr auto|2,4,8...]')
+    print('                   [-ratio r | -sample] minlong minlat maxlong maxlat res bitType bands infile\n')
+    print('  -densify : points per edge of the long/lat box used for the projected extent (default 21)')
+    print('  -tiled   : estimate a tiled GeoTIFF with square tiles of blocksize pixels')
+    print('  -ovr     : add overviews, auto builds 2,4,8... until the overview fits in one block (256)')
+    print('  -ratio   : expected compression ratio (uncompressed / compressed)')
+    print('  -sample  : use the compression ratio of infile itself (size of its files on disk)\n')
+    print('Sizing a tiling plan in one call:')
+    print('       gdalsize.py [options] [-of csv|json] -grid minlong minlat maxlong maxlat dlong dlat')
+    print('                   res[,res...] bitType[,bitType...] bands infile')
+    print('       gdalsize.py [options] [-of csv|json] -list boxfile|- res[,res...] bitType[,bitType...] bands infile\n')
+    print('  -grid : tiles of dlong x dlat degrees covering the box')
+    print('  -list : one box per line: minlong,minlat,maxlong,maxlat[,res[,bitType[,bands]]]')
+    print('  Every tile is sized for each res and bitType given. Per tile rows and a TOTAL')
+    print('  are written to stdout as CSV (default) or JSON.\n')
     sys.exit( 1 )
 
 # =============================================================================
+def DensifyBox( minlong, minlat, maxlong, maxlat, densify ):
+    """Points along the four edges of a long/lat box, densify per edge."""
+    n = max(2, int(densify))
+    steps = [float(k) / (n - 1) for k in range(n)]
+    points = []
+    for t in steps:
+        lon = minlong + (maxlong - minlong) * t
+        lat = minlat + (maxlat - minlat) * t
+        points.extend([(lon, minlat), (lon, maxlat), (minlong, lat), (maxlong, lat)])
+    return points
 
-minlong = None
-minlat = None
-maxlong = None
-maxlat = None
-res = None
-bitType = None
-bands = None
-infile = None
+# =============================================================================
+def ProjectedExtents( ct, boxes, densify ):
+    """Projected (minX, minY, maxX, maxY) of each long/lat box.
+
+    The edges of every box are densified, since a straight box in long/lat
+    is generally curved once projected, and all boxes are sent through the
+    transformation in a single TransformPoints call.
+    """
+    points = []
+    for box in boxes:
+        points.extend(DensifyBox(box[0], box[1], box[2], box[3], densify))
+    out = ct.TransformPoints(points)
+
+    perBox = len(points) // max(1, len(boxes))
+    extents = []
+    for k in range(len(boxes)):
+        xy = [(o[0], o[1]) for o in out[k * perBox:(k + 1) * perBox]
+              if not (math.isinf(o[0]) or math.isinf(o[1]) or
+                      math.isnan(o[0]) or math.isnan(o[1]))]
+        if not xy:
+            extents.append(None)
+            continue
+        extents.append((min([v[0] for v in xy]), min([v[1] for v in xy]),
+                        max([v[0] for v in xy]), max([v[1] for v in xy])))
+    return extents
+
+# =============================================================================
+def OverviewLevels( samples, lines, blockSize ):
+    """Levels gdaladdo would build: 2, 4, 8... until one block is reached."""
+    levels = []
+    level = 1
+    while max(samples, lines) / float(level) > blockSize:
+        level = level * 2
+        levels.append(level)
+    return levels
+
+# =============================================================================
+def EstimateSize( samples, lines, bands, bytesPerPixel, blockSize = None,
+                  overviews = None, ratio = 1.0 ):
+    """Estimated GeoTIFF size in bytes as a dict.
+
+    raw is the plain lines x samples x bands size. Tiling pads the image to
+    whole tiles, each overview level adds its own (padded) image, the
+    compression ratio divides the data and each tile or strip costs an
+    offset and a byte count entry (8 bytes each once BigTIFF is needed).
+    """
+    samples = int(math.ceil(samples))
+    lines = int(math.ceil(lines))
+    pixelBytes = bands * bytesPerPixel
+    raw = int(samples * lines * pixelBytes)
+
+    levels = [1] + list(overviews or [])
+    data = 0
+    blocks = 0
+    for level in levels:
+        xs = int(math.ceil(samples / float(level)))
+        ys = int(math.ceil(lines / float(level)))
+        if blockSize:
+            tilesX = int(math.ceil(xs / float(blockSize)))
+            tilesY = int(math.ceil(ys / float(blockSize)))
+            data = data + tilesX * tilesY * blockSize * blockSize * pixelBytes
+            blocks = blocks + tilesX * tilesY
+        else:
+            data = data + xs * ys * pixelBytes
+            blocks = blocks + ys
+    data = data / float(ratio)
+
+    entryBytes = 8 if data > 4294967295 else 4
+    overhead = blocks * 2 * entryBytes
+    return { 'samples': samples, 'lines': lines, 'raw': raw,
+             'blocks': blocks, 'overviews': levels[1:],
+             'data': int(data), 'total': int(data + overhead) }
+
+# =============================================================================
+def SampleCompressionRatio( indataset ):
+    """Uncompressed size / size on disk of an existing dataset."""
+    band = indataset.GetRasterBand(1)
+    dataBytes = gdal.GetDataTypeSize(band.DataType) // 8
+    uncompressed = float(indataset.RasterXSize) * indataset.RasterYSize * \
+                   indataset.RasterCount * dataBytes
+    onDisk = 0
+    for f in indataset.GetFileList() or []:
+        if os.path.isfile(f):
+            onDisk = onDisk + os.path.getsize(f)
+    if onDisk == 0:
+        return 1.0
+    return uncompressed / onDisk
+
+# =============================================================================
+def GridBoxes( minlong, minlat, maxlong, maxlat, dlong, dlat ):
+    """Tiles of dlong x dlat degrees covering the box, clipped at its edges."""
+    boxes = []
+    lat = minlat
+    while lat < maxlat - 1e-9:
+        lon = minlong
+        while lon < maxlong - 1e-9:
+            boxes.append((lon, lat, min(lon + dlong, maxlong), min(lat + dlat, maxlat)))
+            lon = lon + dlong
+        lat = lat + dlat
+    return boxes
 
 # =============================================================================
-# Parse command line arguments.
+def ReadBoxes( fp ):
+    """Boxes read one per line as minlong,minlat,maxlong,maxlat followed by
+    an optional res, bitType and bands (None when not given).
+
+    A non-numeric first line is taken as a header. Any other line that does
+    not hold 4 to 7 numbers raises ValueError naming the line number."""
+    boxes = []
+    lineNumber = 0
+    for text in fp:
+        lineNumber = lineNumber + 1
+        text = text.strip()
+        if not text or text.startswith('#'):
+            continue
+        values = text.replace(',', ' ').split()
+        try:
+            box = [float(v) for v in values]
+        except ValueError:
+            if not boxes:
+                # a header line
+                continue
+            raise ValueError('line %d: not a number in "%s"' % (lineNumber, text))
+        if len(box) < 4 or len(box) > 7:
+            raise ValueError('line %d: expected minlong,minlat,maxlong,maxlat[,res[,bitType[,bands]]], got "%s"'
+                             % (lineNumber, text))
+        if len(box) > 4 and box[4] <= 0:
+            raise ValueError('line %d: res must be positive' % lineNumber)
+        if len(box) > 5 and box[5] not in (8, 16, 32, 64):
+            raise ValueError('line %d: bitType of %g not supported' % (lineNumber, box[5]))
+        boxes.append(tuple(box + [None] * (7 - len(box))))
+    return boxes
+
 # =============================================================================
-i = 1
-while i < len(sys.argv):
-    arg = sys.argv[i]
-
-    if minlong is None:
-        minlong = float(arg)
-    elif minlat is None:
-        minlat = float(arg)
-    elif maxlong is None:
-        maxlong = float(arg)
-    elif maxlat is None:
-        maxlat = float(arg)
-    elif res is None:
-        res = float(arg)
-    elif bitType is None:
-        bitType = float(arg)
-    elif bands is None:
-        bands = float(arg)
-    elif infile is None:
-        infile = arg
-    else:
+def SizePlan( ct, tiles, densify, blockSize, overviews, ratio ):
+    """Size every (box, res, bitType, bands) of a tiling plan.
+
+    The projected extent of each distinct box is computed once, with all
+    boxes in one transformation call, whatever the number of resolutions
+    and types it is sized for.
+    """
+    boxes = []
+    index = {}
+    for tile in tiles:
+        if tile[:4] not in index:
+            index[tile[:4]] = len(boxes)
+            boxes.append(tile[:4])
+    extents = ProjectedExtents(ct, boxes, densify)
+
+    rows = []
+    for tile in tiles:
+        (tileMinlong, tileMinlat, tileMaxlong, tileMaxlat, tileRes, tileBitType, tileBands) = tile
+        extent = extents[index[tile[:4]]]
+        row = { 'minlong': tileMinlong, 'minlat': tileMinlat,
+                'maxlong': tileMaxlong, 'maxlat': tileMaxlat,
+                'res': tileRes, 'bitType': int(tileBitType), 'bands': int(tileBands) }
+        if extent is None:
+            row.update({ 'minX': None, 'minY': None, 'maxX': None, 'maxY': None,
+                         'samples': 0, 'lines': 0, 'raw_bytes': 0, 'bytes': 0 })
+            rows.append(row)
+            continue
+        tileSamples = abs(extent[2] - extent[0]) / tileRes
+        tileLines = abs(extent[3] - extent[1]) / tileRes
+        if overviews == 'auto':
+            levels = OverviewLevels(tileSamples, tileLines, blockSize or 256)
+        else:
+            levels = overviews
+        size = EstimateSize(tileSamples, tileLines, tileBands, tileBitType / 8,
+                            blockSize, levels, ratio)
+        row.update({ 'minX': extent[0], 'minY': extent[1],
+                     'maxX': extent[2], 'maxY': extent[3],
+                     'samples': size['samples'], 'lines': size['lines'],
+                     'raw_bytes': size['raw'], 'bytes': size['total'] })
+        rows.append(row)
+    return rows
+
+PLAN_FIELDS = ['minlong', 'minlat', 'maxlong', 'maxlat', 'res', 'bitType', 'bands',
+               'minX', 'minY', 'maxX', 'maxY', 'samples', 'lines', 'raw_bytes', 'bytes']
+
+# =============================================================================
+def main( argv ):
+
+    minlong = None
+    minlat = None
+    maxlong = None
+    maxlat = None
+    res = None
+    bitType = None
+    bands = None
+    infile = None
+    densify = 21
+    blockSize = None
+    overviews = None
+    ratio = None
+    sample = False
+    grid = None
+    boxfile = None
+    outFormat = 'csv'
+
+    # =============================================================================
+    # Parse command line arguments.
+    # =============================================================================
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+
+        if arg == '-densify':
+            i = i + 1
+            densify = int(argv[i])
+        elif arg == '-tiled':
+            i = i + 1
+            blockSize = int(argv[i])
+        elif arg == '-ovr':
+            i = i + 1
+            overviews = argv[i]
+        elif arg == '-ratio':
+            i = i + 1
+            ratio = float(argv[i])
+        elif arg == '-sample':
+            sample = True
+        elif arg == '-grid':
+            grid = [float(v) for v in argv[i + 1:i + 7]]
+            i = i + 6
+        elif arg == '-list':
+            i = i + 1
+            boxfile = argv[i]
+        elif arg == '-of':
+            i = i + 1
+            outFormat = argv[i].lower()
+        elif grid is None and boxfile is None and minlong is None:
+            minlong = float(arg)
+        elif grid is None and boxfile is None and minlat is None:
+            minlat = float(arg)
+        elif grid is None and boxfile is None and maxlong is None:
+            maxlong = float(arg)
+        elif grid is None and boxfile is None and maxlat is None:
+            maxlat = float(arg)
+        elif res is None:
+            # a comma separated list is allowed when sizing a plan
+            res = [float(v) for v in arg.split(',')]
+        elif bitType is None:
+            bitType = [float(v) for v in arg.split(',')]
+        elif bands is None:
+            bands = float(arg)
+        elif infile is None:
+            infile = arg
+        else:
+            Usage()
+
+        i = i + 1
+
+    plan = grid is not None or boxfile is not None
+    if grid is not None and len(grid) != 6:
+        Usage()
+    if not plan and (maxlat is None or maxlong is None or minlat is None or minlong is None):
+        Usage()
+    if res is None:
+        Usage()
+    if bitType is None:
+        Usage()
+    if bands is None:
+        Usage()
+    if infile is None:
+        Usage()
+    if not plan and (len(res) > 1 or len(bitType) > 1):
+        Usage()
+    if outFormat not in ('csv', 'json'):
         Usage()
+    for value in bitType:
+        if value not in (8, 16, 32, 64):
+            print('bitType of %f not supported' % (value))
+            sys.exit( 1 )
+
+    # Open input dataset
+    indataset = gdal.Open( infile, GA_ReadOnly )
+
+    # Build Spatial Reference object based on coordinate system, fetched from the
+    # opened dataset
+    srs = osr.SpatialReference()
+    srs.ImportFromWkt(indataset.GetProjection())
+
+    srsLatLong = srs.CloneGeogCS()
+    if hasattr(osr, 'OAMS_TRADITIONAL_GIS_ORDER'):
+        # keep long,lat (X,Y) axis order with GDAL 3 and later
+        srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        srsLatLong.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    ct = osr.CoordinateTransformation(srsLatLong, srs)
+
+    if sample:
+        ratio = SampleCompressionRatio(indataset)
+    if overviews is not None and overviews != 'auto':
+        overviews = [int(level) for level in overviews.split(',')]
+
+    if plan:
+        # Size every tile of the plan for every resolution and type
+        if grid is not None:
+            boxes = [box + (None, None, None) for box in GridBoxes(*grid)]
+        else:
+            fp = sys.stdin if boxfile == '-' else open(boxfile)
+            try:
+                boxes = ReadBoxes(fp)
+            except ValueError as e:
+                print('%s: %s' % (boxfile, e))
+                sys.exit( 1 )
+        tiles = []
+        for box in boxes:
+            for tileRes in ([box[4]] if box[4] is not None else res):
+                for tileBitType in ([box[5]] if box[5] is not None else bitType):
+                    tiles.append(box[:4] + (tileRes, tileBitType,
+                                            box[6] if box[6] is not None else bands))
+        rows = SizePlan(ct, tiles, densify, blockSize, overviews, ratio or 1.0)
+        totalRaw = sum([row['raw_bytes'] for row in rows])
+        total = sum([row['bytes'] for row in rows])
+
+        if outFormat == 'json':
+            import json
+            json.dump({ 'tiles': rows, 'count': len(rows), 'compression_ratio': ratio or 1.0,
+                        'total_raw_bytes': totalRaw, 'total_bytes': total },
+                      sys.stdout, indent=1)
+            sys.stdout.write('\n')
+        else:
+            import csv
+            writer = csv.writer(sys.stdout, lineterminator='\n')
+            writer.writerow(PLAN_FIELDS)
+            for row in rows:
+                writer.writerow([row[field] for field in PLAN_FIELDS])
+            writer.writerow(['TOTAL'] + [''] * 12 + [totalRaw, total])
+        sys.exit( 0 )
+
+    res = res[0]
+    bitType = bitType[0]
+    extent = ProjectedExtents(ct, [(minlong, minlat, maxlong, maxlat)], densify)[0]
+    if extent is None:
+        print('Unable to project any point of the box %g %g %g %g into the infile projection'
+              % (minlong, minlat, maxlong, maxlat))
+        sys.exit( 1 )
+    (minX, minY, maxX, maxY) = extent
+
+    samples = abs(maxX - minX) / res
+    lines = abs(maxY - minY) / res
+
+    imageSizeMB = lines * samples * bands * (bitType / 8)
+
+    # Report results
+    #print('minlong: %f\t\tminlat: %f' % (minlong, minlat))
+    #print('maxlong: %f\t\tmaxlat: %f' % (maxlong, maxlat))
+    print('\nminX: %f\t\tminY: %f' % (minX, minY))
+    print('maxX: %f\t\tmaxY: %f' % (maxX, maxY))
+    print('\n%.1f in Megabytes' % (imageSizeMB))
+    print('%.1f in Gigabytes\n' % round(imageSizeMB / 1073741824 ))
 
-    i = i + 1
-
-if maxlat is None:
-    Usage()
-if maxlong is None:
-    Usage()
-if minlat is None:
-    Usage()
-if minlong is None:
-    Usage()
-if res is None:
-    Usage()
-if bitType is None:
-    Usage()
-if bands is None:
-    Usage()
-if infile is None:
-    Usage()
-
-# Open input dataset
-indataset = gdal.Open( infile, GA_ReadOnly )
-
-# Read geotransform matrix and calculate ground coordinates
-#geomatrix = indataset.GetGeoTransform()
-#X = geomatrix[0] + geomatrix[1] * pixel + geomatrix[2] * line
-#Y = geomatrix[3] + geomatrix[4] * pixel + geomatrix[5] * line
-
-# Shift to the center of the pixel
-#X += geomatrix[1] / 2.0
-#Y += geomatrix[5] / 2.0
-
-# Build Spatial Reference object based on coordinate system, fetched from the
-# opened dataset
-srs = osr.SpatialReference()
-srs.ImportFromWkt(indataset.GetProjection())
-
-srsLatLong = srs.CloneGeogCS()
-ct = osr.CoordinateTransformation(srsLatLong, srs)
-(minX, minY, height) = ct.TransformPoint(minlong, minlat)
-(maxX, maxY, height) = ct.TransformPoint(maxlong, maxlat)
-
-lines = abs(maxX - minX) / res
-samples = abs(maxY - minY) / res
-
-if bitType == 8:
-    imageSizeMB = lines * samples * bands
-elif bitType == 16:
-    imageSizeMB = lines * samples * bands * 2
-elif bitType == 32:
-    imageSizeMB = lines * samples * bands * 4
-else:
-    print('bitType of %f not supported' % (bitType))
-
-
-# Report results
-#print('minlong: %f\t\tminlat: %f' % (minlong, minlat))
-#print('minX: %f\t\tminY: %f' % (minX, minY))
-#print('maxlong: %f\t\tmaxlat: %f' % (maxlong, maxlat))
-#print('maxX: %f\t\tmaxY: %f' % (maxX, maxY))
-print('\n%.1f in Megabytes' % (imageSizeMB))
-print('%.1f in Gigabytes\n' % round(imageSizeMB / 1073741824 ))
+    if blockSize is not None or overviews is not None or ratio is not None:
+        if ratio is None:
+            ratio = 1.0
+        if overviews == 'auto':
+            overviews = OverviewLevels(samples, lines, blockSize or 256)
 
+        size = EstimateSize(samples, lines, bands, bitType / 8, blockSize, overviews, ratio)
+        print('GeoTIFF estimate: %d samples x %d lines, %d %s' % (size['samples'], size['lines'],
+              size['blocks'], 'tiles' if blockSize else 'strips'))
+        if size['overviews']:
+            print('  overview levels: %s' % ' '.join([str(level) for level in size['overviews']]))
+        print('  compression ratio: %.2f' % ratio)
+        print('  %d bytes, %.2f Gigabytes on disk\n' % (size['total'], size['total'] / 1073741824.0))
 
+if __name__ == '__main__':
+    main(sys.argv)
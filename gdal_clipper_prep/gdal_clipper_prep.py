@@ -35,6 +35,9 @@
 import math
 import sys
 import os
+import glob
+import time
+import multiprocessing
 try:
    from osgeo import gdal
    from osgeo.gdalconst import *
@@ -54,7 +57,20 @@ except ImportError:
 # Usage()
 def Usage():
     print("""
-Usage: gdal_clipper_update.py [-of ENVI] [-flip] [-positive] [-fill] [-scale] [-ot UInt16] [-padLeft] [-padRight] infile.fit outfile.tif
+Usage: gdal_clipper_update.py [-of ENVI] [-flip] [-positive] [-fill] [-fillRadius 100] [-scale] [-ot UInt16] [-padLeft] [-padRight] infile.fit outfile.tif
+
+-fill interpolates NaN (and with -positive, negative) pixels from the nearest
+valid pixels left, right, above and below within -fillRadius pixels
+(default 100), weighted by inverse distance. Pixels with no valid pixel in
+reach are left as NoData.
+
+Batch mode, when infile is a directory or a wildcard pattern (quote it):
+gdal_clipper_update.py [options] [-threads n] [-suffix _pad] [-ext .tif] [-overwrite] "frames/*.fit" outdir
+
+Frames are prepared on -threads worker processes (default number of CPUs) and
+written to outdir as <name><suffix><ext> (ext defaults to .raw for ENVI and
+.tif otherwise). Outputs newer than their frame are skipped unless -overwrite
+is given. A line with the time taken is reported for each frame.
 
 example:
 gdal_clipper_prep.py -of ENVI -ot UInt16 -fill -positive -scale -padRight 02L_b_000003.fit 02L_b_000003_pad.raw
@@ -110,161 +126,359 @@ def ParseNoData(type):
     else:
         return 0
 
+# =============================================================================
+# Fill NaN pixels in place from the nearest valid pixel in each of the four
+# directions (left, right, up, down) found within radius pixels. Each one is
+# weighted by inverse distance, so between two valid pixels on a line this is
+# linear interpolation along that line, and lines and columns are combined.
+def FillNaN(data, radius):
+    invalid = np.isnan(data)
+    if not invalid.any():
+        return
+    num = np.zeros(data.shape)
+    den = np.zeros(data.shape)
+    for axis in (0, 1):
+        size = data.shape[axis]
+        shape = (-1, 1) if axis == 0 else (1, -1)
+        pos = np.broadcast_to(np.arange(size).reshape(shape), data.shape)
+
+        #index of the nearest valid pixel before and after each pixel
+        before = np.where(invalid, -1, pos)
+        np.maximum.accumulate(before, axis=axis, out=before)
+        after = np.where(invalid, size, pos)
+        after = np.flip(np.minimum.accumulate(np.flip(after, axis), axis=axis), axis)
+
+        for nearest in (before, after):
+            dist = np.abs(pos - nearest)
+            use = invalid & (nearest >= 0) & (nearest < size) & (dist <= radius)
+            values = np.take_along_axis(data, np.clip(nearest, 0, size - 1), axis=axis)
+            weight = 1.0 / dist[use]
+            num[use] += values[use] * weight
+            den[use] += weight
+
+    filled = den > 0
+    data[filled] = num[filled] / den[filled]
+
+# =============================================================================
+# Read n processed output lines starting at output line y into buf: flipped
+# if requested (from the mirrored input lines), scaled and negatives set to
+# NaN, all in place. Returns the processed lines (a view of buf).
+def ReadLines(iBand, y, n, buf, rows, flip, scale, bscale, bzero, positive):
+    data = buf[:n]
+    if flip:
+        iBand.ReadAsArray(0, rows - y - n, iBand.XSize, n, buf_obj=data)
+        data = data[::-1]
+    else:
+        iBand.ReadAsArray(0, y, iBand.XSize, n, buf_obj=data)
+
+    #Apply FITS scale and offset
+    if scale:
+        data *= bscale
+        data += bzero
+
+    #if requested, set all negative values to NoData (nan)
+    if positive:
+        data[data < 0] = np.nan
+    return data
+
+# =============================================================================
+# Remove what a failed PrepareFrame created
+def _RemoveOutput(target, driver):
+    """Delete a partial output written by driver, with the sidecars it lists."""
+    gdal.PushErrorHandler('CPLQuietErrorHandler')
+    driver.Delete(target)
+    gdal.PopErrorHandler()
+    # a frame that failed early may not open to list its files
+    if os.path.exists(target):
+        os.remove(target)
+
+# =============================================================================
+# Prepare one frame, options holds the parsed command line settings
+def PrepareFrame(infile, outfile, options):
+    format = options['format']
+    outType = options['outType']
+    quiet = options['quiet']
+    padLeft = options['padLeft']
+    padRight = options['padRight']
+    padSize = options['padSize']
+    scale = options['scale']
+    flip = options['flip']
+    fill = options['fill']
+    fillRadius = options['fillRadius']
+    positive = options['positive']
+
+    #Try to open input image, and get metadata
+    indataset = gdal.Open( infile, GA_ReadOnly )
+    if indataset is None:
+        raise IOError('Unable to open ' + infile)
+    cols, rows = indataset.RasterXSize, indataset.RasterYSize
+
+    #need to read band 1 to get data type (Byte, Int16, etc.)
+    inType = indataset.GetRasterBand(1).DataType
+
+    #Get metadata from FITS file
+    bscale = float(indataset.GetMetadataItem('BSCALE'))
+    bzero = float(indataset.GetMetadataItem('BZERO'))
+
+    #Check to see if user spcified Byte (8 bit) output Type
+    #The Nodata value is set below
+    if outType is None:
+       outGdalType = inType
+    else:
+       outGdalType = ParseType(outType)
+
+    # Read geotransform matrix and calculate ground coordinates
+    geomatrix = indataset.GetGeoTransform()
+    X = geomatrix[0]
+    Y = geomatrix[3]
+    cellsizeX = geomatrix[1]
+    cellsizeY = geomatrix[5]
+
+    out_driver = gdal.GetDriverByName(format)
+    if (padLeft or padRight):
+       newXSize = padSize
+       newYSize = indataset.RasterYSize
+       outdataset = out_driver.Create(outfile, newXSize, \
+                 newYSize, indataset.RasterCount, outGdalType)
+    else:
+       outdataset = out_driver.Create(outfile, indataset.RasterXSize, \
+                 indataset.RasterYSize, indataset.RasterCount, outGdalType)
+
+    if outdataset is None:
+        raise IOError('Unable to create ' + outfile)
+
+    #outfile is ours from here on, a failure removes it again so a bad
+    #frame leaves nothing behind (and is not skipped in the next batch)
+    try:
+        outdataset.SetProjection(indataset.GetProjection())
+
+        #work on strips of lines so memory stays bounded. One float buffer is reused
+        #for every strip and scale, flip, positive and fill are all done in place.
+        #With -fill each strip is read with fillRadius lines of halo above and below
+        #so pixels near the strip edges are filled as if the whole frame were loaded.
+        stripLines = 512
+        halo = fillRadius if fill else 0
+        strip_buf = np.empty((min(stripLines + 2 * halo, rows), cols), dtype=np.float64)
+
+        #the image is written straight into its window of the padded output
+        outX = 0
+        if (padLeft or padRight):
+           Xoffset = padSize - indataset.RasterXSize
+           raster_pad = np.zeros((min(stripLines, rows), Xoffset))
+           if padLeft:
+              outX = Xoffset
+              padX = 0
+           else: #padRight
+              padX = cols
+
+        #loop over bands - not needed here but just in case
+        for band in range (1, indataset.RasterCount + 1):
+           iBand = indataset.GetRasterBand(band)
+           #if outType is None:
+           #   outNoData=iBand.GetNoDataValue()
+           outNoData=iBand.GetNoDataValue()
+           outband = outdataset.GetRasterBand(band)
+
+           #write out scale and offset to new file
+           outband.SetOffset(0)
+           outband.SetScale(1)
+           if not outNoData is None: 
+              outband.SetNoDataValue(outNoData)
+
+           for y in range(0, rows, stripLines):
+              n = min(stripLines, rows - y)
+              y0 = max(0, y - halo)
+              y1 = min(rows, y + n + halo)
+              raster_data = ReadLines(iBand, y0, y1 - y0, strip_buf, rows,
+                                      flip, scale, bscale, bzero, positive)
+
+              #if requested, interpolate over NaN values
+              if fill:
+                 FillNaN(raster_data, fillRadius)
+              raster_data = raster_data[y - y0:y - y0 + n]
+
+              #write out strip and its padding
+              outband.WriteArray(raster_data, outX, y)
+              if (padLeft or padRight):
+                 outband.WriteArray(raster_pad[:n], padX, y)
+
+           if not quiet:
+              print ("band: " + str(band) + " complete."),
+
+        #set output to None to close file
+        raster_data = None
+        strip_buf = None
+        outdataset = None
+        indataset = None
+    except Exception:
+        outdataset = None
+        _RemoveOutput(outfile, out_driver)
+        raise
+
+# =============================================================================
+# Batch mode helpers, each worker process gets the options once
+
+_options = None
+
+def _InitWorker(options):
+    global _options
+    _options = options
+
+def _PrepareWorker(files):
+    infile, outfile = files
+    start = time.time()
+    try:
+        PrepareFrame(infile, outfile, _options)
+    except Exception as e:
+        return infile, outfile, time.time() - start, str(e)
+    return infile, outfile, time.time() - start, None
+
 # =============================================================================
 # 	Mainline
 # =============================================================================
-argv = gdal.GeneralCmdLineProcessor( sys.argv )
-
-infile = None
-outfile = None
-format = None
-outType = None
-outNoData = None
-quiet = False
-padLeft = False
-padRight = False
-padSize = 3664
-scale = False
-flip = False
-fill = False
-positive = False
-
-# Parse command line arguments.
-i = 1
-while i < len(sys.argv):
-    arg = argv[i]
-    if arg == '-of':
-        i = i + 1
-        format = argv[i]
-    elif arg == '-ot':
+def main( argv = None ):
+
+    argv = gdal.GeneralCmdLineProcessor( argv )
+    if argv is None:
+        return 0
+
+    infile = None
+    outfile = None
+    format = None
+    outType = None
+    quiet = False
+    padLeft = False
+    padRight = False
+    padSize = 3664
+    scale = False
+    flip = False
+    fill = False
+    fillRadius = 100
+    positive = False
+    threads = multiprocessing.cpu_count()
+    suffix = ''
+    ext = None
+    overwrite = False
+
+    # Parse command line arguments.
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '-of':
+            i = i + 1
+            format = argv[i]
+        elif arg == '-ot':
+            i = i + 1
+            outType = argv[i]
+        elif arg == '-padLeft':
+            padLeft = True
+        elif arg == '-padRight':
+            padRight = True
+        elif arg == '-q' or arg == '-quiet':
+            quiet = True
+        elif arg == '-f' or arg == '-flip':
+            flip = True
+        elif arg == '-fill':
+            fill = True
+        elif arg == '-fillRadius':
+            i = i + 1
+            fillRadius = int(argv[i])
+            fill = True
+        elif arg == '-positive':
+            positive = True
+        elif arg == '-s' or arg == '-scale':
+            scale = True
+        elif arg == '-threads':
+            i = i + 1
+            threads = max(1, int(argv[i]))
+        elif arg == '-suffix':
+            i = i + 1
+            suffix = argv[i]
+        elif arg == '-ext':
+            i = i + 1
+            ext = argv[i]
+        elif arg == '-overwrite':
+            overwrite = True
+        elif infile is None:
+            infile = arg
+        elif outfile is None:
+            outfile = arg
+        else:
+            Usage()
         i = i + 1
-        outType = argv[i]
-    elif arg == '-padLeft':
-        padLeft = True
-    elif arg == '-padRight':
-        padRight = True
-    elif arg == '-q' or arg == '-quiet':
-        quiet = True
-    elif arg == '-f' or arg == '-flip':
-        flip = True
-    elif arg == '-fill':
-        fill = True
-    elif arg == '-positive':
-        positive = True
-    elif arg == '-s' or arg == '-scale':
-        scale = True
-    elif infile is None:
-        infile = arg
-    elif outfile is None:
-        outfile = arg
-    else:
+
+    if format is None:
+        format = 'GTiff'
+    if infile is None:
         Usage()
-    i = i + 1
-
-if format is None:
-    format = 'GTiff'
-if infile is None:
-    Usage()
-if  outfile is None:
-    Usage()
-    
-# =============================================================================
-#Try to open input image, and get metadata
-indataset = gdal.Open( infile, GA_ReadOnly )
-cols, rows = indataset.RasterXSize, indataset.RasterYSize
-
-#need to read band 1 to get data type (Byte, Int16, etc.)
-inType = indataset.GetRasterBand(1).DataType
-
-#Get metadata from FITS file
-bscale = float(indataset.GetMetadataItem('BSCALE'))
-bzero = float(indataset.GetMetadataItem('BZERO'))
-
-#Check to see if user spcified Byte (8 bit) output Type
-#The Nodata value is set below
-if outType is None:
-   outGdalType = inType
-else:
-   outGdalType = ParseType(outType)
-
-# Read geotransform matrix and calculate ground coordinates
-geomatrix = indataset.GetGeoTransform()
-X = geomatrix[0]
-Y = geomatrix[3]
-cellsizeX = geomatrix[1]
-cellsizeY = geomatrix[5]
-
-out_driver = gdal.GetDriverByName(format)
-if (padLeft or padRight):
-   newXSize = padSize
-   newYSize = indataset.RasterYSize
-   outdataset = out_driver.Create(outfile, newXSize, \
-             newYSize, indataset.RasterCount, outGdalType)
-else:
-   outdataset = out_driver.Create(outfile, indataset.RasterXSize, \
-             indataset.RasterYSize, indataset.RasterCount, outGdalType)
-
-outdataset.SetProjection(indataset.GetProjection())
-
-#loop over bands - not needed here but just in case
-for band in range (1, indataset.RasterCount + 1):
-   iBand = indataset.GetRasterBand(band)
-   #if outType is None:
-   #   outNoData=iBand.GetNoDataValue()
-   outNoData=iBand.GetNoDataValue()
-   outband = outdataset.GetRasterBand(band)
-
-   raster_data = iBand.ReadAsArray(0, 0, cols, rows)
-
-   #write out scale and offset to new file
-   outband.SetOffset(0)
-   outband.SetScale(1)
-   if not outNoData is None: 
-      outband.SetNoDataValue(outNoData)
-
-   #Apply FITS scale and offset
-   if scale:
-      raster_data = raster_data * bscale 
-      raster_data = raster_data + bzero 
-      #outdataset.SetMetadataItem('BSCALE') = 1.0
-      #outdataset.SetMetadataItem('BZERO') = 0.0
-
-   #if requested, flip numpy array up-side-down
-   if flip:
-      raster_data = flipud(raster_data)
-
-   #if requested, set all negative values to NoData (nan)
-   if positive:
-      raster_data[raster_data<0] = np.nan
-
-   #if requested, set a mask and interpolate over masked values
-   if fill:
-      mask = np.isnan(raster_data)
-      raster_data[mask] = np.interp(np.flatnonzero(mask), np.flatnonzero(~mask), raster_data[~mask])
-      
-   #print raster_data.shape
-   #output array
-   #if requested, set a mask and interpolate over masked values
-   if (padLeft or padRight):
-      Xoffset = padSize - indataset.RasterXSize
-      #Zero out array
-      raster_pad = np.zeros((newYSize,Xoffset))
-      #print raster_pad.shape
-
-      if padLeft:
-         raster_data = np.append(raster_pad,raster_data,axis=1)
-      else: #padRight
-         raster_data = np.append(raster_data,raster_pad,axis=1)
-      #print raster_data.shape
-
-   #write out raster band
-   outband.WriteArray(raster_data)
-
-   if not quiet:
-      print ("band: " + str(band) + " complete."),
-
-#set output to None to close file
-raster_data = None
-outdataset = None
-indataset = None
+    if  outfile is None:
+        Usage()
+
+    options = { 'format': format, 'outType': outType, 'quiet': quiet,
+                'padLeft': padLeft, 'padRight': padRight, 'padSize': padSize,
+                'scale': scale, 'flip': flip, 'fill': fill,
+                'fillRadius': fillRadius, 'positive': positive }
+
+    if not (os.path.isdir(infile) or glob.has_magic(infile)):
+        PrepareFrame(infile, outfile, options)
+        return 0
+
+    # =========================================================================
+    # Batch mode: prepare every frame of a directory or wildcard pattern
+    if os.path.isdir(infile):
+        frames = sorted(glob.glob(os.path.join(infile, '*.fit')) +
+                        glob.glob(os.path.join(infile, '*.fits')))
+    else:
+        frames = sorted(glob.glob(infile))
+    if ext is None:
+        ext = '.raw' if format.upper() == 'ENVI' else '.tif'
+    if not os.path.isdir(outfile):
+        os.makedirs(outfile)
+
+    jobs = []
+    skipped = 0
+    for frame in frames:
+        name = os.path.splitext(os.path.basename(frame))[0]
+        target = os.path.join(outfile, name + suffix + ext)
+        if not overwrite and os.path.exists(target) and \
+           os.path.getmtime(target) >= os.path.getmtime(frame):
+            skipped = skipped + 1
+            continue
+        jobs.append((frame, target))
+
+    if not quiet:
+        print("%d frames, %d up to date, %d to prepare on %d workers" %
+              (len(frames), skipped, len(jobs), min(threads, max(1, len(jobs)))))
+
+    # per frame band messages would interleave, the timing report replaces them
+    options['quiet'] = True
+    start = time.time()
+    if threads > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(threads, len(jobs)), _InitWorker, (options,))
+        results = pool.imap_unordered(_PrepareWorker, jobs)
+    else:
+        pool = None
+        _InitWorker(options)
+        results = (_PrepareWorker(job) for job in jobs)
+
+    failed = 0
+    done = 0
+    for frame, target, seconds, error in results:
+        done = done + 1
+        if error is not None:
+            failed = failed + 1
+            print("[%d/%d] %s FAILED after %.2fs: %s" % (done, len(jobs), frame, seconds, error))
+        elif not quiet:
+            print("[%d/%d] %s -> %s %.2fs" % (done, len(jobs), frame, target, seconds))
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    if not quiet:
+        print("%d prepared, %d failed, %d skipped in %.1fs" %
+              (len(jobs) - failed, failed, skipped, time.time() - start))
+    return 1 if failed else 0
 
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
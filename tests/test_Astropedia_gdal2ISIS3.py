@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("osgeo")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "gdal2ISIS3"))
+from gdal2label import StatsNew, StatsAccumulate
+from Astropedia_gdal2ISIS3 import ISISStatistics, ISIS_VALID_RANGE
+
+
+def _groups(text):
+    groups = []
+    for block in text.split("End_Group")[:-1]:
+        values = {}
+        for line in block.strip().splitlines()[1:]:
+            key, value = [v.strip() for v in line.split("=")]
+            values[key] = value
+        groups.append(values)
+    return groups
+
+
+def test_statistics_are_per_band_without_special_pixels():
+    band1 = np.array([0, 10, 20, 255], dtype=np.uint8)
+    band2 = np.array([0, 0, 0, 0], dtype=np.uint8)
+    stats = [StatsAccumulate(StatsNew(), b, validRange=ISIS_VALID_RANGE["u1"])
+             for b in (band1, band2)]
+    text = ISISStatistics("out.cub", stats, 4)
+    assert text.endswith("End\n")
+    (g1, g2) = _groups(text)
+    assert (g1["Band"], g1["ValidPixels"], g1["TotalPixels"]) == ("1", "2", "4")
+    assert (float(g1["Minimum"]), float(g1["Maximum"]), float(g1["Average"])) == (10, 20, 15)
+    assert (g2["Band"], g2["ValidPixels"]) == ("2", "0") and "Average" not in g2
+
+
+def test_statistics_apply_base_and_multiplier():
+    stats = [StatsAccumulate(StatsNew(), np.array([1, 3], dtype=np.int16))]
+    (g,) = _groups(ISISStatistics("out.cub", stats, 2, base=100.0, multiplier=-2.0))
+    assert (float(g["Minimum"]), float(g["Maximum"])) == (94.0, 98.0)
+    assert float(g["Average"]) == 96.0 and float(g["StandardDeviation"]) == 2.0
+    assert float(g["Sum"]) == 192.0
@@ -0,0 +1,37 @@
+import os
+import re
+import sys
+
+import pytest
+
+pytest.importorskip("osgeo")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "gdal2ISIS3"))
+from LMMP_gdal2PDS import LabelRecords
+
+LABEL = ("PDS_VERSION_ID = PDS3\n"
+         "RECORD_BYTES  = %d\n"
+         "FILE_RECORDS  = @FILE_RECORDS@\n"
+         "LABEL_RECORDS = @LABEL_RECORDS@\n"
+         "^IMAGE        = @IMAGE@\n"
+         "END\n")
+
+
+def _value(text, key):
+    return int(re.search(r"^\^?%s\s*=\s*(\d+)" % re.escape(key), text, re.M).group(1))
+
+
+@pytest.mark.parametrize("record_bytes", [1, 7, 12, 16, 64, 115, 4096])
+def test_attached_label_fits_its_records(record_bytes):
+    (text, label_records) = LabelRecords(LABEL % record_bytes, record_bytes, 1000, True)
+    # the fewest whole records that hold the filled label
+    assert (label_records - 1) * record_bytes < len(text) <= label_records * record_bytes
+    assert _value(text, "LABEL_RECORDS") == label_records
+    assert _value(text, "IMAGE") == label_records + 1
+    assert _value(text, "FILE_RECORDS") == label_records + 1000
+
+
+def test_detached_label_has_no_label_records():
+    (text, label_records) = LabelRecords(LABEL % 16, 16, 1000, False)
+    assert label_records == 0
+    assert _value(text, "FILE_RECORDS") == 1000
@@ -0,0 +1,82 @@
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "gdal2Coordinates"))
+import gdal2coordinates as g2c
+
+
+@pytest.mark.parametrize("angle, axis, expected", [
+    (10.0, "Long", ' 10d 0\' 0.00"E'),
+    (-12.5, "Long", ' 12d30\' 0.00"W'),
+    (45.2625, "Lat", ' 45d15\'45.00"N'),
+    (179.99999, "Long", '179d59\'59.96"E'),
+])
+def test_dec_to_dms(angle, axis, expected):
+    assert g2c.DecToDMS(angle, axis) == expected
+
+
+def test_adjlon_wraps_like_proj():
+    assert g2c._AdjLon(190.0) == -170.0
+    assert g2c._AdjLon(-180.0) == -180.0
+    assert g2c._AdjLon(45.0) == 45.0
+
+
+def eqc(lat_ts=0.0, lon_0=0.0):
+    return {"type": "eqc", "a": 1737400.0, "to_meter": 1.0, "lon_0": lon_0,
+            "lat_0": 0.0, "lat_ts": lat_ts, "x_0": 0.0, "y_0": 0.0}
+
+
+def test_eqc_matches_spherical_formula():
+    toLongLat, fromLongLat = g2c._ProjectionFunctions(eqc(lat_ts=30.0, lon_0=180.0))
+    x, y = fromLongLat(90.0, -10.0)
+    rad = 1737400.0 * math.pi / 180.0
+    assert x == pytest.approx(-90.0 * rad * math.cos(math.radians(30.0)))
+    assert y == pytest.approx(-10.0 * rad)
+    lon, lat = toLongLat(x, y)
+    assert (lon, lat) == (pytest.approx(90.0), pytest.approx(-10.0))
+
+
+def test_pixel_center_affine():
+    gt = (-180.0, 0.5, 0.0, 90.0, 0.0, -0.5)
+    x, y = g2c._Affine(gt, [0.0], [0.0], 0.5)
+    assert (x, y) == ([-179.75], [89.75])
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("GDAL2COORDINATES_CACHE", str(tmp_path / "cache"))
+    g2c.ClearCache()
+    reads = []
+
+    def fake_read(infile):
+        reads.append(infile)
+        return {"geomatrix": [0.0, 1.0, 0.0, 0.0, 0.0, -1.0],
+                "invgeomatrix": [0.0, 1.0, 0.0, 0.0, 0.0, -1.0],
+                "wkt": "", "projection": {"type": "longlat"}, "files": []}
+
+    monkeypatch.setattr(g2c.DatasetCoordinates, "_ReadDataset", staticmethod(fake_read))
+    yield reads
+    g2c.ClearCache()
+
+
+def test_cache_is_reused_until_a_sidecar_appears(tmp_path, cache_dir):
+    raster = tmp_path / "mosaic.tif"
+    raster.write_bytes(b"x")
+    g2c.DatasetCoordinates(str(raster))
+    g2c.DatasetCoordinates(str(raster))
+    assert len(cache_dir) == 1
+
+    # an in-place registration change written to PAM invalidates the cache
+    (tmp_path / "mosaic.tif.aux.xml").write_text("<PAMDataset/>")
+    g2c.DatasetCoordinates(str(raster))
+    assert len(cache_dir) == 2
+
+    g2c.ClearCache()
+    g2c.Open(str(raster))
+    assert len(cache_dir) == 2
+    (tmp_path / "mosaic.tfw").write_text("1\n0\n0\n-1\n0\n0\n")
+    g2c.Open(str(raster))
+    assert len(cache_dir) == 3
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("osgeo")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "gdal2Gores"))
+from gdal2gores import GoreBlock
+
+
+@pytest.mark.parametrize("resample", ["near", "bilinear", "average"])
+def test_constant_source_stays_constant_inside_gores(resample):
+    ysize, xsize = 64, 128
+    block = np.full((ysize, xsize), 7.0, dtype=np.float32)
+    out = GoreBlock(block, 0, ysize, 4, resample)
+    # the equator line is fully covered, higher latitudes only mid-gore
+    assert np.allclose(out[ysize // 2], 7.0)
+    assert np.isclose(out[ysize // 4, 16], 7.0) and out[ysize // 4, 0] == 0.0
+
+
+def test_equator_average_is_identity():
+    ysize, xsize = 1000, 64
+    block = np.tile(np.arange(xsize, dtype=np.float64), (2, 1))
+    out = GoreBlock(block, ysize // 2 - 1, ysize, 2, "average")
+    assert np.allclose(out, block, atol=1e-3)
+
+
+@pytest.mark.parametrize("resample", ["bilinear", "average"])
+def test_nodata_is_not_mixed_into_valid_pixels(resample):
+    ysize, xsize = 8, 64
+    block = np.full((ysize, xsize), 10.0)
+    block[:, 24:40] = -9999.0
+    out = GoreBlock(block, 0, ysize, 2, resample, nodata=-9999.0)
+    assert np.all(np.isclose(out, 10.0) | (out == -9999.0))
+    # pixels whose source span is all nodata stay nodata
+    assert np.all(out[ysize // 2, 28:36] == -9999.0)
+
+
+def test_integer_output_keeps_dtype_and_fills_nodata():
+    block = np.zeros((4, 16), dtype=np.int16)
+    out = GoreBlock(block, 0, 4, 2, "average", nodata=0)
+    assert out.dtype == np.int16
+    assert np.all(out == 0)
@@ -0,0 +1,223 @@
+import hashlib
+import io
+import os
+import sys
+import xml.etree.ElementTree as etree
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("osgeo")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "gdal2ISIS3"))
+from gdal2label import StatsNew, StatsAccumulate, StatsFill, StatsPlaceholder
+from gdal2label import WriteCoreBSQ, MD5Writer
+from gdal2label import Inspect, ISIS3Label, PDS3Label, FGDCTree, PROJ_PARMS
+import gdal2label
+
+
+class FakeBand(object):
+    DataType = "Int16"
+
+    def __init__(self, data, nodata=None):
+        self.data = data
+        self.nodata = nodata
+
+    def GetOffset(self):
+        return 0.0
+
+    def GetScale(self):
+        return 1.0
+
+    def GetBlockSize(self):
+        return (self.data.shape[1], 1)
+
+    def GetNoDataValue(self):
+        return self.nodata
+
+    def ReadAsArray(self, x, y, xsize, ysize):
+        return self.data[y:y + ysize, x:x + xsize]
+
+
+class FakeDataset(object):
+    def __init__(self, bands):
+        self.bands = bands
+        self.RasterYSize, self.RasterXSize = bands[0].data.shape
+        self.RasterCount = len(bands)
+
+    def GetRasterBand(self, i):
+        return self.bands[i - 1]
+
+
+class GeoDataset(FakeDataset):
+    def __init__(self, bands, geotransform, wkt):
+        FakeDataset.__init__(self, bands)
+        self.geotransform = geotransform
+        self.wkt = wkt
+
+    def GetGeoTransform(self, can_return_null=False):
+        return self.geotransform
+
+    def GetProjectionRef(self):
+        return self.wkt
+
+    def GetDescription(self):
+        return "moon_dem.tif"
+
+
+MOON = {"prettyWkt": "", "geographic": True, "projection": None,
+        "datum": "D_Moon_2000", "semiMajor": 1737400.0, "semiMinor": 1737400.0,
+        "invFlat": 0.0, "parms": dict((p, None) for p in PROJ_PARMS)}
+
+
+class Template(object):
+    """The iter/SubElement calls FGDCTree makes on a gdal2metadata Template."""
+
+    def __init__(self, xml):
+        self.root = etree.fromstring(xml)
+
+    def iter(self, tag):
+        return list(self.root.iter(tag))
+
+    def SubElement(self, parent, tag):
+        return etree.SubElement(parent, tag)
+
+
+FGDC = """<metadata><idinfo><citation><citeinfo/></citation><spdom><bounding>
+<westbc/><eastbc/><northbc/><southbc/></bounding></spdom></idinfo>
+<spref><horizsys><geograph><latres/><lonres/></geograph><geodetic><ellips/>
+<semiaxis/></geodetic></horizsys></spref><spdoinfo><rastinfo><rowcount/>
+<colcount/><vrtcount/></rastinfo></spdoinfo></metadata>"""
+
+
+def _values(text):
+    values = {}
+    for line in text.splitlines():
+        if "=" in line:
+            key, value = line.split("=", 1)
+            values[key.strip()] = value.split("<")[0].strip().strip('"')
+    return values
+
+
+@pytest.fixture
+def inspected(monkeypatch):
+    """Inspect() of a two band lunar Int16 raster, 10E to 30E, 30N to 40N."""
+    monkeypatch.setattr(gdal2label, "InspectSRS", lambda wkt: MOON if wkt else None)
+    monkeypatch.setattr(gdal2label, "LatLongTransform", lambda wkt: None)
+    monkeypatch.setattr(gdal2label.gdal, "GetDataTypeName", str)
+    data = np.zeros((20, 40), dtype=np.int16)
+    ds = GeoDataset([FakeBand(data), FakeBand(data)], (10.0, 0.5, 0.0, 40.0, 0.0, -0.5),
+                    'GEOGCS["Moon 2000"]')
+    return Inspect(ds, "moon_dem.tif")
+
+
+def test_blockwise_stats_match_numpy():
+    data = np.random.RandomState(1).normal(5.0, 2.0, (50, 40))
+    stats = StatsNew()
+    for y in range(0, 50, 7):
+        StatsAccumulate(stats, data[y:y + 7])
+    assert stats["count"] == data.size
+    assert np.isclose(stats["mean"], data.mean())
+    assert np.isclose(np.sqrt(stats["m2"] / stats["count"]), data.std())
+    assert (stats["min"], stats["max"]) == (data.min(), data.max())
+
+
+def test_nodata_nan_and_special_pixels_are_skipped():
+    data = np.array([[0, 1, 2, 254, 255, 9]], dtype=np.uint8)
+    stats = StatsAccumulate(StatsNew(), data, nodata=9, validRange=(1, 254))
+    assert stats["count"] == 3 and (stats["min"], stats["max"]) == (1, 254)
+    data = np.array([np.nan, -3.4028235e38, 1.0, 3.0], dtype="<f4")
+    stats = StatsAccumulate(StatsNew(), data,
+                            validRange=(-3.4028224522648084e+38, 3.4028234663852886e+38))
+    assert stats["count"] == 2 and stats["mean"] == 2.0
+
+
+def test_core_stats_are_per_band_and_can_be_combined():
+    a = np.arange(12, dtype=np.int16).reshape(3, 4)
+    ds = FakeDataset([FakeBand(a), FakeBand(a + 100, nodata=100)])
+    fout = io.BytesIO()
+    stats = [StatsNew(), StatsNew()]
+    WriteCoreBSQ(fout, ds, "<i2", stats, bProgress=False)
+    assert fout.getvalue() == a.tobytes() + (a + 100).tobytes()
+    assert (stats[0]["count"], stats[0]["max"]) == (12, 11)
+    assert (stats[1]["count"], stats[1]["min"]) == (11, 101)
+    total = StatsNew()
+    WriteCoreBSQ(io.BytesIO(), ds, "<i2", [total] * 2, bProgress=False)
+    assert total["count"] == 23
+
+
+def test_fill_keeps_the_label_length():
+    text = "MINIMUM = %s\nMEAN = %s\n" % (StatsPlaceholder("MINIMUM"), StatsPlaceholder("MEAN"))
+    stats = StatsAccumulate(StatsNew(), np.array([1.5, 2.5]))
+    filled = StatsFill(text, stats)
+    assert len(filled) == len(text)
+    assert filled.split()[2] == "1.5" and filled.split()[5] == "2"
+    assert len(StatsFill(text, StatsNew())) == len(text)
+
+
+def test_stats_only_pass_writes_nothing():
+    ds = FakeDataset([FakeBand(np.arange(6, dtype=np.uint8).reshape(2, 3))])
+    stats = [StatsNew()]
+    WriteCoreBSQ(None, ds, "u1", stats, bProgress=False)
+    assert (stats[0]["count"], stats[0]["max"]) == (6, 5)
+
+
+def test_md5_writer_hashes_label_and_core_as_one_file():
+    label = b"PDS_VERSION_ID = PDS3\r\nEND\r\n"
+    core = np.arange(12, dtype="<i2").reshape(3, 4)
+    out = MD5Writer(io.BytesIO())
+    out.write(label)
+    out.write(b" " * (16 - len(label) % 16))
+    WriteCoreBSQ(out, FakeDataset([FakeBand(core)]), "<i2", bProgress=False)
+    written = out.fout.getvalue()
+    assert written.endswith(core.tobytes())
+    assert out.hexdigest() == hashlib.md5(written).hexdigest()
+
+
+def test_isis3_pds3_and_fgdc_agree_on_one_inspection(inspected):
+    isis = _values(ISIS3Label(inspected, "moon_dem.cub"))
+    pds = _values(PDS3Label(inspected, "moon_dem.img"))
+    tree = FGDCTree(inspected, Template(FGDC))
+    fgdc = dict((e.tag, e.text) for e in tree.root.iter())
+
+    assert (isis["Samples"], isis["Lines"], isis["Bands"]) == ("40", "20", "2")
+    assert (pds["LINE_SAMPLES"], pds["LINES"], pds["BANDS"]) == ("40", "20", "2")
+    assert (fgdc["colcount"], fgdc["rowcount"], fgdc["vrtcount"]) == ("40", "20", "2")
+
+    assert float(isis["EquatorialRadius"]) == float(pds["A_AXIS_RADIUS"]) * 1000.0
+    assert float(isis["PolarRadius"]) == float(pds["C_AXIS_RADIUS"]) * 1000.0
+    assert float(fgdc["semiaxis"]) == 1737400.0
+    assert isis["TargetName"] == fgdc["ellips"] == "Moon"
+
+    for (isis_key, pds_key, fgdc_key, value) in [
+            ("MinimumLongitude", "WESTERNMOST_LONGITUDE", "westbc", 10.0),
+            ("MaximumLongitude", "EASTERNMOST_LONGITUDE", "eastbc", 30.0),
+            ("MinimumLatitude", "MINIMUM_LATITUDE", "southbc", 30.0),
+            ("MaximumLatitude", "MAXIMUM_LATITUDE", "northbc", 40.0)]:
+        assert float(isis[isis_key]) == float(pds[pds_key]) == float(fgdc[fgdc_key]) == value
+
+    assert float(isis["Scale"]) == float(pds["MAP_RESOLUTION"]) == 2.0
+    assert float(fgdc["lonres"]) == 1.0 / float(isis["Scale"])
+    assert float(isis["PixelResolution"]) == pytest.approx(float(pds["MAP_SCALE"]) * 1000.0)
+    assert pds["MAP_PROJECTION_TYPE"] == "SIMPLE_CYLINDRICAL"
+    assert isis["ProjectionName"] == "SimpleCylindrical"
+
+
+def test_labels_without_a_projection_leave_out_the_mapping(inspected):
+    inspected["srs"] = None
+    (inspected["mres"], inspected["mapres"]) = (None, None)
+    isis = ISIS3Label(inspected, "moon_dem.cub", attach=True)
+    assert "Group = Mapping" not in isis and "TargetName              = n/a" in isis
+    # the attached history starts right after the 2 band 40x20 Int16 core
+    assert _values(isis)["StartByte"] == str(65536 + 1 + 40 * 20 * 2 * 2)
+    pds = PDS3Label(inspected, "moon_dem.img")
+    assert "IMAGE_MAP_PROJECTION" not in pds and _values(pds)["LINES"] == "20"
+
+
+def test_md5_file_reads_back_a_rewritten_file(tmp_path):
+    path = tmp_path / "out.img"
+    path.write_bytes(b"MEAN = @MEAN@\r\n" + bytes(bytearray(range(256))) * 5000)
+    with open(str(path), "r+b") as f:
+        f.write(b"MEAN = 2.5000")
+    assert gdal2label.MD5File(str(path), blocksize=4096) == \
+        hashlib.md5(path.read_bytes()).hexdigest()
@@ -0,0 +1,102 @@
+import math
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("osgeo")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "gdal2metadata"))
+from gdal2metadata import Footprint, OpenCatalog, CatalogInsert, main
+import gdal2metadata
+
+
+class PolarStereo(object):
+    """Spherical north polar stereographic (unit radius) to lon/lat."""
+
+    def TransformPoint(self, x, y, z):
+        rho = math.hypot(x, y)
+        lat = 90.0 - math.degrees(2.0 * math.atan(rho / 2.0))
+        lon = math.degrees(math.atan2(x, -y))
+        return (lon, lat, z)
+
+
+def _geographic(west, north, res, nx, ny):
+    return (west, res, 0.0, north, 0.0, -res), nx, ny
+
+
+def test_plain_box():
+    (gt, nx, ny) = _geographic(10.0, 5.0, 0.5, 20, 20)
+    assert Footprint(gt, None, nx, ny) == [(10.0, 20.0, -5.0, 5.0)]
+
+
+def test_0_to_360_mosaic_is_global():
+    (gt, nx, ny) = _geographic(0.0, 90.0, 1.0, 360, 180)
+    assert Footprint(gt, None, nx, ny) == [(-180.0, 180.0, -90.0, 90.0)]
+
+
+def test_antimeridian_crossing_is_split():
+    (gt, nx, ny) = _geographic(90.0, 10.0, 1.0, 180, 20)
+    assert Footprint(gt, None, nx, ny) == [(90.0, 180.0, -10.0, 10.0),
+                                          (-180.0, -90.0, -10.0, 10.0)]
+    (gt, nx, ny) = _geographic(-190.0, 10.0, 1.0, 20, 20)
+    assert Footprint(gt, None, nx, ny) == [(170.0, 180.0, -10.0, 10.0),
+                                          (-180.0, -170.0, -10.0, 10.0)]
+
+
+def test_polar_raster_reaches_the_pole():
+    gt = (-0.5, 0.01, 0.0, 0.5, 0.0, -0.01)
+    boxes = Footprint(gt, PolarStereo(), 100, 100)
+    assert len(boxes) == 1
+    (west, east, south, north) = boxes[0]
+    assert (west, east, north) == (-180.0, 180.0, 90.0)
+    # the corners are furthest from the pole
+    assert math.isclose(south, 90.0 - math.degrees(2.0 * math.atan(math.hypot(0.5, 0.5) / 2.0)))
+
+
+def _record():
+    return {"path": "/data/a.tif", "mtime": 1.0, "size": 10, "samples": 180,
+            "lines": 20, "bands": 1, "datatype": "Byte", "projection": "SIMPLE_CYLINDRICAL",
+            "target": "Moon", "semi_major": 1737400.0, "semi_minor": 1737400.0,
+            "wkt": "", "xres": 1.0, "yres": -1.0, "kmres": 30.3, "west": 90.0,
+            "east": -90.0, "south": -10.0, "north": 10.0, "band_stats": [],
+            "footprint": [(90.0, 180.0, -10.0, 10.0), (-180.0, -90.0, -10.0, 10.0)]}
+
+
+def test_catalog_finds_both_halves(tmp_path):
+    conn = OpenCatalog(str(tmp_path / "catalog.sqlite"))
+    record = _record()
+    CatalogInsert(conn, record)
+    CatalogInsert(conn, record)
+    query = """SELECT DISTINCT p.path FROM products p, products_rtree r
+               WHERE p.id = r.product_id AND r.maxx >= ? AND r.minx <= ?"""
+    assert conn.execute(query, (-120.0, -100.0)).fetchall() == [("/data/a.tif",)]
+    assert conn.execute(query, (100.0, 120.0)).fetchall() == [("/data/a.tif",)]
+    assert conn.execute(query, (0.0, 10.0)).fetchall() == []
+    assert conn.execute("SELECT COUNT(*) FROM products_rtree").fetchone() == (2,)
+    conn.close()
+
+
+def test_batch_refuses_rasters_that_share_an_output(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(gdal2metadata.gdal, "GeneralCmdLineProcessor", lambda argv: argv)
+    outdir = tmp_path / "xml"
+    argv = ["gdal2metadata", "-outdir", str(outdir), "template.xml",
+            "east/dem.tif", "west/dem.tif", "west/other.tif"]
+    assert main(argv) == 1
+    assert "ERROR: %s would be written by: east/dem.tif, west/dem.tif" % (
+        os.path.join(str(outdir), "dem.tif.xml")) in capsys.readouterr().out
+    assert not outdir.exists()
+
+
+def test_vsi_rasters_are_catalogued_without_a_stamp(tmp_path, monkeypatch):
+    monkeypatch.setattr(gdal2metadata.gdal, "GeneralCmdLineProcessor", lambda argv: argv)
+    monkeypatch.setattr(gdal2metadata, "_MetadataWorker",
+                        lambda job: (job[0], 0.0, None, _record()))
+    catalog = str(tmp_path / "catalog.sqlite")
+    raster = "/vsicurl/https://example.com/dem.tif"
+    for run in range(2):
+        assert main(["gdal2metadata", "-catalog", catalog, raster]) == 0
+    conn = OpenCatalog(catalog)
+    assert conn.execute("SELECT path, mtime, size FROM products").fetchall() == [
+        (raster, None, None)]
+    conn.close()
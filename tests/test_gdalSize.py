@@ -0,0 +1,86 @@
+import io
+import math
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("osgeo")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "gdalSize"))
+from gdalSize import (DensifyBox, EstimateSize, GridBoxes, OverviewLevels,
+                      ProjectedExtents, ReadBoxes)
+
+
+class ScaleTransform(object):
+    """Long/lat to metres on a sphere, inf for points marked unprojectable."""
+
+    def __init__(self, bad=lambda lon, lat: False):
+        self.bad = bad
+
+    def TransformPoints(self, points):
+        k = 1737400.0 * math.pi / 180.0
+        return [(float("inf"), float("inf"), 0.0) if self.bad(lon, lat)
+                else (lon * k, lat * k, 0.0) for (lon, lat) in points]
+
+
+def test_densify_box_covers_all_edges():
+    points = DensifyBox(0, 0, 10, 20, 3)
+    assert len(points) == 12
+    assert (5.0, 0) in points and (10, 10.0) in points
+
+
+def test_projected_extents_skips_failed_points_and_flags_empty_boxes():
+    ct = ScaleTransform(bad=lambda lon, lat: lat > 80)
+    k = 1737400.0 * math.pi / 180.0
+    extents = ProjectedExtents(ct, [(0, 0, 10, 10), (0, 85, 10, 89)], 5)
+    assert extents[0] == pytest.approx((0, 0, 10 * k, 10 * k))
+    assert extents[1] is None
+
+
+def test_overview_levels_stop_at_one_block():
+    assert OverviewLevels(4096, 1024, 256) == [2, 4, 8, 16]
+    assert OverviewLevels(200, 100, 256) == []
+
+
+def test_estimate_size_strips_tiles_and_overviews():
+    plain = EstimateSize(1000, 500, 1, 2)
+    assert plain["raw"] == plain["data"] == 1000 * 500 * 2
+    assert plain["blocks"] == 500
+    assert plain["total"] == plain["data"] + 500 * 2 * 4
+
+    tiled = EstimateSize(1000, 500, 1, 2, blockSize=256, overviews=[2])
+    # 4 x 2 full tiles, then 2 x 1 for the overview
+    assert tiled["blocks"] == 8 + 2
+    assert tiled["data"] == 10 * 256 * 256 * 2
+
+    compressed = EstimateSize(1000, 500, 1, 2, ratio=4.0)
+    assert compressed["data"] == 1000 * 500 * 2 // 4
+
+
+def test_estimate_size_switches_to_bigtiff_offsets():
+    size = EstimateSize(70000, 70000, 1, 1)
+    assert size["total"] - size["data"] == 70000 * 2 * 8
+
+
+def test_grid_boxes_clip_at_the_edges():
+    boxes = GridBoxes(-180, -90, 180, 90, 360, 50)
+    assert len(boxes) == 4
+    assert boxes[-1] == (-180, 60, 180, 90)
+
+
+def test_read_boxes_header_and_optional_fields():
+    fp = io.StringIO("minlong,minlat,maxlong,maxlat,res\n# comment\n0,0,10,10\n0 0 10 10 100 16 3\n")
+    assert ReadBoxes(fp) == [(0, 0, 10, 10, None, None, None),
+                             (0, 0, 10, 10, 100, 16, 3)]
+
+
+@pytest.mark.parametrize("text, line", [
+    ("0,0,10,10\n0,0,10\n", 2),
+    ("0,0,10,10\n\n0,0,x,10\n", 3),
+    ("0,0,10,10,100,12\n", 1),
+])
+def test_read_boxes_reports_bad_lines(text, line):
+    with pytest.raises(ValueError) as e:
+        ReadBoxes(io.StringIO(text))
+    assert str(e.value).startswith("line %d:" % line)
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("osgeo")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir,
+                                "NewStandardParallel_Equi", "global_lunar_split_example"))
+from split_equi_5deg_lat_bands import LatBands, LatName
+
+
+def test_integer_bands_keep_their_names():
+    bands = LatBands("moon", -90, 90, 5)
+    assert len(bands) == 36
+    assert bands[0][3] == "moon_n-85s-90_standpar-85.tif"
+    assert bands[-1][4] == "moon_n90s85_standpar85_global0.vrt"
+
+
+def test_fractional_bands_get_unique_names():
+    bands = LatBands("moon", -90, 90, 2.5)
+    names = [band[3] for band in bands]
+    assert len(names) == 72 and len(set(names)) == 72
+    assert names[1] == "moon_n-85s-87p5_standpar-85.tif"
+    # the last band is clipped to max_lat
+    last = LatBands("moon", 0, 1, 0.3)[-1]
+    assert last[:2] == (pytest.approx(0.9), 1) and last[3] == "moon_n1s0p9_standpar0p9.tif"
+    assert LatName(0.1 * 3) == "0p3"